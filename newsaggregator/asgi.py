@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'newsaggregator.settings')
+# Serve the async versions of the busiest views (see newsapp/async_views.py)
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
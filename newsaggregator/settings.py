@@ -51,13 +51,16 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Last, so it times the view alone; off unless REQUEST_TIMING_SAMPLE_RATE is set
+    'newsapp.metrics.RequestTimingMiddleware',
 ]
 
 ROOT_URLCONF = 'newsaggregator.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # The Django backend, with render times for RequestTimingMiddleware
+        'BACKEND': 'newsapp.metrics.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -72,6 +75,21 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'newsaggregator.wsgi.application'
 
+# Serve the home page, dashboard and save/unsave from newsapp.async_views.
+# asgi.py turns this on; under WSGI every async view would need its own
+# event loop, so the sync views are used.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS') == '1'
+ASYNC_QUERY_THREADS = 4  # Per process; each keeps a database connection open
+
+# Request timing (newsapp.metrics): the share of requests measured, from 0
+# (off) to 1 (all). Measured requests get a Server-Timing header and go into
+# the histograms at /metrics/; those slower than REQUEST_TIMING_SLOW_MS are
+# logged with their slowest queries.
+REQUEST_TIMING_SAMPLE_RATE = float(os.environ.get('REQUEST_TIMING_SAMPLE_RATE', '0'))
+REQUEST_TIMING_SLOW_MS = 500
+# Bearer token for scraping /metrics/; staff users can always see it
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -123,6 +141,53 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Caching
+# The page cache stores rendered home pages and is invalidated by fetch_news.
+# PAGE_CACHE_BACKEND selects where it lives: 'locmem' (per process, fine for
+# a single dev server), 'file' or 'db' (shared by all workers and by
+# fetch_news; 'db' needs `python manage.py createcachetable`), or 'none' to
+# turn it off (benchmarks).
+PAGE_CACHE_BACKEND = os.environ.get('PAGE_CACHE_BACKEND', 'file')
+PAGE_CACHE_ALIAS = 'pages'
+
+_PAGE_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'news-pages',
+    },
+    'none': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'pages',
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'newsapp_page_cache',
+    },
+}
+
+# Each worker's request timing histograms, added up by /metrics/. Kept out of
+# the page cache, which is culled and turned off in benchmarks
+METRICS_CACHE_ALIAS = 'metrics'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    PAGE_CACHE_ALIAS: {
+        **_PAGE_CACHE_BACKENDS[PAGE_CACHE_BACKEND],
+        'TIMEOUT': 300,  # Safety net; fetch_news invalidates explicitly
+    },
+    METRICS_CACHE_ALIAS: {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'metrics',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 10000},  # One entry per live worker process
+    },
+}
+
 # Media files
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -130,6 +195,31 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # NewsAPI Key
 NEWSAPI_KEY = 'pub_71ac1cf53f2746feb2266421d769c929'
 
+# NewsAPI rate limiting - match these to your NewsData.io plan's quota
+NEWSAPI_RATE_LIMIT = 1.0  # Sustained requests per second
+NEWSAPI_BURST = 5  # Requests that may go out back-to-back before throttling
+NEWSAPI_CONCURRENCY = 4  # Requests in flight at once
+
+# Polling schedule for `fetch_news --daemon` (seconds). Each source's interval
+# adapts to how often it publishes, within these bounds.
+FEED_POLL_DEFAULT_INTERVAL = 1800  # Starting interval for a new source
+FEED_POLL_MIN_INTERVAL = 300
+FEED_POLL_MAX_INTERVAL = 6 * 3600
+NEWSAPI_POLL_MIN_INTERVAL = 3600  # NewsData.io pages cost API credits
+
+# Card thumbnails made by `fetch_thumbnails` and served from /thumbs/
+THUMBNAIL_ROOT = MEDIA_ROOT / 'thumbs'
+THUMBNAIL_SIZE = (700, 400)  # Twice the card image size, for high-DPI screens
+THUMBNAIL_MAX_BYTES = 10 * 1024 * 1024  # Larger source images are skipped
+THUMBNAIL_DISK_BUDGET = 512 * 1024 * 1024  # Least recently used thumbnails are deleted beyond this
+THUMBNAIL_CONCURRENCY = 4  # Image downloads in flight at once
+THUMBNAIL_TIMEOUT = 15  # Seconds allowed for downloading one image
+THUMBNAIL_ALLOW_PRIVATE_HOSTS = False  # Images on loopback and private networks are refused
+
+# `archive_news` moves articles older than this (in days) that nobody has
+# saved from the News table to ArchivedNews
+NEWS_ARCHIVE_DAYS = 30
+
 # Login URLs
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
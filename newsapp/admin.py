@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import News, Category, SavedArticle
+from .models import News, ArchivedNews, Category, SavedArticle, FeedFetch, FeedSource, FeedState
+from .sources import with_fetch_stats
 
 
 @admin.register(Category)
@@ -11,16 +12,94 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(News)
 class NewsAdmin(admin.ModelAdmin):
-    list_display = ['title', 'source', 'category', 'country', 'published_date', 'created_at']
-    list_filter = ['category', 'source', 'country', 'published_date']
+    list_display = ['title', 'source', 'category', 'country', 'is_duplicate', 'save_count', 'published_date', 'created_at']
+    list_filter = ['category', 'source', 'country', 'is_duplicate', 'published_date']
     search_fields = ['title', 'description', 'source']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['simhash', 'story_id', 'is_duplicate', 'save_count', 'created_at', 'updated_at']
     date_hierarchy = 'published_date'
 
 
+@admin.register(ArchivedNews)
+class ArchivedNewsAdmin(admin.ModelAdmin):
+    list_display = ['title', 'source', 'category', 'country', 'published_date', 'archived_at']
+    list_filter = ['category', 'country', 'published_date']
+    search_fields = ['title', 'description', 'source']
+    date_hierarchy = 'published_date'
+
+    def has_add_permission(self, request):
+        # Rows only come from the archive_news command
+        return False
+
+
 @admin.register(SavedArticle)
 class SavedArticleAdmin(admin.ModelAdmin):
     list_display = ['user', 'news', 'saved_at']
     list_filter = ['saved_at']
     search_fields = ['user__username', 'news__title']
     date_hierarchy = 'saved_at'
+
+
+@admin.register(FeedState)
+class FeedStateAdmin(admin.ModelAdmin):
+    list_display = ['url', 'poll_interval', 'next_fetch_at', 'last_success_at', 'last_checked_at']
+    search_fields = ['url']
+    readonly_fields = ['content_hash', 'last_success_at', 'last_checked_at', 'poll_interval', 'next_fetch_at']
+
+
+@admin.register(FeedSource)
+class FeedSourceAdmin(admin.ModelAdmin):
+    """Feed sources with aggregates over their fetches in the last 24 hours"""
+    list_display = [
+        '__str__', 'kind', 'category', 'country', 'enabled', 'min_interval',
+        'fetches_24h', 'avg_latency', 'avg_size', 'mean_entries', 'new_articles_24h',
+        'avg_parse', 'errors_24h', 'last_fetched_at',
+    ]
+    list_editable = ['enabled', 'min_interval']
+    list_filter = ['kind', 'enabled', 'category', 'country']
+    search_fields = ['name', 'url', 'category', 'country']
+    readonly_fields = ['last_fetched_at', 'created_at']
+
+    def get_queryset(self, request):
+        return with_fetch_stats(super().get_queryset(request))
+
+    @admin.display(description='Fetches (24h)', ordering='fetch_count')
+    def fetches_24h(self, obj):
+        return obj.fetch_count
+
+    @admin.display(description='Latency (ms)', ordering='avg_latency_ms')
+    def avg_latency(self, obj):
+        return round(obj.avg_latency_ms) if obj.avg_latency_ms is not None else None
+
+    @admin.display(description='Size (KB)', ordering='avg_bytes')
+    def avg_size(self, obj):
+        return round(obj.avg_bytes / 1024, 1) if obj.avg_bytes is not None else None
+
+    @admin.display(description='Entries', ordering='avg_entries')
+    def mean_entries(self, obj):
+        return round(obj.avg_entries, 1) if obj.avg_entries is not None else None
+
+    @admin.display(description='New (24h)', ordering='inserted_total')
+    def new_articles_24h(self, obj):
+        return obj.inserted_total or 0
+
+    @admin.display(description='Parse (ms)', ordering='avg_parse_ms')
+    def avg_parse(self, obj):
+        return round(obj.avg_parse_ms, 1) if obj.avg_parse_ms is not None else None
+
+    @admin.display(description='Errors (24h)', ordering='error_total')
+    def errors_24h(self, obj):
+        return obj.error_total or 0
+
+
+@admin.register(FeedFetch)
+class FeedFetchAdmin(admin.ModelAdmin):
+    list_display = ['source', 'fetched_at', 'latency_ms', 'bytes', 'entries', 'inserted', 'parse_ms', 'errors', 'error']
+    list_filter = ['source__kind', 'source']
+    list_select_related = ['source']
+    date_hierarchy = 'fetched_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class NewsappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'newsapp'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from . import facets, pagecache  # noqa: F401 (connect their signal receivers)
+        from .search import ensure_search_index
+
+        post_migrate.connect(ensure_search_index, sender=self)
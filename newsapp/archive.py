@@ -0,0 +1,79 @@
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import post_delete
+
+from . import facets, pagecache
+from .models import ArchivedNews, News, SavedArticle
+
+# Columns copied from News; archived_at is set on insert
+ARCHIVE_FIELDS = [field.attname for field in ArchivedNews._meta.concrete_fields if field.name != 'archived_at']
+
+
+def archivable_news(before):
+    """Articles published before ``before`` that nobody has saved"""
+    return News.objects.filter(published_date__lt=before).filter(
+        ~Exists(SavedArticle.objects.filter(news=OuterRef('pk')))
+    )
+
+
+@contextmanager
+def _without_delete_handlers():
+    """Disconnect the per-row ``News`` post_delete handlers; ``archive_batch`` does their work once
+
+    They are disconnected for the whole process, which is fine for the
+    ``archive_news`` command but not inside a web worker.
+    """
+    handlers = [facets._count_deleted_news, pagecache._invalidate_on_news_change]
+    for handler in handlers:
+        post_delete.disconnect(handler, sender=News)
+    try:
+        yield
+    finally:
+        for handler in handlers:
+            post_delete.connect(handler, sender=News)
+
+
+def archive_batch(before, batch_size=1000):
+    """Move up to ``batch_size`` of the oldest archivable articles to ``ArchivedNews``
+
+    Runs in one transaction and returns ``(moved, examined)``; ``examined``
+    is 0 once there are none left. The sidebar counts are adjusted once for
+    the batch; the caller bumps the page cache version once it is done.
+    """
+    with transaction.atomic():
+        rows = list(archivable_news(before).order_by('published_date').values(*ARCHIVE_FIELDS)[:batch_size])
+        if not rows:
+            return 0, 0
+        ids = [row['id'] for row in rows]
+        # A link archived before can have been fetched again since; the
+        # newer copy replaces the archived one
+        ArchivedNews.objects.filter(link_hash__in=[row['link_hash'] for row in rows]).delete()
+        ArchivedNews.objects.bulk_create([ArchivedNews(**row) for row in rows])
+
+        # The saved check is repeated in case someone saved one of these
+        # articles in the meantime
+        with _without_delete_handlers():
+            archivable_news(before).filter(pk__in=ids).delete()
+        kept = set(News.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        if kept:
+            ArchivedNews.objects.filter(pk__in=kept).delete()
+        moved = [ArchivedNews(**row) for row in rows if row['id'] not in kept]
+        facets.adjust_facet_counts([article for article in moved if not article.is_duplicate], delta=-1)
+    return len(moved), len(rows)
+
+
+def compact_database(conn=None):
+    """Reclaim the space archived rows leave in the hot table and refresh the planner statistics
+
+    SQLite rewrites the whole database file on VACUUM, so this takes a while
+    (and as much free disk space as the database) on large ones.
+    """
+    conn = conn or connection
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            cursor.execute('ANALYZE')
+            cursor.execute('VACUUM')
+        elif conn.vendor == 'postgresql':
+            cursor.execute(f'VACUUM (ANALYZE) {News._meta.db_table}, {ArchivedNews._meta.db_table}')
@@ -0,0 +1,204 @@
+"""Async versions of the busiest views, served when running under ASGI
+
+``urls.py`` routes to these instead of the views in ``views.py`` when
+``settings.ASYNC_VIEWS`` is on (the default in ``asgi.py``). They build the
+same pages, but run the independent parts of each one (the article page,
+the sidebar counts, the user's saved state) at the same time.
+
+Django 4.2's async ORM runs every query on one shared thread, so queries
+that should overlap are sent to worker threads of their own with
+``_in_thread``. Sessions, transactions and template rendering stay sync.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections, connections
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed, JsonResponse
+from django.shortcuts import render
+
+from . import views
+from .models import News, SavedArticle, SavedCount
+from .pagecache import page_cache, home_cache_key
+from .saved import save_for_user, unsave_for_user
+
+
+# Threads that run the queries the views overlap. Each keeps its database
+# connection between requests, so the pool size bounds how many they open.
+_query_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'ASYNC_QUERY_THREADS', 4), thread_name_prefix='async-queries'
+)
+
+
+def _run_in_query_thread(func, *args, **kwargs):
+    # What request_started does for sync views: honour CONN_MAX_AGE and drop
+    # connections that have become unusable
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        # Don't keep a connection that may be broken or inside a failed transaction
+        connections.close_all()
+        raise
+
+
+def _in_thread(func):
+    """Make ``func`` awaitable in a query thread, with that thread's own database connection"""
+    run = sync_to_async(_run_in_query_thread, thread_sensitive=False, executor=_query_executor)
+
+    async def wrapper(*args, **kwargs):
+        return await run(func, *args, **kwargs)
+    return wrapper
+
+
+def _session_state(request):
+    # request.user is loaded from the session on first attribute access
+    request.user.is_authenticated
+    return request.user, bool(messages.get_messages(request))
+
+
+async def _user(request):
+    """``request.user``, loaded outside the event loop (Django 4.2 has no ``auser()``)"""
+    user, _ = await sync_to_async(_session_state)(request)
+    return user
+
+
+def _login_required(view):
+    """``login_required`` for async views"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await _user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def _require_post(view):
+    """``require_POST`` for async views"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            return HttpResponseNotAllowed(['POST'])
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def _saved_article_ids(user, context):
+    """Which articles on the home page ``user`` has saved"""
+    if not user.is_authenticated or context.get('archive'):
+        return set()
+    page_ids = [news.id for news in context['page_obj']]
+    if not page_ids:
+        return set()
+    return {
+        news_id async for news_id in
+        SavedArticle.objects.filter(user=user, news_id__in=page_ids).values_list('news_id', flat=True)
+    }
+
+
+def _cached(params, suffix='context'):
+    key = home_cache_key(params, suffix)
+    return key, page_cache().get(key)
+
+
+async def home(request):
+    """Home page with all news articles
+
+    Cached the same way as ``views.home``. On a miss the article page and the
+    sidebar counts are queried at the same time, and the saved flags as soon
+    as the page's ids are known.
+    """
+    user, has_messages = await sync_to_async(_session_state)(request)
+    cache_html = not user.is_authenticated and not has_messages
+
+    if cache_html:
+        html_key, html = await sync_to_async(_cached)(request.GET, 'html')
+        if html is not None:
+            return HttpResponse(html)
+
+    context_key, context = await sync_to_async(_cached)(request.GET)
+    if context is None:
+        async def page_and_saved():
+            page = await _in_thread(views._home_page)(request.GET)
+            return page, await _saved_article_ids(user, page)
+
+        (page, saved_article_ids), sidebar = await asyncio.gather(
+            page_and_saved(), _in_thread(views._home_sidebar)(request.GET)
+        )
+        context = {**page, **sidebar}
+        await page_cache().aset(context_key, context)
+    else:
+        saved_article_ids = await _saved_article_ids(user, context)
+
+    response = await sync_to_async(render)(request, 'newsapp/home.html', {
+        **context,
+        'saved_article_ids': saved_article_ids,
+    })
+
+    if cache_html:
+        await page_cache().aset(html_key, response.content)
+
+    return response
+
+
+async def _get_saved_count(user):
+    count = await SavedCount.objects.filter(user=user).values_list('count', flat=True).afirst()
+    if count is None:
+        count = await SavedArticle.objects.filter(user=user).acount()
+    return count
+
+
+@_login_required
+async def dashboard(request):
+    """User dashboard with saved articles
+
+    With cursors the page doesn't need the total, so both are queried at the
+    same time; numbered pages need the total first.
+    """
+    user = request.user
+    if 'page' in request.GET:
+        saved_count = await _get_saved_count(user)
+        context = await _in_thread(views._dashboard_page)(user, request.GET, saved_count)
+    else:
+        saved_count, context = await asyncio.gather(
+            _get_saved_count(user), _in_thread(views._dashboard_page)(user, request.GET)
+        )
+    context['saved_count'] = saved_count
+
+    return await sync_to_async(render)(request, 'newsapp/dashboard.html', context)
+
+
+async def _check_news_exists(news_id):
+    if not await News.objects.filter(id=news_id).aexists():
+        raise Http404('No News matches the given query.')
+
+
+@_login_required
+@_require_post
+async def save_article(request, news_id):
+    """Save an article for later"""
+    await _check_news_exists(news_id)
+    # The insert and both counters share a transaction, which needs sync code.
+    # It runs in a query thread, so a write waiting on a lock doesn't hold up
+    # the thread every other request's sync code shares.
+    created = await _in_thread(save_for_user)(request.user, news_id)
+
+    if created:
+        return JsonResponse({'status': 'saved', 'message': 'Article saved successfully!'})
+    else:
+        return JsonResponse({'status': 'already_saved', 'message': 'Article already saved!'})
+
+
+@_login_required
+@_require_post
+async def unsave_article(request, news_id):
+    """Remove an article from saved list"""
+    await _check_news_exists(news_id)
+    await _in_thread(unsave_for_user)(request.user, news_id)
+
+    return JsonResponse({'status': 'unsaved', 'message': 'Article removed from saved list!'})
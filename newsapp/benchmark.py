@@ -0,0 +1,102 @@
+import json
+import math
+import platform
+import time
+
+import django
+from django.db import connection
+from django.utils import timezone
+
+# Synthetic articles are tagged so they can be told apart from real data and removed
+BENCH_SOURCE = 'Benchmark'
+BENCH_LINK_PREFIX = 'https://bench.example/'
+# Articles served by FakeFeedServer, kept apart so benchmark_ingest can clean
+# up after itself without touching benchmark_web's dataset
+INGEST_BENCH_SOURCE = 'Ingest benchmark'
+INGEST_BENCH_LINK_PREFIX = 'https://ingest.bench.example/'
+
+WORDS = (
+    'election market storm climate vaccine football league court budget energy '
+    'startup chip satellite festival border summit police strike airline bank '
+    'river wildfire museum minister trial merger drought rally tariff discovery '
+    'hospital school transit stadium protest rescue launch record ceasefire harvest'
+).split()
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values`` (``pct`` between 0 and 100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(timings, query_counts):
+    """Reduce per-run wall times (seconds) and query counts to a result dict"""
+    timings_ms = [t * 1000 for t in timings]
+    return {
+        'runs': len(timings_ms),
+        'p50_ms': round(percentile(timings_ms, 50), 3),
+        'p95_ms': round(percentile(timings_ms, 95), 3),
+        'mean_ms': round(sum(timings_ms) / len(timings_ms), 3),
+        'max_ms': round(max(timings_ms), 3),
+        'queries': max(query_counts),
+    }
+
+
+def measure(func):
+    """Run ``func`` once, returning (result, seconds, queries run)
+
+    Only queries made from the calling thread are counted.
+    """
+    count = 0
+
+    def counter(execute, sql, params, many, context):
+        nonlocal count
+        count += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(counter):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+    return result, elapsed, count
+
+
+def delete_benchmark_articles(source=BENCH_SOURCE, link_prefix=BENCH_LINK_PREFIX, chunk_size=5000):
+    """Delete the synthetic articles from ``source``, in chunks since delete() loads each row"""
+    from .models import News
+
+    articles = News.objects.filter(source=source, link__startswith=link_prefix)
+    deleted = 0
+    while True:
+        ids = list(articles.values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        deleted += News.objects.filter(id__in=ids).delete()[1].get('newsapp.News', 0)
+
+
+def build_report(kind, dataset, results, **extra):
+    """Wrap benchmark results with enough context to compare two runs"""
+    return {
+        'benchmark': kind,
+        'created': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'dataset': dataset,
+        **extra,
+        'results': results,
+    }
+
+
+def write_report(report, path=None, stdout=None):
+    """Write a report as JSON to ``path``, or to ``stdout`` when no path is given"""
+    text = json.dumps(report, indent=2)
+    if path:
+        with open(path, 'w') as f:
+            f.write(text + '\n')
+    elif stdout is not None:
+        stdout.write(text)
+    return text
@@ -0,0 +1,69 @@
+import hashlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = frozenset([
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', 'igshid',
+    'ocid', 'cmpid', 'ito', 'ns_mchannel', 'ns_source', 'ns_campaign',
+    'ns_linkname', 'ns_fee', 'at_medium', 'at_campaign', 'ref', 'rss', 'cmp',
+])
+# Query parameters that switch a page to its AMP rendering
+AMP_PARAMS = frozenset(['amp', 'outputtype', 'amp_js_v', 'usqp'])
+
+
+def _is_tracking_param(name):
+    name = name.lower()
+    return name.startswith('utm_') or name in TRACKING_PARAMS
+
+
+def clean_url(url):
+    """Strip tracking parameters and the fragment from a link
+
+    The result is still the URL readers are sent to, so scheme, host and
+    path are left alone.
+    """
+    parts = urlsplit(url.strip())
+    params = parse_qsl(parts.query, keep_blank_values=True)
+    kept = [(k, v) for k, v in params if not _is_tracking_param(k)]
+    # Only re-encode the query when something was actually removed
+    query = urlencode(kept) if len(kept) != len(params) else parts.query
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))
+
+
+def canonical_key(url):
+    """Reduce a link to the form used to decide whether two links are the same
+
+    Ignores the scheme, a leading ``www.``/``m.``/``amp.`` host label, AMP path
+    segments and query flags, trailing slashes, tracking parameters, query
+    parameter order and the fragment. Not meant to be a fetchable URL.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or '').lower()
+    for prefix in ('www.', 'm.', 'amp.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    if parts.port and parts.port not in (80, 443):
+        host = f'{host}:{parts.port}'
+
+    segments = [segment for segment in parts.path.split('/') if segment and segment.lower() != 'amp']
+    path = '/'.join(segments)
+    if path.endswith('.amp'):
+        path = path[:-len('.amp')]
+    elif path.endswith('.amp.html'):
+        path = path[:-len('.amp.html')] + '.html'
+
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(k) and k.lower() not in AMP_PARAMS
+    )
+    key = f'{host}/{path}'
+    if query:
+        key += '?' + urlencode(query)
+    return key
+
+
+def link_hash(url):
+    """Fixed-width 64-bit hash of a link's canonical key, as a signed integer"""
+    digest = hashlib.sha1(canonical_key(url).encode()).digest()
+    return int.from_bytes(digest[:8], 'big', signed=True)
@@ -0,0 +1,134 @@
+import hashlib
+import re
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import SimHashBand
+
+SIMHASH_BITS = 64
+# The signature is split into bands (4 x 11 bits + 2 x 10 bits) for the LSH
+# index. Articles whose signatures differ in at most MAX_DISTANCE bits are the
+# same story; with MAX_DISTANCE below the number of bands, any such pair is
+# guaranteed to share at least one band exactly.
+BAND_WIDTHS = [11, 11, 11, 11, 10, 10]
+MAX_DISTANCE = 5
+# Syndicated copies turn up within a few days of each other, so only recent
+# stories are indexed; this keeps candidate lists short however big News gets
+STORY_WINDOW = timedelta(days=3)
+
+TOKEN_RE = re.compile(r'\w+')
+STOPWORDS = frozenset(
+    'a an and are as at be by for from has have in is it its of on or that the '
+    'to was were will with after over says said'.split()
+)
+
+
+def _words(text):
+    return [word for word in TOKEN_RE.findall((text or '').lower()) if word not in STOPWORDS]
+
+
+def _feature_hash(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'big')
+
+
+def simhash(title, description=''):
+    """Return the 64-bit SimHash of an article as a signed integer
+
+    Headline words and word pairs carry most of the weight: syndicated copies
+    of a story usually keep the headline but trim or rewrite the summary,
+    whose words only count once each.
+    """
+    title_words = _words(title)
+    features = [(word, 4) for word in title_words]
+    features += [(f'{a} {b}', 4) for a, b in zip(title_words, title_words[1:])]
+    features += [(word, 1) for word in _words(description)]
+
+    weights = [0] * SIMHASH_BITS
+    for feature, weight in features:
+        h = _feature_hash(feature)
+        for bit in range(SIMHASH_BITS):
+            if h >> bit & 1:
+                weights[bit] += weight
+            else:
+                weights[bit] -= weight
+
+    value = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            value |= 1 << bit
+    return to_signed(value)
+
+
+def to_signed(value):
+    """Map an unsigned 64-bit value into BigIntegerField's signed range"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def hamming_distance(a, b):
+    return bin((a ^ b) & ((1 << 64) - 1)).count('1')
+
+
+def band_keys(signature):
+    unsigned = signature & ((1 << 64) - 1)
+    keys = []
+    for band, width in enumerate(BAND_WIDTHS):
+        keys.append((band, unsigned & ((1 << width) - 1)))
+        unsigned >>= width
+    return keys
+
+
+def assign_stories(articles, index=True):
+    """Set ``simhash``, ``story_id`` and ``is_duplicate`` on unsaved articles
+
+    With ``index`` false, call ``index_stories`` with the articles actually
+    stored.
+    """
+    for article in articles:
+        article.simhash = simhash(article.title, article.description)
+
+    wanted = defaultdict(set)
+    for article in articles:
+        for band, value in band_keys(article.simhash):
+            wanted[band].add(value)
+
+    cutoff = timezone.now() - STORY_WINDOW
+    SimHashBand.objects.filter(created_at__lt=cutoff).delete()
+
+    stories = defaultdict(set)
+    if wanted:
+        lookup = Q()
+        for band, values in wanted.items():
+            lookup |= Q(band=band, value__in=values)
+        recent = SimHashBand.objects.filter(lookup, created_at__gte=cutoff)
+        for band, value, story_id in recent.values_list('band', 'value', 'story_id'):
+            stories[band, value].add(story_id)
+
+    for article in articles:
+        keys = band_keys(article.simhash)
+        candidates = set().union(*(stories.get(key, ()) for key in keys))
+        best = min(candidates, key=lambda story: hamming_distance(story, article.simhash), default=None)
+
+        if best is not None and hamming_distance(best, article.simhash) <= MAX_DISTANCE:
+            article.story_id = best
+            article.is_duplicate = True
+        else:
+            article.story_id = article.simhash
+            article.is_duplicate = False
+            for key in keys:
+                stories[key].add(article.story_id)
+
+    if index:
+        index_stories(articles)
+    return articles
+
+
+def index_stories(articles):
+    """Add the bands of the stories that ``articles`` started to the index"""
+    SimHashBand.objects.bulk_create([
+        SimHashBand(band=band, value=value, story_id=article.story_id)
+        for article in articles if not article.is_duplicate
+        for band, value in band_keys(article.simhash)
+    ])
@@ -0,0 +1,113 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import News, Category, FacetCount
+
+
+def adjust_facet_counts(articles, delta=1):
+    """Add ``delta`` to the materialized counts for each of ``articles``
+
+    Called by ingestion with the rows it just inserted; rows are grouped by
+    (country, category) so the table gets one UPDATE per group.
+    """
+    groups = Counter((article.country or '', article.category_id) for article in articles)
+    for (country, category_id), n in groups.items():
+        updated = FacetCount.objects.filter(
+            country=country, category_id=category_id
+        ).update(count=F('count') + n * delta)
+        if not updated and delta > 0:
+            FacetCount.objects.create(country=country, category_id=category_id, count=n)
+
+
+def rebuild_facet_counts():
+    """Recompute the materialized counts from ``News`` with one GROUP BY
+
+    Near-duplicates are left out, matching the one-card-per-story feed.
+    """
+    rows = (
+        News.objects.filter(is_duplicate=False)
+        .values('country', 'category').annotate(n=Count('id')).order_by()
+    )
+    with transaction.atomic():
+        FacetCount.objects.all().delete()
+        FacetCount.objects.bulk_create([
+            FacetCount(country=row['country'] or '', category_id=row['category'], count=row['n'])
+            for row in rows
+        ])
+
+
+def get_facet_counts(country=None, category_id=None):
+    """Return the sidebar counts, read from the materialized table in one query
+
+    ``categories`` maps category id to article count within ``country`` (all
+    countries when not given) and ``countries`` maps country code to article
+    count within ``category_id``. ``total`` is the count matching both.
+    """
+    categories = Counter()
+    countries = Counter()
+    total = 0
+
+    for row_country, row_category, n in FacetCount.objects.values_list('country', 'category_id', 'count'):
+        in_country = not country or row_country == country
+        in_category = not category_id or row_category == category_id
+        if in_country:
+            categories[row_category] += n
+        if in_category:
+            countries[row_country] += n
+        if in_country and in_category:
+            total += n
+
+    return {
+        'total': total,
+        'categories': categories,
+        'countries': countries,
+    }
+
+
+# The News fields an article is counted under
+FACET_FIELDS = ['country', 'category_id', 'is_duplicate']
+
+
+@receiver(pre_save, sender=News)
+def _remember_counted_facets(sender, instance, raw=False, update_fields=None, **kwargs):
+    # What an existing row is counted under now, so an edit can move it
+    instance._counted_facets = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and not {'country', 'category', 'category_id', 'is_duplicate'} & set(update_fields):
+        return
+    instance._counted_facets = News.objects.filter(pk=instance.pk).values_list(*FACET_FIELDS).first()
+
+
+@receiver(post_save, sender=News)
+def _count_saved_news(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        if not instance.is_duplicate:
+            adjust_facet_counts([instance])
+        return
+    counted = getattr(instance, '_counted_facets', None)
+    if counted is None or counted == tuple(getattr(instance, field) for field in FACET_FIELDS):
+        return
+    country, category_id, is_duplicate = counted
+    if not is_duplicate:
+        adjust_facet_counts([News(country=country, category_id=category_id)], delta=-1)
+    if not instance.is_duplicate:
+        adjust_facet_counts([instance])
+
+
+@receiver(post_delete, sender=News)
+def _count_deleted_news(sender, instance, **kwargs):
+    if not instance.is_duplicate:
+        adjust_facet_counts([instance], delta=-1)
+
+
+@receiver(post_delete, sender=Category)
+def _recount_after_category_delete(sender, instance, **kwargs):
+    # Its articles moved to "no category"; a rare event, so just recount
+    rebuild_facet_counts()
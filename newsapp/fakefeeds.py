@@ -0,0 +1,218 @@
+import hashlib
+import json
+import random
+from io import BytesIO
+import threading
+import time
+from datetime import timedelta
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+from PIL import Image
+
+from .benchmark import INGEST_BENCH_LINK_PREFIX, INGEST_BENCH_SOURCE, WORDS
+
+
+class FakeFeedServer:
+    """Local HTTP stand-in for RSS/Atom feeds and the NewsData.io API
+
+    Serves ``/rss/<n>.xml``, ``/atom/<n>.xml``, ``/newsapi`` and
+    ``/images/<n>.jpg`` on 127.0.0.1, failing a share of requests with a 500
+    (``error_rate``) or a 429 (``throttle_rate``). Bump ``generation`` for
+    new links.
+    """
+
+    def __init__(self, feed_size=20, latency=0.0, error_rate=0.0, throttle_rate=0.0,
+                 retry_after=0, fixtures_dir=None, image_size=(1600, 1000), seed=42):
+        self.feed_size = feed_size
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.fixtures = sorted(Path(fixtures_dir).iterdir()) if fixtures_dir else []
+        self.image_size = image_size
+        self._images = {}
+        self.generation = 0
+        self.requests = 0
+        self.not_modified = 0
+        self.started = timezone.now()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def feed_urls(self, count, atom_every=0):
+        """URLs of ``count`` feeds, every ``atom_every``-th one Atom"""
+        urls = []
+        for n in range(count):
+            kind = 'atom' if atom_every and n % atom_every == atom_every - 1 else 'rss'
+            urls.append(f'{self.base_url}/{kind}/{n}.xml')
+        return urls
+
+    @property
+    def image_base_url(self):
+        # Documents are also generated without the server running (e.g. by
+        # benchmark_normalize); their images then point nowhere
+        return f'{self.base_url}/images/' if self._server else f'{INGEST_BENCH_LINK_PREFIX}images/'
+
+    @property
+    def newsapi_url(self):
+        return f'{self.base_url}/newsapi'
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _roll(self):
+        with self._lock:
+            self.requests += 1
+            return self._random.random()
+
+    def handle(self, request):
+        if self.latency:
+            time.sleep(self.latency)
+
+        roll = self._roll()
+        if roll < self.throttle_rate:
+            return self._send(request, 429, b'Too many requests', 'text/plain',
+                              {'Retry-After': str(self.retry_after)})
+        if roll < self.throttle_rate + self.error_rate:
+            return self._send(request, 500, b'Internal server error', 'text/plain')
+
+        url = urlparse(request.path)
+        parts = url.path.strip('/').split('/')
+        if parts[0] == 'newsapi':
+            query = parse_qs(url.query)
+            body = self.newsapi_page(query.get('category', [''])[0], query.get('country', [''])[0])
+            return self._send(request, 200, body, 'application/json')
+        if len(parts) == 2 and parts[0] == 'images':
+            return self._send(request, 200, self.image(int(parts[1].split('.')[0])), 'image/jpeg')
+        if len(parts) == 2 and parts[0] in ('rss', 'atom'):
+            number = int(parts[1].split('.')[0])
+            if self.fixtures:
+                body = self.fixtures[number % len(self.fixtures)].read_bytes()
+            elif parts[0] == 'atom':
+                body = self.atom_document(number)
+            else:
+                body = self.rss_document(number)
+            etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+            if request.headers.get('If-None-Match') == etag:
+                with self._lock:
+                    self.not_modified += 1
+                return self._send(request, 304, b'', 'application/xml', {'ETag': etag})
+            headers = {'ETag': etag, 'Last-Modified': format_datetime(self.started, usegmt=True)}
+            return self._send(request, 200, body, 'application/xml', headers)
+        return self._send(request, 404, b'Not found', 'text/plain')
+
+    def _send(self, request, status, body, content_type, headers=None):
+        request.send_response(status)
+        request.send_header('Content-Type', content_type)
+        request.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            request.send_header(name, value)
+        request.end_headers()
+        request.wfile.write(body)
+
+    def _articles(self, key):
+        rng = random.Random(f'{key}:{self.generation}')
+        # Dated from the server's start, so a document only changes with the generation
+        now = self.started
+        for i in range(self.feed_size):
+            yield {
+                'title': ' '.join(rng.choices(WORDS, k=rng.randint(5, 10))).capitalize(),
+                'description': f"<p>{' '.join(rng.choices(WORDS, k=30))}</p>",
+                'link': f'{INGEST_BENCH_LINK_PREFIX}{self.generation}/{key}/{i}',
+                'published': now - timedelta(minutes=i * 7),
+                'image': f'{self.image_base_url}{rng.randrange(1000)}.jpg',
+            }
+
+    def image(self, number):
+        """JPEG image ``number``: a two-colour gradient, the same on every request"""
+        with self._lock:
+            if number not in self._images:
+                rng = random.Random(number)
+                start, end = (tuple(rng.randrange(256) for _ in range(3)) for _ in range(2))
+                gradient = Image.linear_gradient('L').resize(self.image_size)
+                image = Image.composite(Image.new('RGB', self.image_size, start), Image.new('RGB', self.image_size, end), gradient)
+                output = BytesIO()
+                image.save(output, 'JPEG', quality=90)
+                self._images[number] = output.getvalue()
+            return self._images[number]
+
+    def rss_document(self, number):
+        items = ''.join(
+            f"<item><title>{escape(a['title'])}</title><link>{escape(a['link'])}</link>"
+            f"<description>{escape(a['description'])}</description>"
+            f"<pubDate>{format_datetime(a['published'])}</pubDate>"
+            f"<guid>{escape(a['link'])}</guid>"
+            f"<media:content url=\"{a['image']}\" medium=\"image\"/></item>"
+            for a in self._articles(f'rss-{number}')
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<rss version="2.0" xmlns:media="http://search.yahoo.com/mrss/"><channel>'
+            f'<title>Benchmark feed {number}</title><link>{INGEST_BENCH_LINK_PREFIX}</link>'
+            f'<description>Generated feed</description>{items}</channel></rss>'
+        ).encode()
+
+    def atom_document(self, number):
+        entries = ''.join(
+            f"<entry><title>{escape(a['title'])}</title><link href=\"{escape(a['link'])}\"/>"
+            f"<id>{escape(a['link'])}</id><updated>{a['published'].isoformat()}</updated>"
+            f"<summary type=\"html\">{escape(a['description'])}</summary></entry>"
+            for a in self._articles(f'atom-{number}')
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<feed xmlns="http://www.w3.org/2005/Atom">'
+            f'<title>Benchmark feed {number}</title><id>{INGEST_BENCH_LINK_PREFIX}atom/{number}</id>'
+            f'<updated>{self.started.isoformat()}</updated>{entries}</feed>'
+        ).encode()
+
+    def newsapi_page(self, category, country):
+        results = [
+            {
+                'title': a['title'],
+                'description': a['description'],
+                'link': a['link'],
+                'pubDate': a['published'].strftime('%Y-%m-%d %H:%M:%S'),
+                'image_url': a['image'],
+                'source_id': 'benchmark',
+                'source_name': INGEST_BENCH_SOURCE,
+            }
+            for a in self._articles(f'newsapi-{category}-{country}')
+        ]
+        return json.dumps({'status': 'success', 'totalResults': len(results), 'results': results}).encode()
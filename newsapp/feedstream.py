@@ -0,0 +1,148 @@
+from xml.etree.ElementTree import ParseError, XMLPullParser
+
+import feedparser
+
+from .canonical import link_hash
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+RSS1 = '{http://purl.org/rss/1.0/}'
+RDF = '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}'
+DC = '{http://purl.org/dc/elements/1.1/}'
+MEDIA = '{http://search.yahoo.com/mrss/}'
+
+ROOT_TAGS = {'rss', f'{RDF}RDF', f'{ATOM}feed'}
+ENTRY_TAGS = {'item', f'{RSS1}item', f'{ATOM}entry'}
+
+
+class UnsupportedFeed(ValueError):
+    """The document is well-formed but not a format the streaming parser knows"""
+
+
+def _text(element):
+    return ''.join(element.itertext()).strip()
+
+
+def _media_content(element):
+    return [dict(content.attrib) for content in element.iter(f'{MEDIA}content') if content.get('url')]
+
+
+def _rss_entry(item):
+    """An RSS 2.0 or RSS 1.0 ``<item>`` as a feedparser-style entry"""
+    entry = feedparser.FeedParserDict(links=[])
+    guid = ''
+    for child in item:
+        tag = child.tag
+        if tag in ('title', f'{RSS1}title'):
+            entry['title'] = _text(child)
+        elif tag in ('link', f'{RSS1}link'):
+            entry['link'] = _text(child)
+        elif tag in ('description', f'{RSS1}description'):
+            entry['summary'] = _text(child)
+        elif tag == 'pubDate':
+            entry['published'] = _text(child)
+        elif tag == f'{DC}date':
+            entry['updated'] = _text(child)
+        elif tag == 'guid' and child.get('isPermaLink', 'true') == 'true':
+            guid = _text(child)
+        elif tag == 'enclosure':
+            entry['links'].append({'rel': 'enclosure', 'type': child.get('type', ''), 'href': child.get('url', '')})
+    if 'link' not in entry and guid.startswith(('http://', 'https://')):
+        entry['link'] = guid
+    media = _media_content(item)
+    if media:
+        entry['media_content'] = media
+    return entry
+
+
+def _atom_entry(element):
+    """An Atom ``<entry>`` as a feedparser-style entry"""
+    entry = feedparser.FeedParserDict(links=[])
+    content = None
+    for child in element:
+        tag = child.tag
+        if tag == f'{ATOM}title':
+            entry['title'] = _text(child)
+        elif tag == f'{ATOM}link':
+            rel = child.get('rel', 'alternate')
+            entry['links'].append({'rel': rel, 'type': child.get('type', ''), 'href': child.get('href', '')})
+            if rel == 'alternate' and 'link' not in entry:
+                entry['link'] = child.get('href', '').strip()
+        elif tag == f'{ATOM}summary':
+            entry['summary'] = _text(child)
+        elif tag == f'{ATOM}content':
+            content = _text(child)
+        elif tag == f'{ATOM}published':
+            entry['published'] = _text(child)
+        elif tag == f'{ATOM}updated':
+            entry['updated'] = _text(child)
+    if 'summary' not in entry and content:
+        entry['summary'] = content
+    media = _media_content(element)
+    if media:
+        entry['media_content'] = media
+    return entry
+
+
+def _stream_entries(parser, chunks, buffered):
+    """Entries parsed from ``chunks`` as each one's end tag arrives
+
+    Every chunk read is also appended to ``buffered``, in case the document
+    turns out to need feedparser after all. Finished entries are removed
+    from the tree, so it doesn't grow with the number of entries read.
+    """
+    stack = []
+    for chunk in chunks:
+        buffered.append(chunk)
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            if event == 'start':
+                if not stack and element.tag not in ROOT_TAGS:
+                    raise UnsupportedFeed(element.tag)
+                stack.append(element)
+                continue
+            stack.pop()
+            if element.tag in ENTRY_TAGS:
+                entry = _atom_entry(element) if element.tag == f'{ATOM}entry' else _rss_entry(element)
+                element.clear()
+                if stack:
+                    stack[-1].remove(element)
+                yield entry
+    parser.close()
+
+
+def iter_feed_entries(chunks, limit=None, known=()):
+    """Yield the entries of an RSS, RSS 1.0 or Atom document read from ``chunks``
+
+    Parsed as the chunks arrive, stopping after ``limit`` entries or at the
+    first one whose ``link_hash`` is in ``known``. Documents the streaming
+    parser can't handle, even part way through, go to feedparser instead.
+    """
+    chunks = iter(chunks)
+    buffered = []
+    yielded = set()  # links of the entries streamed so far
+    kept = 0
+    try:
+        for entry in _stream_entries(XMLPullParser(events=('start', 'end')), chunks, buffered):
+            if known and entry.get('link') and link_hash(entry['link']) in known:
+                return
+            yield entry
+            yielded.add(entry.get('link'))
+            kept += 1
+            if kept == limit:
+                return
+        return
+    except (ParseError, UnsupportedFeed):
+        pass
+
+    feed = feedparser.parse(b''.join(buffered) + b''.join(chunks))
+    if feed.bozo and not feed.entries:
+        raise ValueError(f'Error parsing feed: {feed.bozo_exception}')
+    for entry in feed.entries:
+        if kept == limit:
+            return
+        if known and entry.get('link') and link_hash(entry['link']) in known:
+            return
+        if entry.get('link') and entry['link'] in yielded:
+            continue
+        yield entry
+        kept += 1
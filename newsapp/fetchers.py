@@ -0,0 +1,371 @@
+"""Download RSS feeds and NewsData.io pages and store their articles
+
+Used by the one-off ``fetch_news`` run (``fetch_rss_feeds`` and
+``fetch_newsapi``) and by the polling daemon in ``scheduler.py``, which
+calls the per-source steps directly.
+"""
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .canonical import link_hash
+from .feedstream import iter_feed_entries
+from .ingest import IngestBatch
+from .models import FeedSource, FeedState
+from .normalize import feed_entry_fields, newsapi_article_fields
+from .ratelimit import TokenBucket, parse_retry_after
+from .sources import due_sources, new_fetch, record_fetches
+
+# RSS fetching defaults (overridable from the fetch_news command)
+RSS_MAX_WORKERS = 8
+RSS_FEED_TIMEOUT = 30
+RSS_ENTRY_LIMIT = 20
+RSS_CHUNK_SIZE = 16 * 1024
+FEED_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+# The feeds and NewsData.io pages to fetch are FeedSource rows, managed in
+# the admin. settings.NEWSAPI_URL overrides the NewsData.io endpoint (e.g.
+# for a local stand-in)
+NEWSAPI_URL = 'https://newsdata.io/api/1/news'
+NEWSAPI_MAX_RETRIES = 3
+NEWSAPI_TIMEOUT = 30
+
+
+def download_feed(source, timeout, state=None, limit=RSS_ENTRY_LIMIT):
+    """Download and parse a single RSS feed.
+
+    ``timeout`` bounds the whole download, and reading stops after ``limit``
+    entries or, given the feed's ``FeedState``, at the first one already
+    seen. Returns the ``entries`` (``None`` when unchanged), the new
+    validators and the download stats.
+    """
+    headers = {'User-Agent': FEED_USER_AGENT}
+    if state is not None:
+        if state.etag:
+            headers['If-None-Match'] = state.etag
+        if state.last_modified:
+            headers['If-Modified-Since'] = state.last_modified
+
+    started = time.monotonic()
+    deadline = started + timeout
+    response = requests.get(
+        source.url,
+        headers=headers,
+        timeout=timeout,
+        stream=True,
+    )
+    body_hash = hashlib.sha256()
+    read = {'bytes': 0, 'waited': time.monotonic() - started, 'complete': False}
+
+    def chunks():
+        body = response.iter_content(chunk_size=RSS_CHUNK_SIZE)
+        while True:
+            waiting = time.monotonic()
+            chunk = next(body, None)
+            read['waited'] += time.monotonic() - waiting
+            if chunk is None:
+                read['complete'] = True
+                return
+            if time.monotonic() > deadline:
+                raise requests.Timeout(f"Feed took longer than {timeout}s to download")
+            body_hash.update(chunk)
+            read['bytes'] += len(chunk)
+            yield chunk
+
+    try:
+        if response.status_code == 304 and state is not None:
+            return {
+                'entries': None,
+                'etag': response.headers.get('ETag', state.etag),
+                'last_modified': response.headers.get('Last-Modified', state.last_modified),
+                'content_hash': state.content_hash,
+                'bytes': 0,
+                'latency': time.monotonic() - started,
+                'parse_time': None,
+            }
+
+        response.raise_for_status()
+        known = state.known_links() if state is not None else ()
+        entries = list(iter_feed_entries(chunks(), limit, known))
+    finally:
+        response.close()
+
+    # Time spent waiting on the network, and the rest (mostly parsing)
+    latency = read['waited']
+    parse_time = time.monotonic() - started - latency
+    # Only a body read to the end can be compared with the last one
+    content_hash = body_hash.hexdigest() if read['complete'] else ''
+    if state is not None and content_hash and state.content_hash == content_hash:
+        entries = None
+
+    return {
+        'entries': entries,
+        'etag': response.headers.get('ETag', ''),
+        'last_modified': response.headers.get('Last-Modified', ''),
+        'content_hash': content_hash,
+        'bytes': read['bytes'],
+        'latency': latency,
+        'parse_time': parse_time,
+    }
+
+
+def remember_validators(state, result):
+    """Copy the validators of a successful ``download_feed`` result onto its ``FeedState``
+
+    The links of the entries read are added to the front of its recent
+    links, where the next fetch will stop.
+    """
+    state.etag = result['etag'][:500]
+    state.last_modified = result['last_modified'][:100]
+    state.content_hash = result['content_hash']
+    state.last_success_at = state.last_checked_at
+    if result['entries']:
+        links = [str(link_hash(entry['link'])) for entry in result['entries'] if entry.get('link')]
+        state.recent_links = ' '.join((links + state.recent_links.split())[:RSS_ENTRY_LIMIT])
+
+
+def record_download(fetch, result):
+    """Copy the size and timings of a download result onto its ``FeedFetch``"""
+    fetch.bytes = result['bytes']
+    fetch.latency_ms = result['latency'] * 1000
+    if result['parse_time'] is not None:
+        fetch.parse_ms = result['parse_time'] * 1000
+
+
+def store_feed_entries(entries, source, batch):
+    """Queue the entries read from a feed on the ingestion batch
+
+    Returns the number of entries that could not be processed.
+    """
+    category = batch.get_category(source.category)
+    rows, errors = feed_entry_fields(entries, source.pk)
+    for fields in rows:
+        batch.add(source=source.name, category=category, origin=source.pk, **fields)
+    return errors
+
+
+def fetch_rss_feeds(max_workers=RSS_MAX_WORKERS, timeout=RSS_FEED_TIMEOUT, batch=None, use_cache=True, sources=None):
+    """Fetch news from RSS feeds
+
+    Feeds are downloaded concurrently and their entries queued on ``batch``;
+    returns the number of new articles.
+    """
+    if sources is None:
+        sources = due_sources(FeedSource.RSS)
+    
+    if batch is None:
+        batch = IngestBatch()
+    inserted_before = batch.inserted
+    
+    states = FeedState.objects.in_bulk(
+        [source.url for source in sources], field_name='url'
+    )
+    checked_states = []
+    fetches = []
+    
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {
+            executor.submit(
+                download_feed,
+                source,
+                timeout,
+                states.get(source.url) if use_cache else None,
+            ): source
+            for source in sources
+        }
+        
+        for future in as_completed(futures):
+            source = futures[future]
+            fetch = new_fetch(source)
+            fetches.append(fetch)
+            state = states.get(source.url) or FeedState(url=source.url)
+            state.last_checked_at = timezone.now()
+            checked_states.append(state)
+            try:
+                result = future.result()
+                record_download(fetch, result)
+                entries = result['entries']
+                
+                if entries is not None:
+                    fetch.entries = len(entries)
+                    fetch.errors = store_feed_entries(entries, source, batch)
+                
+                remember_validators(state, result)
+                
+            except Exception as e:
+                print(f"Error fetching feed {source.url}: {e}")
+                fetch.errors += 1
+                fetch.error = str(e)
+                continue
+    
+    batch.flush()
+    
+    # Only remember validators once the entries they cover are stored
+    with transaction.atomic():
+        for state in checked_states:
+            state.save()
+        record_fetches(fetches, batch)
+    
+    return batch.inserted - inserted_before
+
+
+def store_newsapi_articles(results, source, batch):
+    """Queue one page of NewsData.io results on the ingestion batch
+
+    Returns the number of articles that could not be processed.
+    """
+    cat = source.category
+    category = batch.get_category(cat.capitalize(), slug=cat)
+    rows, errors = newsapi_article_fields(results, source.pk)
+    for fields in rows:
+        batch.add(category=category, country=source.country, origin=source.pk, **fields)
+    return errors
+
+
+def newsapi_params(api_key, cat, country_code):
+    """Query parameters for one NewsData.io page"""
+    return {
+        'apikey': api_key,
+        'category': cat,
+        'country': country_code,
+        'language': 'en'
+    }
+
+
+def newsapi_bucket(rate=None, burst=None):
+    """The token bucket NewsData.io requests share, by default at the ``NEWSAPI_*`` settings' rate"""
+    if rate is None:
+        rate = getattr(settings, 'NEWSAPI_RATE_LIMIT', 1.0)
+    if burst is None:
+        burst = getattr(settings, 'NEWSAPI_BURST', 5)
+    return TokenBucket(rate, burst)
+
+
+class RateLimited(Exception):
+    """NewsData.io answered 429; ``delay`` is how long it asked us to wait"""
+
+    def __init__(self, delay):
+        super().__init__(f'Rate limited by NewsData.io, retry after {delay:.0f}s')
+        self.delay = delay
+
+
+def request_newsapi_page(source, bucket, url=None, timeout=NEWSAPI_TIMEOUT, retry_after=60):
+    """Request the NewsData.io page of ``source``, once
+
+    A 429 pauses ``bucket`` for the server's ``Retry-After`` (``retry_after``
+    seconds if it sends none), so every request sharing it backs off, and
+    raises ``RateLimited``.
+    """
+    response = requests.get(
+        url or getattr(settings, 'NEWSAPI_URL', NEWSAPI_URL),
+        params=newsapi_params(settings.NEWSAPI_KEY, source.category, source.country),
+        headers={'User-Agent': FEED_USER_AGENT},
+        timeout=timeout,
+    )
+    if response.status_code == 429:
+        delay = parse_retry_after(response.headers.get('Retry-After'), default=retry_after)
+        bucket.pause(delay)
+        raise RateLimited(delay)
+    return response
+
+
+def store_newsapi_page(response, source, batch, fetch):
+    """Queue the articles of a NewsData.io response on ``batch``, recording it on ``fetch``
+
+    Raises ``ValueError`` for an error response.
+    """
+    fetch.bytes = len(response.content)
+    if response.status_code != 200:
+        error_text = response.text[:200] if response.text else 'No error message'
+        raise ValueError(f"NewsData.io error: {response.status_code} - {error_text}")
+
+    parse_started = time.monotonic()
+    data = response.json()
+    fetch.parse_ms = (time.monotonic() - parse_started) * 1000
+    if data.get('status') != 'success':
+        raise ValueError(f"NewsData.io API returned error: {data.get('message', 'Unknown error')}")
+
+    results = data.get('results', [])
+    fetch.entries = len(results)
+    fetch.errors = store_newsapi_articles(results, source, batch)
+
+
+async def _fetch_newsapi_page(bucket, semaphore, url, source):
+    """Request one NewsData.io page, retrying after 429 responses
+
+    Every attempt takes a token from the shared bucket, which a 429 pauses
+    so the other workers back off too.
+    """
+    for attempt in range(NEWSAPI_MAX_RETRIES + 1):
+        await bucket.acquire()
+        try:
+            async with semaphore:
+                return await asyncio.to_thread(
+                    request_newsapi_page, source, bucket, url, retry_after=5 * 2 ** attempt
+                )
+        except RateLimited as e:
+            if attempt == NEWSAPI_MAX_RETRIES:
+                raise
+            print(f"Rate limit hit for {source.category}/{source.country}. Waiting {e.delay:.0f} seconds...")
+
+
+async def _fetch_newsapi_pages(sources, url, bucket, concurrency):
+    """Fetch every source's page concurrently under one rate limit
+
+    Returns ``(source, response, error, seconds)`` for each source, the time
+    including any waits for the rate limit.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch(source):
+        started = time.monotonic()
+        try:
+            response = await _fetch_newsapi_page(bucket, semaphore, url, source)
+            return source, response, None, time.monotonic() - started
+        except Exception as e:
+            return source, None, e, time.monotonic() - started
+
+    return await asyncio.gather(*(fetch(source) for source in sources))
+
+
+def fetch_newsapi(concurrency=None, rate=None, burst=None, batch=None, sources=None):
+    """Fetch news from NewsData.io API with country support
+
+    Pages are requested concurrently under the ``NEWSAPI_*`` rate limit and
+    their articles queued on ``batch``; returns the number of new articles.
+    """
+    url = getattr(settings, 'NEWSAPI_URL', NEWSAPI_URL)
+    if concurrency is None:
+        concurrency = getattr(settings, 'NEWSAPI_CONCURRENCY', 4)
+
+    if sources is None:
+        sources = due_sources(FeedSource.NEWSAPI)
+    pages = asyncio.run(_fetch_newsapi_pages(sources, url, newsapi_bucket(rate, burst), concurrency))
+
+    if batch is None:
+        batch = IngestBatch()
+    inserted_before = batch.inserted
+    fetches = []
+
+    for source, response, error, elapsed in pages:
+        fetch = new_fetch(source)
+        fetch.latency_ms = elapsed * 1000
+        fetches.append(fetch)
+        try:
+            if error is not None:
+                raise error
+            store_newsapi_page(response, source, batch, fetch)
+        except Exception as e:
+            print(f"Error fetching NewsData.io category {source.category} for country {source.country}: {e}")
+            fetch.errors += 1
+            fetch.error = str(e)
+
+    batch.flush()
+    record_fetches(fetches, batch)
+    return batch.inserted - inserted_before
@@ -0,0 +1,98 @@
+from collections import Counter
+
+from django.db import transaction
+
+from .canonical import clean_url, link_hash
+from .dedup import assign_stories, index_stories
+from .facets import adjust_facet_counts
+from .pagecache import bump_news_version
+from .models import News, Category
+
+
+class IngestBatch:
+    """Buffer normalized articles and write them to the database in bulk
+
+    Fetchers ``add()`` one dict of ``News`` fields per entry; each flush
+    skips stored links, groups the rest into stories and inserts them with
+    one ``bulk_create``.
+    """
+
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+        self.inserted = 0
+        self.skipped = 0
+        self.inserted_by_origin = Counter()
+        self._pending = {}
+        self._origins = {}
+        self._categories = {}
+
+    def get_category(self, name, slug=None):
+        """Return the ``Category`` called ``name``, creating it if needed"""
+        category = self._categories.get(name)
+        if category is None:
+            category, _ = Category.objects.get_or_create(
+                name=name,
+                defaults={'slug': slug or name.lower().replace(' ', '-')}
+            )
+            self._categories[name] = category
+        return category
+
+    def add(self, origin=None, **fields):
+        """Queue one article; ``fields`` must include ``link``
+
+        The link is stripped of tracking parameters, and articles are
+        deduplicated on the hash of its canonical form, so http/https, ``www.``,
+        AMP and trailing-slash variants of one link count as the same article.
+        """
+        fields['link'] = clean_url(fields['link'])
+        fields['link_hash'] = key = link_hash(fields['link'])
+        if key in self._pending:
+            self.skipped += 1
+            return
+
+        self._pending[key] = fields
+        self._origins[key] = origin
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Insert queued articles whose links are not stored yet
+
+        Returns the number of rows inserted by this flush.
+        """
+        if not self._pending:
+            return 0
+
+        pending, self._pending = self._pending, {}
+        origins, self._origins = self._origins, {}
+        existing = set(
+            News.objects.filter(link_hash__in=list(pending)).values_list('link_hash', flat=True)
+        )
+        new_articles = [
+            News(**fields) for key, fields in pending.items() if key not in existing
+        ]
+
+        inserted = []
+        with transaction.atomic():
+            assign_stories(new_articles, index=False)
+            News.objects.bulk_create(new_articles, ignore_conflicts=True)
+            if new_articles:
+                # Links another fetch stored since the lookup above were
+                # skipped by the insert; the rows with this flush's
+                # created_at are the ones that landed
+                stored = dict(
+                    News.objects.filter(link_hash__in=[article.link_hash for article in new_articles])
+                    .values_list('link_hash', 'created_at')
+                )
+                inserted = [article for article in new_articles if stored.get(article.link_hash) == article.created_at]
+            index_stories(inserted)
+            adjust_facet_counts([article for article in inserted if not article.is_duplicate])
+            if inserted:
+                transaction.on_commit(bump_news_version)
+
+        self.inserted += len(inserted)
+        self.inserted_by_origin.update(
+            origins[article.link_hash] for article in inserted if origins[article.link_hash] is not None
+        )
+        self.skipped += len(pending) - len(inserted)
+        return len(inserted)
@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from newsapp.archive import archivable_news, archive_batch, compact_database
+from newsapp.pagecache import bump_news_version
+
+
+class Command(BaseCommand):
+    help = 'Move articles older than the retention horizon that nobody has saved to the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=getattr(settings, 'NEWS_ARCHIVE_DAYS', 30),
+            help='Archive articles published more than this many days ago (default: NEWS_ARCHIVE_DAYS)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of articles to move per transaction (default: 1000)',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many articles would be archived')
+        parser.add_argument('--no-vacuum', action='store_true', help='Skip VACUUM/ANALYZE after archiving')
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+
+        if options['dry_run']:
+            count = archivable_news(before).count()
+            self.stdout.write(f'{count} articles published before {before:%Y-%m-%d %H:%M} would be archived')
+            return
+
+        archived = 0
+        while True:
+            moved, examined = archive_batch(before, options['batch_size'])
+            if not examined:
+                break
+            archived += moved
+            self.stdout.write(f'Archived {archived} articles...')
+
+        if archived:
+            bump_news_version()
+            if not options['no_vacuum']:
+                self.stdout.write('Running VACUUM/ANALYZE...')
+                compact_database()
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived} articles published before {before:%Y-%m-%d %H:%M}'
+        ))
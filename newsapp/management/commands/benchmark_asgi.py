@@ -0,0 +1,316 @@
+import os
+import random
+import signal
+import socket
+import string
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from newsapp.benchmark import BENCH_SOURCE, build_report, percentile, write_report
+from newsapp.management.commands.benchmark_web import BENCH_USER_PREFIX, CATEGORIES
+from newsapp.models import Category, News
+from newsapp.pagination import KeysetPaginator
+from newsapp.pagecache import bump_news_version
+
+SERVERS = ['wsgi', 'asgi']
+SCENARIOS = ['home', 'home_anonymous', 'dashboard', 'save_unsave']
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _process_tree_rss(pid):
+    """Resident memory in bytes of ``pid`` and all its descendants (Linux only)"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    # The command name may contain spaces; fields after it don't
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, ValueError, IndexError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            pass
+    return total
+
+
+class Command(BaseCommand):
+    help = 'Compare the throughput of the WSGI (sync views) and ASGI (async views) servers with the same number of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--server',
+            action='append',
+            choices=SERVERS,
+            help='Server to run; repeat for both (default: wsgi and asgi)',
+        )
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            choices=SCENARIOS,
+            help='Scenario to run; repeat for several (default: all)',
+        )
+        parser.add_argument('--workers', type=int, default=2, help='Worker processes per server (default: 2)')
+        parser.add_argument(
+            '--wsgi-workers',
+            type=int,
+            help="Worker processes for the WSGI server only, e.g. to match the ASGI server's memory (default: --workers)",
+        )
+        parser.add_argument('--asgi-workers', type=int, help='Worker processes for the ASGI server only (default: --workers)')
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=1,
+            help='Threads per gunicorn worker on the WSGI side (default: 1, the sync worker)',
+        )
+        parser.add_argument('--concurrency', type=int, default=32, help='Clients sending requests at once (default: 32)')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds to measure each scenario (default: 10)')
+        parser.add_argument('--warmup', type=float, default=2, help='Untimed seconds before each scenario (default: 2)')
+        parser.add_argument(
+            '--warm-cache',
+            action='store_true',
+            help='Let the page cache serve repeat requests instead of turning it off in the servers',
+        )
+        parser.add_argument('--random-seed', type=int, default=42, help='Seed for picking users and articles (default: 42)')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        if not os.path.isdir('/proc'):
+            raise CommandError('Memory is read from /proc, so this benchmark runs on Linux only')
+
+        rng = random.Random(options['random_seed'])
+        users = list(User.objects.filter(username__startswith=BENCH_USER_PREFIX).order_by('id')[:options['concurrency']])
+        articles = News.objects.filter(source=BENCH_SOURCE, is_duplicate=False)
+        if not users or not articles.exists():
+            raise CommandError('No benchmark dataset found; run benchmark_web --seed first')
+
+        clients = [self.make_client(rng.choice(users)) for _ in range(options['concurrency'])]
+        # Each client saves and unsaves an article of its own, one nobody saved
+        article_ids = list(
+            articles.filter(save_count=0).order_by('?').values_list('id', flat=True)[:options['concurrency']]
+        )
+        if len(article_ids) < options['concurrency']:
+            raise CommandError('Not enough benchmark articles for one per client')
+        for client, news_id in zip(clients, article_ids):
+            client.news_id = news_id
+        paths = self.home_paths()
+
+        results = {}
+        try:
+            for server in options['server'] or SERVERS:
+                results[server] = self.run_server(server, clients, paths, options)
+        finally:
+            for client in clients:
+                SessionStore(client.session_key).delete()
+
+        report = build_report(
+            'asgi', {'articles': articles.count(), 'users': len(users)}, results,
+            workers={server: self.workers(server, options) for server in results},
+            wsgi_threads=options['threads'],
+            concurrency=options['concurrency'],
+            duration=options['duration'],
+            warm_cache=options['warm_cache'],
+        )
+        write_report(report, options['output'], self.stdout)
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f"Wrote results to {options['output']}"))
+
+    def make_client(self, user):
+        """A logged-in HTTP session for ``user``, with a CSRF cookie and header"""
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        csrf_token = ''.join(random.choices(string.ascii_letters + string.digits, k=32))
+
+        client = requests.Session()
+        client.session_key = session.session_key
+        client.cookies.set(settings.SESSION_COOKIE_NAME, session.session_key)
+        client.cookies.set(settings.CSRF_COOKIE_NAME, csrf_token)
+        client.headers['X-CSRFToken'] = csrf_token
+        return client
+
+    def home_paths(self):
+        """A mix of home page requests: filters and a few cursor pages down the feed"""
+        home = reverse('home')
+        category = Category.objects.filter(slug__in=CATEGORIES).first()
+        paths = [home, f'{home}?country=us', f'{home}?country=gb']
+        if category:
+            paths += [f'{home}?category={category.pk}', f'{home}?category={category.pk}&country=us']
+        feed = News.objects.filter(is_duplicate=False).order_by('-published_date', '-pk')
+        for offset in (12, 120, 1200):
+            row = feed.values('published_date', 'pk')[offset:offset + 1].first()
+            if row:
+                paths.append(f"{home}?after={KeysetPaginator.make_cursor(row['published_date'], row['pk'])}")
+        return paths
+
+    def workers(self, server, options):
+        return options[f'{server}_workers'] or options['workers']
+
+    def start_server(self, server, port, options):
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'newsaggregator.settings'),
+            'ASYNC_VIEWS': '1' if server == 'asgi' else '0',
+        }
+        if not options['warm_cache']:
+            env['PAGE_CACHE_BACKEND'] = 'none'
+        if server == 'asgi':
+            command = [
+                sys.executable, '-m', 'uvicorn', 'newsaggregator.asgi:application',
+                '--host', '127.0.0.1', '--port', str(port), '--workers', str(self.workers(server, options)),
+                '--log-level', 'warning', '--no-access-log',
+            ]
+        else:
+            command = [
+                sys.executable, '-m', 'gunicorn', 'newsaggregator.wsgi:application',
+                '--bind', f'127.0.0.1:{port}', '--workers', str(self.workers(server, options)),
+                '--threads', str(options['threads']), '--log-level', 'warning',
+            ]
+        process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f'The {server} server exited with status {process.returncode}')
+            try:
+                requests.get(f'http://127.0.0.1:{port}{reverse("login")}', timeout=1)
+                return process
+            except requests.ConnectionError:
+                time.sleep(0.2)
+        self.stop_server(process)
+        raise CommandError(f'The {server} server did not start within 30 seconds')
+
+    def stop_server(self, process):
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def run_server(self, server, clients, paths, options):
+        port = _free_port()
+        bump_news_version()
+        process = self.start_server(server, port, options)
+        base_url = f'http://127.0.0.1:{port}'
+        try:
+            results = {}
+            for scenario in options['scenario'] or SCENARIOS:
+                request = self.scenario_request(scenario, base_url, paths)
+                self.load(clients, request, options['warmup'])
+                results[scenario] = self.load(clients, request, options['duration'], process.pid)
+                self.stdout.write(
+                    f"{server} {scenario}: {results[scenario]['requests_per_second']} req/s, "
+                    f"p95 {results[scenario]['p95_ms']} ms, peak RSS {results[scenario]['peak_rss_mb']} MB"
+                )
+        finally:
+            self.stop_server(process)
+        return results
+
+    def scenario_request(self, scenario, base_url, paths):
+        """A function sending one request of ``scenario`` from a client; returns the status code"""
+        dashboard = reverse('dashboard')
+
+        def home(client, n):
+            return client.get(base_url + paths[n % len(paths)]).status_code
+
+        def home_anonymous(client, n):
+            return requests.get(base_url + paths[n % len(paths)]).status_code
+
+        def dashboard_page(client, n):
+            return client.get(base_url + dashboard).status_code
+
+        def save_unsave(client, n):
+            # Alternating, so each client's article ends up as it started
+            view = 'save_article' if n % 2 == 0 else 'unsave_article'
+            return client.post(base_url + reverse(view, args=[client.news_id])).status_code
+
+        return {
+            'home': home,
+            'home_anonymous': home_anonymous,
+            'dashboard': dashboard_page,
+            'save_unsave': save_unsave,
+        }[scenario]
+
+    def load(self, clients, request, duration, pid=None):
+        """Send requests from every client for ``duration`` seconds, sampling the server's memory"""
+        deadline = time.monotonic() + duration
+        lock = threading.Lock()
+        timings, errors = [], 0
+        rss_samples = []
+        done = threading.Event()
+
+        def sample_memory():
+            while not done.wait(0.25):
+                rss_samples.append(_process_tree_rss(pid))
+
+        def run(client):
+            nonlocal errors
+            n = 0
+            # Stop on an even count, so save_unsave leaves every article unsaved
+            while time.monotonic() < deadline or n % 2:
+                start = time.perf_counter()
+                try:
+                    ok = request(client, n) == 200
+                except requests.RequestException:
+                    ok = False
+                elapsed = time.perf_counter() - start
+                with lock:
+                    if ok:
+                        timings.append(elapsed * 1000)
+                    else:
+                        errors += 1
+                n += 1
+
+        sampler = threading.Thread(target=sample_memory) if pid else None
+        if sampler:
+            rss_samples.append(_process_tree_rss(pid))
+            sampler.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+            list(executor.map(run, clients))
+        elapsed = time.perf_counter() - started
+        done.set()
+        if sampler:
+            sampler.join()
+
+        if not pid:
+            return None
+        return {
+            'requests': len(timings),
+            'errors': errors,
+            'requests_per_second': round(len(timings) / elapsed, 1),
+            'p50_ms': round(percentile(timings, 50), 3) if timings else None,
+            'p95_ms': round(percentile(timings, 95), 3) if timings else None,
+            'peak_rss_mb': round(max(rss_samples) / 2 ** 20, 1),
+            'mean_rss_mb': round(sum(rss_samples) / len(rss_samples) / 2 ** 20, 1),
+        }
@@ -0,0 +1,189 @@
+import io
+import resource
+import tracemalloc
+from contextlib import redirect_stdout
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from newsapp.benchmark import (
+    INGEST_BENCH_LINK_PREFIX, INGEST_BENCH_SOURCE, build_report, delete_benchmark_articles,
+    measure, summarize, write_report,
+)
+from newsapp.facets import rebuild_facet_counts
+from newsapp.fakefeeds import FakeFeedServer
+from newsapp.models import FeedSource, FeedState, News
+from newsapp.pagecache import bump_news_version
+from newsapp.fetchers import RSS_FEED_TIMEOUT, RSS_MAX_WORKERS, fetch_newsapi, fetch_rss_feeds
+
+# Categories requested from the fake NewsData.io; its countries are made up
+# (b0, b1, ...) so the benchmark's sources never clash with real ones
+NEWSAPI_CATEGORIES = ['technology', 'sports', 'business', 'entertainment', 'health', 'science']
+
+SCENARIOS = ['rss', 'newsapi', 'command']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark news ingestion offline against a local fake feed server and write the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            choices=SCENARIOS,
+            help='Scenario to run; repeat for several (default: all of rss, newsapi, command)',
+        )
+        parser.add_argument('--feeds', type=int, default=50, help='RSS feeds to serve (default: 50)')
+        parser.add_argument('--feed-size', type=int, default=20, help='Entries per feed or API page (default: 20)')
+        parser.add_argument('--atom-every', type=int, default=0, help='Serve every Nth feed as Atom instead of RSS')
+        parser.add_argument('--fixtures', help='Directory of recorded feed documents to serve instead of generated ones')
+        parser.add_argument(
+            '--newsapi-pages',
+            type=int,
+            default=60,
+            help='NewsData.io pages to serve and request (default: 60)',
+        )
+        parser.add_argument('--latency', type=float, default=0.05, help='Seconds the server waits before each response (default: 0.05)')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with a 500 (default: 0)')
+        parser.add_argument('--throttle-rate', type=float, default=0.0, help='Share of requests answered with a 429 (default: 0)')
+        parser.add_argument('--retry-after', type=int, default=0, help='Retry-After seconds sent with 429s (default: 0)')
+        parser.add_argument('--workers', type=int, default=RSS_MAX_WORKERS, help=f'RSS download threads (default: {RSS_MAX_WORKERS})')
+        parser.add_argument('--newsapi-concurrency', type=int, default=8, help='NewsData.io requests in flight (default: 8)')
+        parser.add_argument(
+            '--newsapi-rate',
+            type=float,
+            default=1000.0,
+            help='NewsData.io requests per second; the real quota is far lower (default: 1000)',
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per scenario (default: 3)')
+        parser.add_argument(
+            '--trace-memory',
+            action='store_true',
+            help='Report peak Python memory per scenario with tracemalloc (slows the runs down)',
+        )
+        parser.add_argument('--keep', action='store_true', help='Keep the articles stored by the benchmark')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        server = FakeFeedServer(
+            feed_size=options['feed_size'],
+            latency=options['latency'],
+            error_rate=options['error_rate'],
+            throttle_rate=options['throttle_rate'],
+            retry_after=options['retry_after'],
+            fixtures_dir=options['fixtures'],
+        )
+        results = {}
+        with server:
+            base_url = server.base_url
+            self.feeds, self.pages = self.create_sources(server, options)
+            # Point the NewsData.io fetcher, including fetch_news's, at the fake server
+            with override_settings(
+                NEWSAPI_URL=server.newsapi_url,
+                NEWSAPI_RATE_LIMIT=options['newsapi_rate'],
+                NEWSAPI_BURST=options['newsapi_concurrency'],
+                NEWSAPI_CONCURRENCY=options['newsapi_concurrency'],
+            ):
+                for name in options['scenario'] or SCENARIOS:
+                    results[name] = self.run_scenario(name, server, options)
+                    self.stdout.write(
+                        f"{name}: {results[name]['entries_per_sec']} entries/sec, "
+                        f"{results[name]['queries_per_entry']} queries/entry"
+                    )
+
+        FeedSource.objects.filter(name=INGEST_BENCH_SOURCE).delete()
+        FeedState.objects.filter(url__startswith=base_url).delete()
+        if not options['keep']:
+            delete_benchmark_articles(INGEST_BENCH_SOURCE, INGEST_BENCH_LINK_PREFIX)
+            rebuild_facet_counts()
+            bump_news_version()
+
+        dataset = {
+            'feeds': options['feeds'],
+            'feed_size': options['feed_size'],
+            'atom_every': options['atom_every'],
+            'fixtures': options['fixtures'],
+            'newsapi_pages': len(self.pages),
+            'latency': options['latency'],
+            'error_rate': options['error_rate'],
+            'throttle_rate': options['throttle_rate'],
+        }
+        report = build_report(
+            'ingest', dataset, results,
+            repeat=options['repeat'],
+            workers=options['workers'],
+            peak_rss_kb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        )
+        write_report(report, options['output'], self.stdout)
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f"Wrote results to {options['output']}"))
+
+    def create_sources(self, server, options):
+        """Feed sources for the fake server's feeds and NewsData.io pages"""
+        FeedSource.objects.filter(name=INGEST_BENCH_SOURCE).delete()
+        FeedSource.objects.bulk_create([
+            FeedSource(kind=FeedSource.RSS, name=INGEST_BENCH_SOURCE, url=url, category='World')
+            for url in server.feed_urls(options['feeds'], options['atom_every'])
+        ])
+        FeedSource.objects.bulk_create([
+            FeedSource(
+                kind=FeedSource.NEWSAPI,
+                name=INGEST_BENCH_SOURCE,
+                category=NEWSAPI_CATEGORIES[n % len(NEWSAPI_CATEGORIES)],
+                country=f'b{n // len(NEWSAPI_CATEGORIES)}',
+            )
+            for n in range(options['newsapi_pages'])
+        ])
+        # Reloaded, since bulk_create only sets primary keys on some databases
+        return (
+            list(FeedSource.objects.filter(name=INGEST_BENCH_SOURCE, kind=FeedSource.RSS)),
+            list(FeedSource.objects.filter(name=INGEST_BENCH_SOURCE, kind=FeedSource.NEWSAPI)),
+        )
+
+    def run_scenario(self, name, server, options):
+        ingest = {
+            'rss': lambda: fetch_rss_feeds(
+                max_workers=options['workers'],
+                timeout=RSS_FEED_TIMEOUT,
+                use_cache=False,
+                sources=self.feeds,
+            ),
+            'newsapi': lambda: fetch_newsapi(sources=self.pages),
+            'command': lambda: call_command(
+                'fetch_news', workers=options['workers'], force=True, source=[INGEST_BENCH_SOURCE], stdout=io.StringIO()
+            ),
+        }[name]
+
+        timings, query_counts, inserted, peaks = [], [], [], []
+        requests_before = server.requests
+        for _ in range(options['repeat']):
+            # New links every run, so nothing is skipped as already stored
+            server.generation += 1
+            stored_before = self.stored_count()
+            if options['trace_memory']:
+                tracemalloc.start()
+            # The fetchers report feed errors with print(); keep them out of the report
+            with redirect_stdout(io.StringIO()):
+                _, elapsed, queries = measure(ingest)
+            if options['trace_memory']:
+                peaks.append(tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+            timings.append(elapsed)
+            query_counts.append(queries)
+            inserted.append(self.stored_count() - stored_before)
+
+        result = summarize(timings, query_counts)
+        total_inserted = sum(inserted)
+        result.update({
+            'inserted': total_inserted,
+            'server_requests': server.requests - requests_before,
+            'entries_per_sec': round(total_inserted / sum(timings), 1),
+            'queries_per_entry': round(sum(query_counts) / total_inserted, 3) if total_inserted else None,
+        })
+        if peaks:
+            result['peak_memory_kb'] = max(peaks) // 1024
+        return result
+
+    def stored_count(self):
+        return News.objects.filter(source=INGEST_BENCH_SOURCE, link__startswith=INGEST_BENCH_LINK_PREFIX).count()
+
@@ -0,0 +1,169 @@
+import json
+import re
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+import pytz
+from dateutil import parser as date_parser
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from newsapp.benchmark import build_report, summarize, write_report
+from newsapp.fakefeeds import FakeFeedServer
+from newsapp.feedstream import iter_feed_entries
+from newsapp.normalize import feed_entry_fields, newsapi_article_fields
+
+DATASETS = ['rss', 'atom', 'newsapi']
+
+
+def legacy_feed_fields(entries):
+    """The per-entry handling fetch_rss_feeds used before newsapp.normalize, as a baseline
+
+    Dates were parsed to ``published_parsed`` by the feed parser, so that
+    is included here too.
+    """
+    rows = []
+    for entry in entries:
+        published_date = timezone.now()
+        text = entry.get('published') or entry.get('updated')
+        if text:
+            try:
+                parsed = parsedate_to_datetime(text)
+            except (TypeError, ValueError):
+                try:
+                    parsed = datetime.fromisoformat(text.replace('Z', '+00:00'))
+                except ValueError:
+                    parsed = date_parser.parse(text)
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=pytz.UTC)
+            parsed = parsed.utctimetuple()
+            published_date = datetime(*parsed[:6], tzinfo=pytz.UTC)
+            published_date = timezone.make_aware(published_date.replace(tzinfo=None), pytz.UTC)
+
+        image_url = ''
+        if hasattr(entry, 'media_content') and entry.media_content:
+            image_url = entry.media_content[0].get('url', '')
+        elif hasattr(entry, 'image'):
+            image_url = entry.image.get('href', '')
+        elif hasattr(entry, 'links'):
+            for link in entry.links:
+                if link.get('type', '').startswith('image'):
+                    image_url = link.get('href', '')
+                    break
+
+        description = ''
+        if hasattr(entry, 'description'):
+            description = entry.description or ''
+        elif hasattr(entry, 'summary'):
+            description = entry.summary or ''
+        if description:
+            description = re.sub('<[^<]+?>', '', description)
+            description = description[:500]
+
+        if not hasattr(entry, 'title') or not entry.title:
+            continue
+        if not hasattr(entry, 'link') or not entry.link:
+            continue
+        rows.append({
+            'link': entry.link,
+            'title': (entry.title or 'Untitled')[:500],
+            'description': description,
+            'published_date': published_date,
+            'image_url': image_url,
+        })
+    return rows
+
+
+def legacy_newsapi_fields(articles):
+    """The per-article handling fetch_newsapi used before newsapp.normalize, as a baseline"""
+    rows = []
+    for article in articles:
+        if not article.get('link'):
+            continue
+        published_date = timezone.now()
+        if article.get('pubDate'):
+            try:
+                pub_date_str = article['pubDate']
+                try:
+                    published_date = datetime.fromisoformat(pub_date_str.replace('Z', '+00:00'))
+                except ValueError:
+                    published_date = date_parser.parse(pub_date_str)
+                    if published_date.tzinfo is None:
+                        published_date = pytz.UTC.localize(published_date)
+            except Exception:
+                published_date = timezone.now()
+
+        source_name = article.get('source_id', 'NewsData.io')
+        if article.get('source_name'):
+            source_name = article['source_name']
+        image_url = article.get('image_url', '') or article.get('image', '')
+        description = article.get('description', '') or article.get('content', '')
+        if description:
+            description = re.sub('<[^<]+?>', '', description)
+            description = description[:500]
+        title = article.get('title', '').strip() or 'Untitled'
+        rows.append({
+            'link': article.get('link', '').strip(),
+            'title': title[:500],
+            'description': description,
+            'published_date': published_date,
+            'image_url': image_url,
+            'source': source_name,
+        })
+    return rows
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the date and HTML normalization stage of ingestion, before and after, and write the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dataset',
+            action='append',
+            choices=DATASETS,
+            help='Entry format to normalize; repeat for several (default: all of rss, atom, newsapi)',
+        )
+        parser.add_argument('--entries', type=int, default=5000, help='Entries per dataset (default: 5000)')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per implementation (default: 5)')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        # Documents only; the server itself is never started
+        server = FakeFeedServer(feed_size=options['entries'])
+        entries = {
+            'rss': lambda: list(iter_feed_entries([server.rss_document(0)])),
+            'atom': lambda: list(iter_feed_entries([server.atom_document(0)])),
+            'newsapi': lambda: json.loads(server.newsapi_page('technology', 'us'))['results'],
+        }
+        implementations = {
+            'rss': {'before': legacy_feed_fields, 'after': lambda e: feed_entry_fields(e, 'rss')[0]},
+            'atom': {'before': legacy_feed_fields, 'after': lambda e: feed_entry_fields(e, 'atom')[0]},
+            'newsapi': {'before': legacy_newsapi_fields, 'after': lambda e: newsapi_article_fields(e, 'newsapi')[0]},
+        }
+
+        results = {}
+        for name in options['dataset'] or DATASETS:
+            batch = entries[name]()
+            results[name] = {}
+            for label, normalize in implementations[name].items():
+                timings = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    normalize(batch)
+                    timings.append(time.perf_counter() - start)
+                result = summarize(timings, [0])
+                del result['queries']
+                result['entries_per_sec'] = round(len(batch) / min(timings))
+                results[name][label] = result
+            results[name]['speedup'] = round(
+                results[name]['after']['entries_per_sec'] / results[name]['before']['entries_per_sec'], 2
+            )
+            self.stdout.write(
+                f"{name}: {results[name]['before']['entries_per_sec']} -> "
+                f"{results[name]['after']['entries_per_sec']} entries/sec ({results[name]['speedup']}x)"
+            )
+
+        report = build_report('normalize', {'entries': options['entries']}, results, repeat=options['repeat'])
+        write_report(report, options['output'], self.stdout)
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f"Wrote results to {options['output']}"))
@@ -0,0 +1,230 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from newsapp.benchmark import (
+    BENCH_LINK_PREFIX, BENCH_SOURCE, WORDS, build_report, delete_benchmark_articles,
+    measure, summarize, write_report,
+)
+from newsapp.canonical import link_hash
+from newsapp.facets import rebuild_facet_counts
+from newsapp.models import Category, News, SavedArticle
+from newsapp.pagecache import bump_news_version
+from newsapp.pagination import KeysetPaginator
+from newsapp.saved import rebuild_saved_counts
+from newsapp.views import COUNTRIES
+
+BENCH_USER_PREFIX = 'bench_user_'
+CATEGORIES = ['technology', 'sports', 'business', 'entertainment', 'health', 'science']
+# Articles per request in the batch save/unsave scenarios
+SAVE_BATCH_SIZE = 10
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the web request path against a synthetic dataset and write the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            action='store_true',
+            help='Generate the synthetic dataset before measuring (replaces any earlier one)',
+        )
+        parser.add_argument(
+            '--cleanup',
+            action='store_true',
+            help='Delete the synthetic dataset and exit',
+        )
+        parser.add_argument('--articles', type=int, default=200000, help='News rows to generate (default: 200000)')
+        parser.add_argument('--users', type=int, default=2000, help='Users to generate (default: 2000)')
+        parser.add_argument('--saved-per-user', type=int, default=25, help='Saved articles per user (default: 25)')
+        parser.add_argument('--days', type=int, default=90, help='Spread publish dates over this many days (default: 90)')
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per scenario (default: 20)')
+        parser.add_argument(
+            '--warm-cache',
+            action='store_true',
+            help='Let the page cache serve repeat requests instead of invalidating it before each one',
+        )
+        parser.add_argument('--random-seed', type=int, default=42, help='Seed for the data generator (default: 42)')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            self.delete_dataset()
+            self.stdout.write(self.style.SUCCESS('Removed the benchmark dataset'))
+            return
+
+        rng = random.Random(options['random_seed'])
+        if options['seed']:
+            self.delete_dataset()
+            self.generate_dataset(rng, options)
+
+        users = list(User.objects.filter(username__startswith=BENCH_USER_PREFIX).order_by('id'))
+        articles = News.objects.filter(source=BENCH_SOURCE)
+        if not users or not articles.exists():
+            raise CommandError('No benchmark dataset found; run with --seed first')
+
+        dataset = {
+            'articles': articles.count(),
+            'users': len(users),
+            'saved_articles': SavedArticle.objects.filter(user__in=users).count(),
+        }
+        setup_test_environment()
+        try:
+            results = self.run_scenarios(rng, users, options)
+        finally:
+            teardown_test_environment()
+
+        report = build_report(
+            'web', dataset, results,
+            iterations=options['iterations'],
+            warm_cache=options['warm_cache'],
+        )
+        write_report(report, options['output'], self.stdout)
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f"Wrote results to {options['output']}"))
+
+    def delete_dataset(self):
+        SavedArticle.objects.filter(user__username__startswith=BENCH_USER_PREFIX).delete()
+        User.objects.filter(username__startswith=BENCH_USER_PREFIX).delete()
+        delete_benchmark_articles()
+        rebuild_facet_counts()
+        bump_news_version()
+
+    def generate_dataset(self, rng, options):
+        categories = []
+        for name in CATEGORIES:
+            category, _ = Category.objects.get_or_create(slug=name, defaults={'name': name.capitalize()})
+            categories.append(category)
+        countries = [code for code in COUNTRIES if code != 'all']
+        now = timezone.now()
+        span = options['days'] * 24 * 3600
+
+        total = options['articles']
+        created = 0
+        while created < total:
+            rows = []
+            for i in range(created, min(created + 5000, total)):
+                link = f'{BENCH_LINK_PREFIX}{i}'
+                title = ' '.join(rng.choices(WORDS, k=rng.randint(5, 10))).capitalize()
+                rows.append(News(
+                    title=title,
+                    description=' '.join(rng.choices(WORDS, k=30)),
+                    link=link,
+                    link_hash=link_hash(link),
+                    published_date=now - timedelta(seconds=rng.randrange(span)),
+                    source=BENCH_SOURCE,
+                    category=rng.choice(categories),
+                    # Skew towards the first few countries, as real feeds are
+                    country=countries[min(int(rng.expovariate(0.3)), len(countries) - 1)],
+                    is_duplicate=rng.random() < 0.05,
+                ))
+            with transaction.atomic():
+                News.objects.bulk_create(rows)
+            created += len(rows)
+            self.stdout.write(f'Generated {created} articles...')
+
+        password = make_password(None)
+        User.objects.bulk_create([
+            User(username=f'{BENCH_USER_PREFIX}{i}', password=password)
+            for i in range(options['users'])
+        ])
+        users = User.objects.filter(username__startswith=BENCH_USER_PREFIX)
+        news_ids = list(News.objects.filter(source=BENCH_SOURCE).values_list('id', flat=True))
+        per_user = min(options['saved_per_user'], len(news_ids))
+        saved = []
+        for user in users.iterator():
+            saved.extend(SavedArticle(user=user, news_id=news_id) for news_id in rng.sample(news_ids, per_user))
+            if len(saved) >= 5000:
+                SavedArticle.objects.bulk_create(saved)
+                saved = []
+        SavedArticle.objects.bulk_create(saved)
+
+        rebuild_saved_counts()
+        rebuild_facet_counts()
+        bump_news_version()
+        self.stdout.write(self.style.SUCCESS('Benchmark dataset ready'))
+
+    def run_scenarios(self, rng, users, options):
+        home = reverse('home')
+        dashboard = reverse('dashboard')
+        feed = News.objects.filter(source=BENCH_SOURCE, is_duplicate=False)
+        category = Category.objects.get(slug=CATEGORIES[0])
+        total = feed.count()
+
+        # A cursor 90% of the way down the feed, and the numbered page there
+        deep = feed.order_by('-published_date', '-pk').values('published_date', 'pk')[total * 9 // 10]
+        deep_cursor = KeysetPaginator.make_cursor(deep['published_date'], deep['pk'])
+        deep_page = max(1, total * 9 // 10 // 12)
+
+        gets = {
+            'home': home,
+            'home_category': f'{home}?category={category.pk}',
+            'home_country': f'{home}?country=us',
+            'home_category_country': f'{home}?category={category.pk}&country=us',
+            'home_search': f'{home}?search={WORDS[0]}',
+            'home_search_filtered': f'{home}?search={WORDS[1]}&country=gb',
+            'home_deep_cursor': f'{home}?after={deep_cursor}',
+            'home_deep_page': f'{home}?page={deep_page}',
+            'dashboard': dashboard,
+            'news_api': f"{reverse('news_api')}?country=us",
+        }
+
+        user = rng.choice(users)
+        client = Client()
+        client.force_login(user)
+        results = {}
+        for name, url in gets.items():
+            results[name] = self.time_requests(lambda: client.get(url), options)
+            self.stdout.write(f"{name}: p50 {results[name]['p50_ms']} ms")
+
+        # Save and unsave the same random articles, ones the user hasn't saved
+        # already, so the dataset is unchanged
+        unsaved = feed.exclude(saved_by__user=user)
+        article_ids = list(unsaved.order_by('?').values_list('id', flat=True)[:options['iterations'] + 1])
+        save_urls = iter([reverse('save_article', args=[pk]) for pk in article_ids])
+        unsave_urls = iter([reverse('unsave_article', args=[pk]) for pk in article_ids])
+        results['save_article'] = self.time_requests(lambda: client.post(next(save_urls)), options)
+        results['unsave_article'] = self.time_requests(lambda: client.post(next(unsave_urls)), options)
+
+        # The same in batches, as the front end sends coalesced clicks
+        batch_url = reverse('saved_articles_batch')
+        batch_ids = list(unsaved.order_by('?').values_list('id', flat=True)[:(options['iterations'] + 1) * SAVE_BATCH_SIZE])
+        if len(batch_ids) < (options['iterations'] + 1) * SAVE_BATCH_SIZE:
+            raise CommandError('Not enough unsaved benchmark articles for the save scenarios')
+        batches = [batch_ids[i:i + SAVE_BATCH_SIZE] for i in range(0, len(batch_ids), SAVE_BATCH_SIZE)]
+        for action in ('save', 'unsave'):
+            bodies = iter([
+                {'operations': [{'news_id': pk, 'action': action} for pk in batch]} for batch in batches
+            ])
+            results[f'{action}_batch'] = self.time_requests(
+                lambda: client.post(batch_url, next(bodies), content_type='application/json'), options
+            )
+        return results
+
+    def fetch(self, request):
+        response = request()
+        # Streamed responses run their queries while being consumed
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def time_requests(self, request, options):
+        timings, query_counts = [], []
+        # One untimed warm-up request, then the timed runs
+        for run in range(options['iterations'] + 1):
+            if not options['warm_cache']:
+                bump_news_version()
+            response, elapsed, queries = measure(lambda: self.fetch(request))
+            if response.status_code != 200:
+                raise CommandError(f'Benchmark request failed with status {response.status_code}')
+            if run:
+                timings.append(elapsed)
+                query_counts.append(queries)
+        return summarize(timings, query_counts)
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from newsapp.dedup import assign_stories
+from newsapp.facets import rebuild_facet_counts
+from newsapp.models import News
+from newsapp.pagecache import bump_news_version
+
+
+class Command(BaseCommand):
+    help = 'Group existing articles without a SimHash into stories (near-duplicate detection)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of articles to process per transaction (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        processed = 0
+        duplicates = 0
+        last_id = 0
+
+        while True:
+            # Oldest first, so the earliest copy of a story is its primary
+            articles = list(
+                News.objects.filter(simhash__isnull=True, id__gt=last_id)
+                .order_by('id')
+                .only('id', 'title', 'description')[:batch_size]
+            )
+            if not articles:
+                break
+
+            with transaction.atomic():
+                assign_stories(articles)
+                News.objects.bulk_update(articles, ['simhash', 'story_id', 'is_duplicate'])
+
+            last_id = articles[-1].id
+            processed += len(articles)
+            duplicates += sum(article.is_duplicate for article in articles)
+            self.stdout.write(f'Processed {processed} articles...')
+
+        rebuild_facet_counts()
+        bump_news_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Clustered {processed} articles, {duplicates} marked as near-duplicates'
+        ))
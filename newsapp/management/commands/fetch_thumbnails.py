@@ -0,0 +1,47 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from newsapp.thumbnails import evict_thumbnails, fetch_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Download and resize the images of the newest articles into the local thumbnail cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=200,
+            help='Articles to make thumbnails for per pass (default: 200)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Images to download in parallel (default: settings.THUMBNAIL_CONCURRENCY)',
+        )
+        parser.add_argument(
+            '--every',
+            type=float,
+            metavar='SECONDS',
+            help='Keep running, starting a pass this often, until SIGTERM',
+        )
+
+    def handle(self, *args, **options):
+        stopping = threading.Event()
+        if options['every']:
+            signal.signal(signal.SIGTERM, lambda *args: stopping.set())
+            signal.signal(signal.SIGINT, lambda *args: stopping.set())
+
+        while True:
+            stored, failed = fetch_thumbnails(options['limit'], options['workers'], log=self.stdout.write)
+            evicted = evict_thumbnails()
+            if stored or failed or evicted or not options['every']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Thumbnails for {stored} articles, {failed} without; evicted {evicted} files'
+                ))
+            # A full pass means there may be more waiting: go again straight away
+            if not options['every'] or stopping.wait(0 if stored + failed >= options['limit'] else options['every']):
+                break
+            close_old_connections()
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from newsapp.facets import rebuild_facet_counts
+from newsapp.models import FacetCount
+from newsapp.pagecache import bump_news_version
+
+
+class Command(BaseCommand):
+    help = 'Recompute the materialized country/category article counts shown in the sidebar'
+
+    def handle(self, *args, **options):
+        rebuild_facet_counts()
+        bump_news_version()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {FacetCount.objects.count()} facet counts'))
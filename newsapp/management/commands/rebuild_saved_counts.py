@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from newsapp.models import SavedCount
+from newsapp.saved import rebuild_saved_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-article and per-user saved counts from the saved articles'
+
+    def handle(self, *args, **options):
+        rebuild_saved_counts()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt saved counts for {SavedCount.objects.count()} users'))
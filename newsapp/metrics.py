@@ -0,0 +1,316 @@
+"""Per-request timing: Server-Timing headers, slow request logs and Prometheus histograms
+
+``RequestTimingMiddleware`` measures a sample of requests
+(``REQUEST_TIMING_SAMPLE_RATE``): the queries they run and how long those
+take, template rendering and the view as a whole. The figures go out in a
+``Server-Timing`` header, into per-view histograms served by the ``metrics``
+view, and, for requests slower than ``REQUEST_TIMING_SLOW_MS``, into a log
+line with the slowest queries. With sampling off the middleware removes
+itself, so it costs nothing.
+
+The measurements for a request live in a context variable, which follows
+the request into the threads async views run queries and templates in.
+"""
+import heapq
+import hmac
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+# Slowest queries kept per request for the slow request log
+TOP_QUERIES = 5
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Each process shares its histograms through the metrics cache at most this
+# often (seconds), so the metrics view can add up every worker's. A worker
+# that stops flushing (one that exited) drops out once its snapshot expires
+FLUSH_INTERVAL = 10
+SNAPSHOT_TIMEOUT = 30 * FLUSH_INTERVAL
+PROCESSES_KEY = 'request-metrics:processes'
+
+_current = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """What one sampled request spent its time on"""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.slowest = []  # (seconds, sql) heap of the TOP_QUERIES slowest
+
+    def add_query(self, sql, elapsed):
+        self.queries += 1
+        self.sql_time += elapsed
+        if len(self.slowest) < TOP_QUERIES:
+            heapq.heappush(self.slowest, (elapsed, sql))
+        elif elapsed > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (elapsed, sql))
+
+
+def _record_query(execute, sql, params, many, context):
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.add_query(sql, time.perf_counter() - start)
+
+
+def _install_query_recorder(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timing = _current.get()
+        if timing is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timing.template_time += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing renders for ``RequestTimingMiddleware``
+
+    Only top-level renders are timed, so included and extended templates
+    aren't counted twice. The time includes queries run from templates.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+class Histogram:
+    """A Prometheus histogram with one series per view"""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}  # view -> [count per bucket..., sum, count]
+
+    def observe(self, view, value):
+        series = self.series.get(view)
+        if series is None:
+            series = self.series[view] = [0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+
+class Registry:
+    """This process's request histograms"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = [
+            Histogram('newsapp_request_duration_seconds', 'Time spent in the view, including queries and templates', DURATION_BUCKETS),
+            Histogram('newsapp_request_db_seconds', 'Time spent running SQL queries', DURATION_BUCKETS),
+            Histogram('newsapp_request_db_queries', 'SQL queries run', QUERY_BUCKETS),
+            Histogram('newsapp_request_template_seconds', 'Time spent rendering templates', DURATION_BUCKETS),
+        ]
+        self.flushed_at = time.monotonic()
+
+    def observe(self, view, duration, timing):
+        with self.lock:
+            for histogram, value in zip(self.histograms, (duration, timing.sql_time, timing.queries, timing.template_time)):
+                histogram.observe(view, value)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                histogram.name: {view: list(series) for view, series in histogram.series.items()}
+                for histogram in self.histograms
+            }
+
+    def flush_due(self):
+        return time.monotonic() - self.flushed_at >= FLUSH_INTERVAL
+
+    def flush(self):
+        """Share this process's histograms with the other workers through the metrics cache"""
+        self.flushed_at = time.monotonic()
+        cache = metrics_cache()
+        cache.set(_snapshot_key(), self.snapshot(), timeout=SNAPSHOT_TIMEOUT)
+        # Read-modify-write, so two processes starting together can race;
+        # the loser adds itself again on its next flush
+        processes = cache.get(PROCESSES_KEY) or set()
+        if _snapshot_key() not in processes:
+            cache.set(PROCESSES_KEY, processes | {_snapshot_key()}, timeout=None)
+
+
+registry = Registry()
+
+
+def metrics_cache():
+    return caches[getattr(settings, 'METRICS_CACHE_ALIAS', 'default')]
+
+
+def _snapshot_key():
+    return f'request-metrics:{socket.gethostname()}:{os.getpid()}'
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unmatched'
+
+
+class RequestTimingMiddleware:
+    """Time a sample of requests; see the module docstring
+
+    Goes last in ``MIDDLEWARE``, so the view time covers the view alone.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.sample_rate = getattr(settings, 'REQUEST_TIMING_SAMPLE_RATE', 0)
+        if not self.sample_rate:
+            raise MiddlewareNotUsed
+        self.slow_ms = getattr(settings, 'REQUEST_TIMING_SLOW_MS', 500)
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        connection_created.connect(_install_query_recorder)
+        for connection in connections.all(initialized_only=True):
+            _install_query_recorder(connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        timing = RequestTiming()
+        token = _current.set(timing)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, time.perf_counter() - start, timing)
+        if registry.flush_due():
+            registry.flush()
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+        timing = RequestTiming()
+        token = _current.set(timing)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, time.perf_counter() - start, timing)
+        if registry.flush_due():
+            await sync_to_async(registry.flush)()
+        return response
+
+    def finish(self, request, response, duration, timing):
+        response['Server-Timing'] = (
+            f'db;dur={timing.sql_time * 1000:.1f};desc="{timing.queries} queries", '
+            f'tpl;dur={timing.template_time * 1000:.1f}, '
+            f'view;dur={duration * 1000:.1f}'
+        )
+        view = _view_name(request)
+        registry.observe(view, duration, timing)
+
+        if duration * 1000 >= self.slow_ms:
+            slowest = ''.join(
+                f'\n  {elapsed * 1000:.1f} ms: {sql[:500]}'
+                for elapsed, sql in sorted(timing.slowest, reverse=True)
+            )
+            logger.warning(
+                'Slow request %s %s (%s): %.1f ms, %d queries in %.1f ms, templates %.1f ms%s',
+                request.method, request.get_full_path(), view, duration * 1000,
+                timing.queries, timing.sql_time * 1000, timing.template_time * 1000, slowest,
+            )
+
+
+def _merged_snapshots():
+    """Every worker's histograms added up, with this process's current ones"""
+    own_key = _snapshot_key()
+    snapshots = [registry.snapshot()]
+    cache = metrics_cache()
+    processes = cache.get(PROCESSES_KEY) or set()
+    found = cache.get_many(processes - {own_key})
+    snapshots.extend(found.values())
+    expired = processes - found.keys() - {own_key}
+    if expired:
+        # Racy like flush(); a live process dropped here adds itself again
+        cache.set(PROCESSES_KEY, processes - expired, timeout=None)
+
+    merged = {}
+    for snapshot in snapshots:
+        for name, series in snapshot.items():
+            for view, values in series.items():
+                total = merged.setdefault(name, {}).get(view)
+                if total is None:
+                    merged[name][view] = list(values)
+                else:
+                    merged[name][view] = [a + b for a, b in zip(total, values)]
+    return merged
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_metrics():
+    """The request histograms in the Prometheus text format"""
+    merged = _merged_snapshots()
+    lines = [
+        '# HELP newsapp_request_timing_sample_rate Share of requests measured; the histograms count only those',
+        '# TYPE newsapp_request_timing_sample_rate gauge',
+        f"newsapp_request_timing_sample_rate {getattr(settings, 'REQUEST_TIMING_SAMPLE_RATE', 0)}",
+    ]
+    for histogram in registry.histograms:
+        lines.append(f'# HELP {histogram.name} {histogram.help_text}')
+        lines.append(f'# TYPE {histogram.name} histogram')
+        for view, values in sorted(merged.get(histogram.name, {}).items()):
+            label = f'view="{_label(view)}"'
+            for bound, count in zip(histogram.buckets, values):
+                lines.append(f'{histogram.name}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'{histogram.name}_bucket{{{label},le="+Inf"}} {values[-1]}')
+            lines.append(f'{histogram.name}_sum{{{label}}} {values[-2]}')
+            lines.append(f'{histogram.name}_count{{{label}}} {values[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_allowed(request):
+    """Staff users, or a client sending ``Authorization: Bearer <METRICS_TOKEN>``"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    header = request.headers.get('Authorization', '')
+    if token and header.startswith('Bearer ') and hmac.compare_digest(header[7:], token):
+        return True
+    return request.user.is_staff
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0002_news_country'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=1000, unique=True)),
+                ('etag', models.CharField(blank=True, max_length=500)),
+                ('last_modified', models.CharField(blank=True, max_length=100)),
+                ('content_hash', models.CharField(blank=True, help_text='SHA-256 of the last downloaded feed body', max_length=64)),
+                ('last_success_at', models.DateTimeField(blank=True, null=True)),
+                ('last_checked_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['url'],
+            },
+        ),
+    ]
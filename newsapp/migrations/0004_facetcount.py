@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_facet_counts(apps, schema_editor):
+    News = apps.get_model('newsapp', 'News')
+    FacetCount = apps.get_model('newsapp', 'FacetCount')
+    rows = News.objects.values('country', 'category').annotate(n=models.Count('id')).order_by()
+    FacetCount.objects.bulk_create([
+        FacetCount(country=row['country'] or '', category_id=row['category'], count=row['n'])
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0003_feedstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(blank=True, help_text='ISO country code, blank for articles without one', max_length=10)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='newsapp.category')),
+            ],
+            options={
+                'unique_together': {('country', 'category')},
+            },
+        ),
+        migrations.RunPython(populate_facet_counts, migrations.RunPython.noop),
+    ]
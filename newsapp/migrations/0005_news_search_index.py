@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    from newsapp.search import install_search_index
+    install_search_index(schema_editor.connection, rebuild=True)
+
+
+def uninstall(apps, schema_editor):
+    from newsapp.search import uninstall_search_index
+    uninstall_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0004_facetcount'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
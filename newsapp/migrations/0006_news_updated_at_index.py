@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0005_news_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='news',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
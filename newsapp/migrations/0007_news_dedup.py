@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0006_news_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='is_duplicate',
+            field=models.BooleanField(default=False, help_text='Near-duplicate of an earlier article in the same story'),
+        ),
+        migrations.AddField(
+            model_name='news',
+            name='simhash',
+            field=models.BigIntegerField(blank=True, help_text='64-bit SimHash of the title and description', null=True),
+        ),
+        migrations.AddField(
+            model_name='news',
+            name='story_id',
+            field=models.BigIntegerField(blank=True, db_index=True, help_text='SimHash of the first article seen for this story', null=True),
+        ),
+        migrations.CreateModel(
+            name='SimHashBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('value', models.PositiveIntegerField()),
+                ('story_id', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['band', 'value'], name='newsapp_sim_band_a356df_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,78 @@
+from django.db import migrations, models
+
+
+def backfill_link_hashes(apps, schema_editor):
+    """Hash every link, merging articles whose links canonicalize to the same one"""
+    from newsapp.canonical import link_hash
+
+    News = apps.get_model('newsapp', 'News')
+    SavedArticle = apps.get_model('newsapp', 'SavedArticle')
+    FacetCount = apps.get_model('newsapp', 'FacetCount')
+
+    kept = {}  # link hash -> id of the oldest article with it
+    duplicates = {}  # duplicate article id -> id of the article it merges into
+    last_id = 0
+    while True:
+        articles = list(News.objects.filter(id__gt=last_id).order_by('id').only('id', 'link')[:2000])
+        if not articles:
+            break
+        last_id = articles[-1].id
+
+        hashed = []
+        for article in articles:
+            h = link_hash(article.link)
+            if h in kept:
+                duplicates[article.id] = kept[h]
+            else:
+                kept[h] = article.id
+                article.link_hash = h
+                hashed.append(article)
+        News.objects.bulk_update(hashed, ['link_hash'])
+
+    if not duplicates:
+        return
+
+    # Move saves onto the surviving article unless the user already saved it
+    for duplicate_id, kept_id in duplicates.items():
+        already_saved = SavedArticle.objects.filter(news_id=kept_id).values_list('user_id', flat=True)
+        SavedArticle.objects.filter(news_id=duplicate_id).exclude(user_id__in=already_saved).update(news_id=kept_id)
+
+    duplicate_ids = list(duplicates)
+    for i in range(0, len(duplicate_ids), 500):
+        News.objects.filter(id__in=duplicate_ids[i:i + 500]).delete()
+
+    rows = (
+        News.objects.filter(is_duplicate=False)
+        .values('country', 'category').annotate(n=models.Count('id')).order_by()
+    )
+    FacetCount.objects.all().delete()
+    FacetCount.objects.bulk_create([
+        FacetCount(country=row['country'] or '', category_id=row['category'], count=row['n'])
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0007_news_dedup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='link_hash',
+            field=models.BigIntegerField(null=True, help_text='64-bit hash of the canonical link, used to detect duplicates'),
+        ),
+        migrations.RunPython(backfill_link_hashes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='news',
+            name='link_hash',
+            field=models.BigIntegerField(unique=True, help_text='64-bit hash of the canonical link, used to detect duplicates'),
+        ),
+        migrations.AlterField(
+            model_name='news',
+            name='link',
+            field=models.URLField(max_length=1000),
+        ),
+    ]
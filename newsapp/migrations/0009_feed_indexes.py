@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0008_news_link_hash'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='news',
+            name='newsapp_new_categor_862eb8_idx',
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(condition=models.Q(('is_duplicate', False)), fields=['published_date'], name='news_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(condition=models.Q(('is_duplicate', False)), fields=['category', 'published_date'], name='news_feed_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(condition=models.Q(('is_duplicate', False)), fields=['country', 'published_date'], name='news_feed_country_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(condition=models.Q(('is_duplicate', False)), fields=['category', 'country', 'published_date'], name='news_feed_cat_country_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='savedarticle',
+            index=models.Index(fields=['user', 'saved_at'], name='saved_user_saved_at_idx'),
+        ),
+    ]
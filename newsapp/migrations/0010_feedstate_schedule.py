@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0009_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedstate',
+            name='next_fetch_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='feedstate',
+            name='poll_interval',
+            field=models.FloatField(blank=True, help_text='Seconds between fetches, adapted to how often the source publishes', null=True),
+        ),
+    ]
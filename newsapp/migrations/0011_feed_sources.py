@@ -0,0 +1,93 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+# The sources that used to be hardcoded in views.py
+RSS_FEEDS = [
+    ('BBC', 'http://feeds.bbci.co.uk/news/rss.xml', 'World'),
+    ('TechCrunch', 'https://techcrunch.com/feed/', 'Technology'),
+    ('CNN', 'http://rss.cnn.com/rss/edition.rss', 'World'),
+    ('ESPN', 'https://www.espn.com/espn/rss/news', 'Sports'),
+    ('Guardian', 'https://www.theguardian.com/world/rss', 'World'),
+]
+NEWSAPI_CATEGORIES = ['technology', 'sports', 'business', 'entertainment', 'health', 'science']
+NEWSAPI_COUNTRIES = ['us', 'gb', 'in', 'ca', 'au', 'de', 'fr', 'jp', 'cn', 'br']
+
+
+def populate_feed_sources(apps, schema_editor):
+    FeedSource = apps.get_model('newsapp', 'FeedSource')
+    sources = [
+        FeedSource(kind='rss', name=name, url=url, category=category)
+        for name, url, category in RSS_FEEDS
+    ]
+    sources += [
+        FeedSource(kind='newsapi', name='NewsData.io', category=category, country=country)
+        for category in NEWSAPI_CATEGORIES
+        for country in NEWSAPI_COUNTRIES
+    ]
+    FeedSource.objects.bulk_create(sources)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0010_feedstate_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedFetch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fetched_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('latency_ms', models.FloatField(blank=True, help_text='Time to download the feed or page', null=True)),
+                ('bytes', models.PositiveIntegerField(default=0)),
+                ('entries', models.PositiveIntegerField(default=0, help_text='Entries in the downloaded document')),
+                ('inserted', models.PositiveIntegerField(default=0, help_text='New articles stored')),
+                ('parse_ms', models.FloatField(blank=True, help_text='Time to parse the document', null=True)),
+                ('errors', models.PositiveIntegerField(default=0)),
+                ('error', models.CharField(blank=True, help_text='Why the fetch failed, if it did', max_length=500)),
+            ],
+            options={
+                'ordering': ['-fetched_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='FeedSource',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('rss', 'RSS/Atom feed'), ('newsapi', 'NewsData.io page')], default='rss', max_length=10)),
+                ('name', models.CharField(help_text='Source name stored on RSS articles (e.g., BBC)', max_length=200)),
+                ('url', models.URLField(blank=True, help_text='Feed URL (RSS feeds only)', max_length=1000)),
+                ('category', models.CharField(help_text='Category for RSS articles, or the NewsData.io category to request', max_length=100)),
+                ('country', models.CharField(blank=True, help_text='NewsData.io country code to request (e.g., us, gb, in)', max_length=10)),
+                ('enabled', models.BooleanField(default=True)),
+                ('min_interval', models.PositiveIntegerField(blank=True, help_text='Never fetch this source more often than every N seconds', null=True)),
+                ('last_fetched_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['kind', 'name', 'category', 'country'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feedsource',
+            constraint=models.UniqueConstraint(condition=models.Q(('kind', 'rss')), fields=('url',), name='unique_rss_feed_url'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedsource',
+            constraint=models.UniqueConstraint(condition=models.Q(('kind', 'newsapi')), fields=('category', 'country'), name='unique_newsapi_page'),
+        ),
+        migrations.AddField(
+            model_name='feedfetch',
+            name='source',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fetches', to='newsapp.feedsource'),
+        ),
+        migrations.AddIndex(
+            model_name='feedfetch',
+            index=models.Index(fields=['source', 'fetched_at'], name='newsapp_fee_source__02c4d3_idx'),
+        ),
+        migrations.RunPython(populate_feed_sources, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0011_feed_sources'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedstate',
+            name='recent_links',
+            field=models.TextField(blank=True, help_text='Link hashes of the newest entries seen, where the next fetch stops reading'),
+        ),
+    ]
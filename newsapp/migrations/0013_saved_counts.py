@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def count_saved_articles(apps, schema_editor):
+    News = apps.get_model('newsapp', 'News')
+    SavedArticle = apps.get_model('newsapp', 'SavedArticle')
+    SavedCount = apps.get_model('newsapp', 'SavedCount')
+
+    saves = (
+        SavedArticle.objects.filter(news=models.OuterRef('pk'))
+        .order_by().values('news').annotate(n=models.Count('id')).values('n')
+    )
+    News.objects.filter(pk__in=SavedArticle.objects.values('news')).update(
+        save_count=models.Subquery(saves, output_field=models.PositiveIntegerField())
+    )
+    SavedCount.objects.bulk_create([
+        SavedCount(user_id=row['user'], count=row['n'])
+        for row in SavedArticle.objects.order_by().values('user').annotate(n=models.Count('id'))
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('newsapp', '0012_feedstate_recent_links'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedCount',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='saved_count', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='news',
+            name='save_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of users who saved this article'),
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(condition=models.Q(('is_duplicate', False)), fields=['save_count', 'published_date'], name='news_most_saved_idx'),
+        ),
+        migrations.RunPython(count_saved_articles, migrations.RunPython.noop),
+    ]
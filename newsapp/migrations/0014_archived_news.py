@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def install_search_index(apps, schema_editor):
+    from newsapp.search import ARCHIVE_TABLE, install_search_index
+    install_search_index(schema_editor.connection, rebuild=True, table=ARCHIVE_TABLE)
+
+
+def uninstall_search_index(apps, schema_editor):
+    from newsapp.search import ARCHIVE_TABLE, uninstall_search_index
+    uninstall_search_index(schema_editor.connection, table=ARCHIVE_TABLE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0013_saved_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedNews',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=500)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('link', models.URLField(max_length=1000)),
+                ('link_hash', models.BigIntegerField(unique=True)),
+                ('published_date', models.DateTimeField()),
+                ('image_url', models.URLField(blank=True, max_length=1000, null=True)),
+                ('source', models.CharField(max_length=200)),
+                ('country', models.CharField(blank=True, max_length=10, null=True)),
+                ('simhash', models.BigIntegerField(blank=True, null=True)),
+                ('story_id', models.BigIntegerField(blank=True, db_index=True, null=True)),
+                ('is_duplicate', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_news', to='newsapp.category')),
+            ],
+            options={
+                'verbose_name_plural': 'Archived news',
+                'ordering': ['-published_date'],
+                'indexes': [models.Index(condition=models.Q(('is_duplicate', False)), fields=['published_date'], name='archive_feed_idx'), models.Index(condition=models.Q(('is_duplicate', False)), fields=['category', 'published_date'], name='archive_feed_category_idx'), models.Index(condition=models.Q(('is_duplicate', False)), fields=['country', 'published_date'], name='archive_feed_country_idx')],
+            },
+        ),
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
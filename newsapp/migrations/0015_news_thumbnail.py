@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-17 19:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsapp', '0014_archived_news'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='thumbnail',
+            field=models.CharField(blank=True, help_text='SHA-256 of the source image, naming its cached thumbnail; empty if there is none, null until tried', max_length=64, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(condition=models.Q(('image_url__gt', ''), ('thumbnail__isnull', True)), fields=['published_date'], name='news_thumbnail_pending_idx'),
+        ),
+    ]
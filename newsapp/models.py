@@ -1,6 +1,10 @@
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
+from .canonical import link_hash
 
 
 class Category(models.Model):
@@ -22,27 +26,123 @@ class News(models.Model):
     """News articles from RSS feeds and NewsAPI"""
     title = models.CharField(max_length=500)
     description = models.TextField(blank=True, null=True)
-    link = models.URLField(max_length=1000, unique=True)
+    link = models.URLField(max_length=1000)
+    link_hash = models.BigIntegerField(unique=True, help_text='64-bit hash of the canonical link, used to detect duplicates')
     published_date = models.DateTimeField()
     image_url = models.URLField(max_length=1000, blank=True, null=True)
     source = models.CharField(max_length=200)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
     country = models.CharField(max_length=10, blank=True, null=True, db_index=True, help_text='ISO country code (e.g., us, gb, in)')
+    simhash = models.BigIntegerField(null=True, blank=True, help_text='64-bit SimHash of the title and description')
+    story_id = models.BigIntegerField(null=True, blank=True, db_index=True, help_text='SimHash of the first article seen for this story')
+    is_duplicate = models.BooleanField(default=False, help_text='Near-duplicate of an earlier article in the same story')
+    save_count = models.PositiveIntegerField(default=0, help_text='Number of users who saved this article')
+    thumbnail = models.CharField(max_length=64, null=True, blank=True, help_text='SHA-256 of the source image, naming its cached thumbnail; empty if there is none, null until tried')
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         verbose_name_plural = "News"
         ordering = ['-published_date']
         indexes = [
             models.Index(fields=['-published_date']),
-            models.Index(fields=['category']),
+            # Feed access paths. Partial indexes over the articles the feed
+            # shows (it always filters out near-duplicates), with the equality
+            # filters first and published_date last, so a newest-first page
+            # is an index range scan plus LIMIT. published_date is ascending
+            # on purpose: scanned backwards, ties come out in descending id
+            # (rowid) order, which matches the cursor ordering.
+            models.Index(fields=['published_date'], name='news_feed_idx', condition=models.Q(is_duplicate=False)),
+            models.Index(fields=['category', 'published_date'], name='news_feed_category_idx', condition=models.Q(is_duplicate=False)),
+            models.Index(fields=['country', 'published_date'], name='news_feed_country_idx', condition=models.Q(is_duplicate=False)),
+            models.Index(fields=['category', 'country', 'published_date'], name='news_feed_cat_country_idx', condition=models.Q(is_duplicate=False)),
+            # Most saved first, newest first among equals
+            models.Index(fields=['save_count', 'published_date'], name='news_most_saved_idx', condition=models.Q(is_duplicate=False)),
+            # Articles whose image fetch_thumbnails hasn't tried yet, newest first
+            models.Index(fields=['published_date'], name='news_thumbnail_pending_idx', condition=models.Q(thumbnail__isnull=True, image_url__gt='')),
+        ]
+
+    def __str__(self):
+        return self.title[:100]
+
+    def save(self, *args, **kwargs):
+        self.link_hash = link_hash(self.link)
+        super().save(*args, **kwargs)
+
+
+class ArchivedNews(models.Model):
+    """Articles moved out of ``News`` by the ``archive_news`` command
+
+    The same columns, keeping the original id, so the hot table only holds
+    recent articles and the older ones someone has saved. Searched and
+    listed only when a request asks for the archive.
+    """
+    # Always set from News; an auto field only so that on SQLite it is the
+    # rowid, which the feed indexes order ties by
+    id = models.BigAutoField(primary_key=True)
+    title = models.CharField(max_length=500)
+    description = models.TextField(blank=True, null=True)
+    link = models.URLField(max_length=1000)
+    link_hash = models.BigIntegerField(unique=True)
+    published_date = models.DateTimeField()
+    image_url = models.URLField(max_length=1000, blank=True, null=True)
+    source = models.CharField(max_length=200)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_news')
+    country = models.CharField(max_length=10, blank=True, null=True)
+    simhash = models.BigIntegerField(null=True, blank=True)
+    story_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    is_duplicate = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name_plural = "Archived news"
+        ordering = ['-published_date']
+        indexes = [
+            # The feed access paths of News, without the combined one
+            models.Index(fields=['published_date'], name='archive_feed_idx', condition=models.Q(is_duplicate=False)),
+            models.Index(fields=['category', 'published_date'], name='archive_feed_category_idx', condition=models.Q(is_duplicate=False)),
+            models.Index(fields=['country', 'published_date'], name='archive_feed_country_idx', condition=models.Q(is_duplicate=False)),
         ]
 
     def __str__(self):
         return self.title[:100]
 
 
+class FacetCount(models.Model):
+    """Materialized article counts per country and category for the home sidebar"""
+    country = models.CharField(max_length=10, blank=True, help_text='ISO country code, blank for articles without one')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['country', 'category']
+
+    def __str__(self):
+        return f"{self.country or '-'} / {self.category or '-'}: {self.count}"
+
+
+class SimHashBand(models.Model):
+    """LSH index: one row per band of each story's SimHash
+
+    Two signatures within the duplicate threshold always share at least one
+    band exactly, so candidates are found with an indexed equality lookup.
+    """
+    band = models.PositiveSmallIntegerField()
+    value = models.PositiveIntegerField()
+    story_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['band', 'value']),
+        ]
+
+    def __str__(self):
+        return f"band {self.band}={self.value} -> {self.story_id}"
+
+
 class SavedArticle(models.Model):
     """Articles saved by users for later reading"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_articles')
@@ -52,6 +152,117 @@ class SavedArticle(models.Model):
     class Meta:
         unique_together = ['user', 'news']
         ordering = ['-saved_at']
+        indexes = [
+            models.Index(fields=['user', 'saved_at'], name='saved_user_saved_at_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.news.title[:50]}"
+
+
+class SavedCount(models.Model):
+    """Materialized number of articles each user has saved, for the dashboard"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='saved_count')
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user.username}: {self.count}"
+
+
+class FeedSource(models.Model):
+    """An RSS/Atom feed or NewsData.io page the fetchers pull articles from
+
+    Managed from the admin: disabling a source or giving it a minimum
+    interval takes effect on the next fetch, without a deploy.
+    """
+    RSS = 'rss'
+    NEWSAPI = 'newsapi'
+    KIND_CHOICES = [
+        (RSS, 'RSS/Atom feed'),
+        (NEWSAPI, 'NewsData.io page'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default=RSS)
+    name = models.CharField(max_length=200, help_text='Source name stored on RSS articles (e.g., BBC)')
+    url = models.URLField(max_length=1000, blank=True, help_text='Feed URL (RSS feeds only)')
+    category = models.CharField(max_length=100, help_text='Category for RSS articles, or the NewsData.io category to request')
+    country = models.CharField(max_length=10, blank=True, help_text='NewsData.io country code to request (e.g., us, gb, in)')
+    enabled = models.BooleanField(default=True)
+    min_interval = models.PositiveIntegerField(null=True, blank=True, help_text='Never fetch this source more often than every N seconds')
+    last_fetched_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['kind', 'name', 'category', 'country']
+        constraints = [
+            models.UniqueConstraint(fields=['url'], condition=models.Q(kind='rss'), name='unique_rss_feed_url'),
+            models.UniqueConstraint(fields=['category', 'country'], condition=models.Q(kind='newsapi'), name='unique_newsapi_page'),
+        ]
+
+    def __str__(self):
+        if self.kind == self.NEWSAPI:
+            return f"{self.name} {self.category}/{self.country}"
+        return self.name
+
+    def clean(self):
+        if self.kind == self.RSS and not self.url:
+            raise ValidationError({'url': 'RSS feeds need a URL.'})
+        if self.kind == self.NEWSAPI and not self.country:
+            raise ValidationError({'country': 'NewsData.io pages need a country.'})
+
+    def is_throttled(self, now=None):
+        """Whether ``min_interval`` has not passed since the last fetch"""
+        if not self.min_interval or not self.last_fetched_at:
+            return False
+        return (now or timezone.now()) - self.last_fetched_at < timedelta(seconds=self.min_interval)
+
+
+class FeedFetch(models.Model):
+    """Measurements from one fetch of a feed source"""
+    source = models.ForeignKey(FeedSource, on_delete=models.CASCADE, related_name='fetches')
+    fetched_at = models.DateTimeField(default=timezone.now, db_index=True)
+    latency_ms = models.FloatField(null=True, blank=True, help_text='Time to download the feed or page')
+    bytes = models.PositiveIntegerField(default=0)
+    entries = models.PositiveIntegerField(default=0, help_text='Entries in the downloaded document')
+    inserted = models.PositiveIntegerField(default=0, help_text='New articles stored')
+    parse_ms = models.FloatField(null=True, blank=True, help_text='Time to parse the document')
+    errors = models.PositiveIntegerField(default=0)
+    error = models.CharField(max_length=500, blank=True, help_text='Why the fetch failed, if it did')
+
+    class Meta:
+        ordering = ['-fetched_at']
+        indexes = [
+            models.Index(fields=['source', 'fetched_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.source} at {self.fetched_at:%Y-%m-%d %H:%M}"
+
+
+class FeedState(models.Model):
+    """Fetch state remembered for each source between fetches
+
+    RSS feeds keep their conditional-request validators and the links of
+    their newest entries (see ``iter_feed_entries``) here. The polling
+    schedule used by ``fetch_news --daemon`` is kept for both RSS feeds and
+    NewsData.io pages (whose ``url`` is the request URL without the API key).
+    """
+    url = models.URLField(max_length=1000, unique=True)
+    etag = models.CharField(max_length=500, blank=True)
+    last_modified = models.CharField(max_length=100, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, help_text='SHA-256 of the last downloaded feed body')
+    recent_links = models.TextField(blank=True, help_text='Link hashes of the newest entries seen, where the next fetch stops reading')
+    last_success_at = models.DateTimeField(null=True, blank=True)
+    last_checked_at = models.DateTimeField(null=True, blank=True)
+    poll_interval = models.FloatField(null=True, blank=True, help_text='Seconds between fetches, adapted to how often the source publishes')
+    next_fetch_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['url']
+
+    def __str__(self):
+        return self.url
+
+    def known_links(self):
+        """The ``link_hash`` values kept in ``recent_links``"""
+        return {int(value) for value in self.recent_links.split()}
@@ -0,0 +1,68 @@
+import copy
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.paginator import Page
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.http import urlencode
+
+from .models import News
+
+VERSION_KEY = 'news-version'
+
+# Query parameters that change what the home page shows; anything else
+# (tracking parameters and the like) is ignored when building cache keys
+HOME_CACHE_PARAMS = ['category', 'country', 'search', 'archive', 'page', 'after', 'before']
+
+
+def page_cache():
+    return caches[getattr(settings, 'PAGE_CACHE_ALIAS', 'default')]
+
+
+def news_version():
+    """Return the current content version, shared by every process using the cache"""
+    # A fresh timestamp (rather than 1) if the key was evicted, so entries
+    # cached under an older version can never be served again
+    return page_cache().get_or_set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def bump_news_version():
+    """Invalidate every cached page by moving to a new content version"""
+    page_cache().set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def home_cache_key(params, suffix='context'):
+    """Build a versioned cache key from the home page's query parameters
+
+    Values are kept exactly as given, since the views filter on and render
+    them as-is; normalizing them here would let pages that differ share an
+    entry.
+    """
+    query = sorted((name, params[name]) for name in HOME_CACHE_PARAMS if name in params)
+    digest = hashlib.sha1(urlencode(query).encode()).hexdigest()
+    return f'home:{news_version()}:{digest}:{suffix}'
+
+
+def freeze_page(page):
+    """Return a picklable copy of a ``Page`` that won't re-query when cached
+
+    Pickling a ``Page`` as-is would pickle (and so evaluate) the paginator's
+    full queryset. The copy keeps the already computed count and page total
+    but drops the queryset.
+    """
+    if not isinstance(page, Page):
+        return page
+    page.paginator.num_pages  # computes and caches count as well
+    paginator = copy.copy(page.paginator)
+    paginator.object_list = []
+    return Page(list(page.object_list), page.number, paginator)
+
+
+@receiver(post_save, sender=News)
+@receiver(post_delete, sender=News)
+def _invalidate_on_news_change(sender, raw=False, **kwargs):
+    if not raw:
+        bump_news_version()
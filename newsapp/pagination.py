@@ -0,0 +1,107 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class CursorPage:
+    """One page of results from a ``KeysetPaginator``"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Paginate a queryset newest-first on ``(key_field, id)`` using cursors
+
+    Unlike ``Paginator`` this never counts the queryset and never uses
+    OFFSET: each page is an indexed range scan starting just past the cursor,
+    so deep pages cost the same as the first one. ``key_field`` must be a
+    non-null datetime field.
+    """
+
+    def __init__(self, queryset, per_page, key_field):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.key_field = key_field
+
+    @staticmethod
+    def make_cursor(value, pk):
+        raw = f"{value.isoformat()}|{pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def encode_cursor(self, obj):
+        return self.make_cursor(getattr(obj, self.key_field), obj.pk)
+
+    def decode_cursor(self, cursor):
+        """Return ``(key, id)`` for a cursor, or ``None`` if it is invalid"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+            key, pk = raw.rsplit('|', 1)
+            return datetime.fromisoformat(key), int(pk)
+        except (ValueError, TypeError):
+            return None
+
+    def rows_after(self, after=None):
+        """Return the queryset ordered newest-first, starting after cursor ``after``"""
+        key = self.key_field
+        queryset = self.queryset.order_by(f'-{key}', '-pk')
+        position = self.decode_cursor(after) if after else None
+        if position is not None:
+            value, pk = position
+            # Same as key < value OR (key = value AND pk < pk), but written so
+            # the key condition is a plain range the index can seek to
+            queryset = queryset.filter(Q(**{f'{key}__lte': value}), Q(**{f'{key}__lt': value}) | Q(pk__lt=pk))
+        return queryset
+
+    def get_page(self, after=None, before=None):
+        """Return the page following cursor ``after`` or preceding ``before``
+
+        With neither (or an invalid cursor) the first page is returned.
+        """
+        key = self.key_field
+        position = self.decode_cursor(before) if before else None
+
+        if position is not None:
+            value, pk = position
+            rows = list(
+                self.queryset.filter(Q(**{f'{key}__gte': value}), Q(**{f'{key}__gt': value}) | Q(pk__gt=pk))
+                .order_by(key, 'pk')[:self.per_page + 1]
+            )
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return CursorPage(
+                rows,
+                next_cursor=self.encode_cursor(rows[-1]) if rows else None,
+                previous_cursor=self.encode_cursor(rows[0]) if has_more else None,
+            )
+
+        position = self.decode_cursor(after) if after else None
+        rows = list(self.rows_after(after)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        return CursorPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1]) if has_more else None,
+            previous_cursor=self.encode_cursor(rows[0]) if position is not None and rows else None,
+        )
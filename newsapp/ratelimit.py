@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+
+class TokenBucket:
+    """Token-bucket rate limiter
+
+    Asyncio code waits with ``acquire()``; threads use ``try_acquire()``.
+    """
+
+    def __init__(self, rate, capacity=1):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = None
+        self._thread_lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        """Take a token and return 0, or return the seconds until one may be available"""
+        with self._thread_lock:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                return self.blocked_until - now
+
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            while True:
+                wait = self.try_acquire()
+                if not wait:
+                    return
+                await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        """Stop handing out tokens for ``seconds`` (e.g. after a 429)"""
+        with self._thread_lock:
+            now = time.monotonic()
+            self.blocked_until = max(self.blocked_until, now + seconds)
+            self.tokens = 0.0
+            self.updated = max(self.updated, self.blocked_until)
+
+
+def parse_retry_after(value, default):
+    """Return the delay in seconds requested by a ``Retry-After`` header
+
+    The header may be either a number of seconds or an HTTP date. Missing or
+    malformed values fall back to ``default``.
+    """
+    if not value:
+        return default
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if retry_at is None:
+        return default
+
+    now = datetime.now(retry_at.tzinfo)
+    return max(0.0, (retry_at - now).total_seconds())
@@ -0,0 +1,114 @@
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, PositiveIntegerField, Subquery
+
+from .models import News, SavedArticle, SavedCount
+
+
+def _adjust_user_count(user, delta):
+    counts = SavedCount.objects.filter(user=user)
+    if delta < 0:
+        counts = counts.filter(count__gte=-delta)
+    if not counts.update(count=F('count') + delta):
+        # No counter yet, or one that has drifted: count the user's rows once
+        SavedCount.objects.update_or_create(
+            user=user, defaults={'count': SavedArticle.objects.filter(user=user).count()}
+        )
+
+
+def save_for_user(user, news_id):
+    """Save an article for ``user``; returns False if it was already saved
+
+    The article's ``save_count`` and the user's ``SavedCount`` are updated
+    in the same transaction, with ``F()`` expressions so concurrent saves
+    don't lose counts.
+    """
+    with transaction.atomic():
+        _, created = SavedArticle.objects.get_or_create(user=user, news_id=news_id)
+        if created:
+            News.objects.filter(pk=news_id).update(save_count=F('save_count') + 1)
+            _adjust_user_count(user, 1)
+    return created
+
+
+def unsave_for_user(user, news_id):
+    """Remove an article from ``user``'s saved list; returns False if it wasn't saved"""
+    with transaction.atomic():
+        deleted, _ = SavedArticle.objects.filter(user=user, news_id=news_id).delete()
+        if deleted:
+            News.objects.filter(pk=news_id, save_count__gt=0).update(save_count=F('save_count') - 1)
+            _adjust_user_count(user, -1)
+    return bool(deleted)
+
+
+def apply_saved_changes(user, changes):
+    """Apply a batch of saves and unsaves for ``user`` in one transaction
+
+    ``changes`` maps article ids to ``'save'`` or ``'unsave'``. Returns the
+    ids to save that don't exist as ``missing``.
+    """
+    save_ids = [news_id for news_id, action in changes.items() if action == 'save']
+    unsave_ids = [news_id for news_id, action in changes.items() if action == 'unsave']
+    missing = []
+    added = removed = ()
+
+    with transaction.atomic():
+        if save_ids:
+            rows = (
+                News.objects.filter(pk__in=save_ids)
+                .annotate(saved=Exists(SavedArticle.objects.filter(user=user, news=OuterRef('pk'))))
+                .values_list('pk', 'saved')
+            )
+            existing = dict(rows)
+            missing = sorted(set(save_ids) - existing.keys())
+            added = [news_id for news_id, saved in existing.items() if not saved]
+            if added:
+                saves = [SavedArticle(user=user, news_id=news_id) for news_id in added]
+                SavedArticle.objects.bulk_create(saves, ignore_conflicts=True)
+                # Articles another request saved since the lookup above were
+                # skipped by the insert; the rows with our saved_at are ours
+                stored = dict(
+                    SavedArticle.objects.filter(user=user, news_id__in=added).values_list('news_id', 'saved_at')
+                )
+                added = [save.news_id for save in saves if stored.get(save.news_id) == save.saved_at]
+            if added:
+                News.objects.filter(pk__in=added).update(save_count=F('save_count') + 1)
+        if unsave_ids:
+            saves = SavedArticle.objects.filter(user=user, news_id__in=unsave_ids)
+            removed = list(saves.values_list('news_id', flat=True))
+            if removed:
+                SavedArticle.objects.filter(user=user, news_id__in=removed).delete()
+                News.objects.filter(pk__in=removed, save_count__gt=0).update(save_count=F('save_count') - 1)
+        if len(added) != len(removed):
+            _adjust_user_count(user, len(added) - len(removed))
+
+    return {'added': len(added), 'removed': len(removed), 'missing': missing}
+
+
+def get_saved_count(user):
+    """Number of articles ``user`` has saved, without counting their rows"""
+    count = SavedCount.objects.filter(user=user).values_list('count', flat=True).first()
+    if count is None:
+        count = SavedArticle.objects.filter(user=user).count()
+    return count
+
+
+def rebuild_saved_counts():
+    """Recompute ``News.save_count`` and ``SavedCount`` from ``SavedArticle``
+
+    For saves added or removed outside ``save_for_user``/``unsave_for_user``
+    (the admin, bulk imports, deleted users).
+    """
+    saves = (
+        SavedArticle.objects.filter(news=OuterRef('pk'))
+        .order_by().values('news').annotate(n=Count('id')).values('n')
+    )
+    with transaction.atomic():
+        News.objects.filter(save_count__gt=0).update(save_count=0)
+        News.objects.filter(pk__in=SavedArticle.objects.values('news')).update(
+            save_count=Subquery(saves, output_field=PositiveIntegerField())
+        )
+        SavedCount.objects.all().delete()
+        SavedCount.objects.bulk_create([
+            SavedCount(user_id=row['user'], count=row['n'])
+            for row in SavedArticle.objects.order_by().values('user').annotate(n=Count('id'))
+        ])
@@ -0,0 +1,220 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from .fetchers import (
+    NEWSAPI_URL, RateLimited, download_feed, newsapi_bucket, record_download,
+    remember_validators, request_newsapi_page, store_feed_entries, store_newsapi_page,
+)
+from .ingest import IngestBatch
+from .models import FeedSource, FeedState
+from .sources import new_fetch, record_fetches
+
+# New articles we aim to find per poll; a source publishing faster than this
+# is polled more often, a slower one less often
+TARGET_NEW_PER_POLL = 3
+
+# Longest a single wait may block, so a stop request is noticed promptly
+MAX_WAIT = 1.0
+
+# How often the list of sources is reloaded, so sources added, disabled or
+# throttled in the admin are picked up without a restart
+SOURCE_REFRESH = 60
+
+
+def next_poll_interval(interval, new_entries, elapsed, min_interval, max_interval):
+    """Adapt a source's polling interval to its observed publish rate
+
+    Moves halfway towards the interval that would have found
+    ``TARGET_NEW_PER_POLL`` new entries, within the bounds.
+    """
+    if elapsed is None:
+        # First poll: whatever a new source returns is backlog, not a rate
+        ideal = interval
+    elif new_entries:
+        ideal = elapsed / new_entries * TARGET_NEW_PER_POLL
+    else:
+        ideal = interval * 2
+    interval = (interval + ideal) / 2
+    return min(max_interval, max(min_interval, interval))
+
+
+class FeedScheduler:
+    """Poll feed sources, each on its own adaptive schedule
+
+    Sources wait in a priority queue ordered by when they are next due, and
+    their schedule is kept in ``FeedState``. ``run()`` blocks until
+    ``stop()`` is called.
+    """
+
+    def __init__(self, load_sources, max_workers, timeout, newsapi_rate=None, log=print):
+        self.load_sources = load_sources
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.log = log
+        self.min_interval = getattr(settings, 'FEED_POLL_MIN_INTERVAL', 300)
+        self.max_interval = getattr(settings, 'FEED_POLL_MAX_INTERVAL', 6 * 3600)
+        self.default_interval = getattr(settings, 'FEED_POLL_DEFAULT_INTERVAL', 1800)
+        self.newsapi_min_interval = getattr(settings, 'NEWSAPI_POLL_MIN_INTERVAL', 3600)
+        self.newsapi_bucket = newsapi_bucket(newsapi_rate)
+        self.newsapi_url = getattr(settings, 'NEWSAPI_URL', NEWSAPI_URL)
+        self.polls = 0
+        self._stopping = threading.Event()
+        self._queue = []
+        self._order = itertools.count()
+        self._sources = {}
+        self._refreshed_at = 0.0
+
+    def stop(self, *args):
+        """Ask ``run()`` to finish; safe to use as a signal handler"""
+        self._stopping.set()
+
+    def state_url(self, feed):
+        """The ``FeedState`` key of a source: its feed or request URL"""
+        if feed.kind == FeedSource.RSS:
+            return feed.url
+        return f"{self.newsapi_url}?{urlencode({'category': feed.category, 'country': feed.country})}"
+
+    def schedule(self, source, delay):
+        heapq.heappush(self._queue, (time.monotonic() + max(0.0, delay), next(self._order), source))
+
+    def refresh_sources(self):
+        """Start polling new sources, stop polling removed ones, update the rest"""
+        self._refreshed_at = time.monotonic()
+        feeds = {feed.pk: feed for feed in self.load_sources()}
+
+        for pk in list(self._sources):
+            if pk not in feeds:
+                # Skipped when it next comes out of the queue
+                self._sources.pop(pk)['removed'] = True
+        for pk, feed in feeds.items():
+            if pk in self._sources:
+                self._sources[pk]['feed'] = feed
+
+        added = [
+            {'feed': feed, 'url': self.state_url(feed), 'removed': False}
+            for pk, feed in feeds.items() if pk not in self._sources
+        ]
+        states = FeedState.objects.in_bulk([source['url'] for source in added], field_name='url')
+        now = timezone.now()
+        for source in added:
+            source['state'] = state = states.get(source['url']) or FeedState(url=source['url'])
+            self._sources[source['feed'].pk] = source
+            delay = (state.next_fetch_at - now).total_seconds() if state.next_fetch_at else 0
+            self.schedule(source, delay)
+        return len(self._sources)
+
+    def run(self):
+        self.refresh_sources()
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while not self._stopping.is_set():
+                if time.monotonic() - self._refreshed_at > SOURCE_REFRESH:
+                    close_old_connections()
+                    self.refresh_sources()
+                self._submit_due(executor, running)
+
+                wait_for = MAX_WAIT
+                if self._queue and len(running) < self.max_workers:
+                    wait_for = min(wait_for, max(0.0, self._queue[0][0] - time.monotonic()))
+                if running:
+                    done, _ = wait(running, timeout=wait_for, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._complete(running.pop(future), future)
+                else:
+                    self._stopping.wait(wait_for)
+
+            if running:
+                self.log(f'Stopping; waiting for {len(running)} downloads in flight...')
+            for future in list(running):
+                future.exception()
+                self._complete(running.pop(future), future)
+
+    def _submit_due(self, executor, running):
+        now = time.monotonic()
+        while self._queue and self._queue[0][0] <= now and len(running) < self.max_workers:
+            _, _, source = heapq.heappop(self._queue)
+            if source['removed']:
+                continue
+            if source['feed'].kind == FeedSource.NEWSAPI:
+                wait_for = self.newsapi_bucket.try_acquire()
+                if wait_for:
+                    # Over the request rate (or paused by a 429): try again then
+                    self.schedule(source, wait_for)
+                    continue
+            running[executor.submit(self._download, source)] = source
+
+    def _download(self, source):
+        """Download a due source's feed or NewsData.io page, for ``_complete`` to store"""
+        feed = source['feed']
+        if feed.kind == FeedSource.RSS:
+            return download_feed(feed, self.timeout, source['state'])
+
+        started = time.monotonic()
+        response = request_newsapi_page(feed, self.newsapi_bucket, self.newsapi_url, timeout=self.timeout)
+        return {'response': response, 'latency': time.monotonic() - started}
+
+    def _complete(self, source, future):
+        close_old_connections()
+        feed = source['feed']
+        state = source['state']
+        previous_check = state.last_checked_at
+        state.last_checked_at = checked_at = timezone.now()
+        interval = state.poll_interval or self.default_interval
+        min_interval = self.newsapi_min_interval if feed.kind == FeedSource.NEWSAPI else self.min_interval
+        min_interval = max(min_interval, feed.min_interval or 0)
+        max_interval = max(self.max_interval, min_interval)
+        fetch = new_fetch(feed)
+        batch = IngestBatch()
+        delay = None
+        self.polls += 1
+
+        try:
+            result = future.result()
+            if feed.kind == FeedSource.RSS:
+                record_download(fetch, result)
+                entries = result['entries']
+                if entries is not None:
+                    fetch.entries = len(entries)
+                    fetch.errors = store_feed_entries(entries, feed, batch)
+            else:
+                fetch.latency_ms = result['latency'] * 1000
+                store_newsapi_page(result['response'], feed, batch, fetch)
+            batch.flush()
+        except RateLimited as e:
+            # Not the source's fault, so no back-off: it goes again once the pause is over
+            fetch.errors += 1
+            fetch.error = str(e)
+            state.last_checked_at = previous_check
+            delay = e.delay
+            self.log(f"{source['url']}: rate limited, holding NewsData.io requests for {delay:.0f}s")
+        except Exception as e:
+            # Back off from a failing source rather than hammering it
+            interval = min(max_interval, max(min_interval, interval * 2))
+            fetch.errors += 1
+            fetch.error = str(e)
+            self.log(f"{source['url']}: {e}; retrying in {interval / 60:.0f} min")
+        else:
+            if feed.kind == FeedSource.RSS:
+                remember_validators(state, result)
+            else:
+                state.last_success_at = checked_at
+            elapsed = (checked_at - previous_check).total_seconds() if previous_check else None
+            interval = next_poll_interval(interval, batch.inserted, elapsed, min_interval, max_interval)
+            self.log(f"{source['url']}: {batch.inserted} new, next poll in {interval / 60:.0f} min")
+
+        if delay is None:
+            delay = interval
+        state.poll_interval = interval
+        state.next_fetch_at = checked_at + timedelta(seconds=delay)
+        state.save()
+        record_fetches([fetch], batch)
+        self.schedule(source, delay)
@@ -0,0 +1,185 @@
+import re
+from functools import lru_cache
+
+from django.db import connection, connections
+from django.db.models import Q
+
+# Tables with a full-text index: the hot news table and its archive
+NEWS_TABLE = 'newsapp_news'
+ARCHIVE_TABLE = 'newsapp_archivednews'
+
+
+# SQLite: an external-content FTS5 table over title/description, kept in sync
+# by triggers. The prefix index makes the "search as you type" prefix match
+# on the last word cheap.
+def _fts_table(table):
+    return f'{table}_fts'
+
+
+def _sqlite_install(table):
+    fts = _fts_table(table)
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            title, description, content='{table}', content_rowid='id', prefix='2 3'
+        )""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts}(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF title, description ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO {fts}(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END""",
+    ]
+
+
+def _sqlite_uninstall(table):
+    fts = _fts_table(table)
+    return [
+        f"DROP TRIGGER IF EXISTS {fts}_ai",
+        f"DROP TRIGGER IF EXISTS {fts}_ad",
+        f"DROP TRIGGER IF EXISTS {fts}_au",
+        f"DROP TABLE IF EXISTS {fts}",
+    ]
+
+
+# PostgreSQL: a GIN expression index; searches must use the same expression
+def _postgres_document(table):
+    return f"to_tsvector('english'::regconfig, coalesce({table}.title, '') || ' ' || coalesce({table}.description, ''))"
+
+
+def _postgres_install(table):
+    return [f"CREATE INDEX IF NOT EXISTS {table}_search_idx ON {table} USING GIN ({_postgres_document(table)})"]
+
+
+def _postgres_uninstall(table):
+    return [f"DROP INDEX IF EXISTS {table}_search_idx"]
+
+
+SEARCH_TERM_RE = re.compile(r'\w+')
+
+
+# Per connection alias: the SQLite library doesn't change while the process
+# runs, so this is only asked once rather than on every search
+@lru_cache(maxsize=None)
+def _sqlite_has_fts5(alias):
+    with connections[alias].cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if cursor.fetchone()[0]:
+            return True
+        # Builds with FTS5 loaded as a module don't report the compile option
+        cursor.execute("SELECT 1 FROM pragma_module_list WHERE name = 'fts5'")
+        return cursor.fetchone() is not None
+
+
+def search_backend(conn=None):
+    """Return 'sqlite', 'postgresql' or None if no full-text index is usable"""
+    conn = conn or connection
+    if conn.vendor == 'postgresql':
+        return 'postgresql'
+    if conn.vendor == 'sqlite' and _sqlite_has_fts5(conn.alias):
+        return 'sqlite'
+    return None
+
+
+def install_search_index(conn=None, rebuild=False, table=NEWS_TABLE):
+    """Create the full-text index on ``table`` (idempotent), optionally re-indexing every row"""
+    conn = conn or connection
+    backend = search_backend(conn)
+    if backend is None:
+        return
+
+    with conn.cursor() as cursor:
+        if backend == 'sqlite':
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+                [f'{_fts_table(table)}_a_'],
+            )
+            # Rebuilding the table (as SQLite schema changes do) drops the
+            # triggers, and with them any guarantee the index is current
+            rebuild = rebuild or cursor.fetchone()[0] < 3
+            for sql in _sqlite_install(table):
+                cursor.execute(sql)
+            if rebuild:
+                fts = _fts_table(table)
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+        else:
+            for sql in _postgres_install(table):
+                cursor.execute(sql)
+
+
+def uninstall_search_index(conn=None, table=NEWS_TABLE):
+    conn = conn or connection
+    statements = {'sqlite': _sqlite_uninstall, 'postgresql': _postgres_uninstall}.get(search_backend(conn))
+    with conn.cursor() as cursor:
+        for sql in statements(table) if statements else []:
+            cursor.execute(sql)
+
+
+def _sqlite_match_expression(terms):
+    # Every term must match; the last one also matches as a prefix so
+    # partially typed words still find results
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search_news(queryset, query):
+    """Filter a ``News`` or ``ArchivedNews`` queryset to articles matching ``query``, best match first
+
+    Uses the full-text index when the database has one and falls back to a
+    ``LIKE`` scan otherwise. Any filters already on ``queryset`` still apply.
+    """
+    terms = SEARCH_TERM_RE.findall(query)
+    backend = search_backend() if terms else None
+    table = queryset.model._meta.db_table
+
+    if backend == 'sqlite':
+        fts = _fts_table(table)
+        return queryset.extra(
+            tables=[fts],
+            where=[
+                f'{fts}.rowid = {table}.id',
+                f'{fts} MATCH %s',
+            ],
+            params=[_sqlite_match_expression(terms)],
+            # bm25() is lower for better matches
+            select={'search_rank': f'bm25({fts})'},
+            order_by=['search_rank', '-published_date'],
+        )
+
+    if backend == 'postgresql':
+        document = _postgres_document(table)
+        tsquery = "websearch_to_tsquery('english'::regconfig, %s)"
+        return queryset.extra(
+            where=[f'{document} @@ {tsquery}'],
+            params=[query],
+            select={'search_rank': f'ts_rank({document}, {tsquery})'},
+            select_params=[query],
+            order_by=['-search_rank', '-published_date'],
+        )
+
+    return queryset.filter(
+        Q(title__icontains=query) |
+        Q(description__icontains=query)
+    )
+
+
+def ensure_search_index(sender, using='default', **kwargs):
+    """post_migrate hook: restore the SQLite triggers if a schema change dropped them
+
+    Does nothing for a table until the migration creating its index has run.
+    """
+    conn = connections[using]
+    if search_backend(conn) != 'sqlite':
+        return
+    tables = conn.introspection.table_names()
+    for table in (NEWS_TABLE, ARCHIVE_TABLE):
+        if _fts_table(table) in tables:
+            install_search_index(conn, table=table)
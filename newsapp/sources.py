@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+
+from .models import FeedFetch, FeedSource
+
+# How long per-fetch measurements are kept, and the window the admin's
+# rolling aggregates cover
+FETCH_HISTORY = timedelta(days=7)
+STATS_WINDOW = timedelta(hours=24)
+
+
+def enabled_sources(kind, names=None):
+    """Enabled sources of ``kind``, optionally only those called one of ``names``"""
+    sources = FeedSource.objects.filter(kind=kind, enabled=True)
+    if names:
+        sources = sources.filter(name__in=names)
+    return list(sources)
+
+
+def due_sources(kind, names=None):
+    """Like ``enabled_sources``, minus those fetched within their ``min_interval``"""
+    now = timezone.now()
+    return [source for source in enabled_sources(kind, names) if not source.is_throttled(now)]
+
+
+def new_fetch(source):
+    """An unsaved ``FeedFetch`` for ``source``, filled in as the fetch goes"""
+    return FeedFetch(source=source, fetched_at=timezone.now())
+
+
+def record_fetches(fetches, batch):
+    """Store the measurements of finished fetches
+
+    Call after ``batch`` has been flushed, so its per-source insert counts
+    (the batch's ``inserted_by_origin``, keyed by source id) are final. Also
+    drops measurements older than ``FETCH_HISTORY``.
+    """
+    if not fetches:
+        return
+    now = timezone.now()
+    for fetch in fetches:
+        fetch.inserted = batch.inserted_by_origin.get(fetch.source_id, 0)
+        fetch.error = fetch.error[:500]
+    FeedFetch.objects.bulk_create(fetches)
+    FeedSource.objects.filter(pk__in=[fetch.source_id for fetch in fetches]).update(last_fetched_at=now)
+    FeedFetch.objects.filter(fetched_at__lt=now - FETCH_HISTORY).delete()
+
+
+def with_fetch_stats(queryset, window=STATS_WINDOW):
+    """Annotate sources with aggregates over their fetches in the last ``window``"""
+    recent = Q(fetches__fetched_at__gte=timezone.now() - window)
+    return queryset.annotate(
+        fetch_count=Count('fetches', filter=recent),
+        avg_latency_ms=Avg('fetches__latency_ms', filter=recent),
+        avg_bytes=Avg('fetches__bytes', filter=recent),
+        avg_entries=Avg('fetches__entries', filter=recent),
+        inserted_total=Sum('fetches__inserted', filter=recent),
+        avg_parse_ms=Avg('fetches__parse_ms', filter=recent),
+        error_total=Sum('fetches__errors', filter=recent),
+    )
@@ -1,3 +1,1213 @@
-from django.test import TestCase
+import io
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.http import Http404
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import async_views, views
+from .archive import archive_batch
+from .benchmark import BENCH_LINK_PREFIX, BENCH_SOURCE, INGEST_BENCH_SOURCE, WORDS
+from .canonical import canonical_key, clean_url, link_hash
+from .dedup import assign_stories, simhash
+from .facets import get_facet_counts, rebuild_facet_counts
+from .fakefeeds import FakeFeedServer
+from .feedstream import iter_feed_entries
+from .fetchers import NEWSAPI_MAX_RETRIES, RSS_ENTRY_LIMIT, download_feed, fetch_newsapi, fetch_rss_feeds
+from .ingest import IngestBatch
+from .normalize import feed_entry_fields, newsapi_article_fields, parse_date, strip_html
+from .models import (
+    ArchivedNews, Category, FeedFetch, FeedSource, FeedState, News, SavedArticle, SavedCount, SimHashBand,
+)
+from .pagination import KeysetPaginator
+from .saved import get_saved_count, rebuild_saved_counts, save_for_user
+from .scheduler import FeedScheduler
+from .metrics import PROCESSES_KEY, Registry, RequestTiming, RequestTimingMiddleware, metrics_cache, registry
+from .pagecache import page_cache
+from .thumbnails import check_image_url, evict_thumbnails, fetch_thumbnails
+
+
+# Every request reaches the views: no page cache, no static file manifest
+TEST_SETTINGS = {
+    'CACHES': {
+        'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+        'pages': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+        'metrics': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    },
+    'STATICFILES_STORAGE': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+}
+
+
+@override_settings(**TEST_SETTINGS)
+class IsolatedTestCase(SimpleTestCase):
+    """Keeps the caches out of the working tree; listed before ``TestCase`` or ``TransactionTestCase``"""
+
+
+def create_news(count, **fields):
+    """Bulk-create ``count`` articles, the ``i``-th published ``i`` minutes ago
+
+    ``fields`` override the defaults; a callable is called with ``i``.
+    """
+    now = timezone.now()
+    articles = []
+    for i in range(count):
+        values = {
+            'title': f'Headline number {i}',
+            'description': 'Something happened somewhere',
+            'link': f'https://example.com/story/{i}',
+            'link_hash': i,
+            'source': 'Example',
+            'published_date': now - timedelta(minutes=i),
+        }
+        values.update((name, value(i) if callable(value) else value) for name, value in fields.items())
+        articles.append(News(**values))
+    return News.objects.bulk_create(articles)
+
+
+class FeedTestCase(IsolatedTestCase, TestCase):
+    """60 articles over two categories and three countries, and a logged-in reader who saved 20"""
+
+    TABLES = ('newsapp_news', 'newsapp_savedarticle', 'newsapp_archivednews')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Technology', slug='technology')
+        other = Category.objects.create(name='Sports', slug='sports')
+        now = timezone.now()
+        create_news(
+            60,
+            category=lambda i: cls.category if i % 2 else other,
+            country=lambda i: ['us', 'in', 'gb'][i % 3],
+            published_date=lambda i: now - timedelta(minutes=i // 2),
+            is_duplicate=lambda i: i % 10 == 0,
+        )
+        cls.user = User.objects.create_user('reader', password='secret')
+        SavedArticle.objects.bulk_create([
+            SavedArticle(user=cls.user, news=news)
+            for news in News.objects.all()[:20]
+        ])
+        newest = News.objects.filter(is_duplicate=False).order_by('-published_date', '-pk')[5]
+        cls.cursor = KeysetPaginator.make_cursor(newest.published_date, newest.pk)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertIndexedPlans(self, url, allow_sort=False):
+        """Fail if a query run by ``url`` scans a whole feed table or sorts outside an index"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+
+        checked = 0
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not any(f'"{table}"' in sql for table in self.TABLES):
+                continue
+            if sql.startswith(('INSERT', 'UPDATE', 'DELETE', 'SAVEPOINT', 'RELEASE')):
+                continue
+            # captured_queries holds the SQL with its parameters interpolated,
+            # so it can be explained as-is
+            plan = self.explain(sql, ())
+            checked += 1
+            for step in plan:
+                for table in self.TABLES:
+                    # COUNT(*) has to visit every matching row anyway
+                    if step == f'SCAN {table}' and 'COUNT(' not in sql:
+                        self.fail(f'{url}: full scan of {table}\n{sql}\n{plan}')
+                if 'TEMP B-TREE' in step and not allow_sort:
+                    self.fail(f'{url}: rows sorted outside an index\n{sql}\n{plan}')
+        self.assertTrue(checked, f'{url}: no feed queries were captured')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'query plans are checked on SQLite')
+class FeedQueryPlanTests(FeedTestCase):
+    """Guard the feed and dashboard queries against full scans and sorts
+
+    Every query the views run against the news and saved-article tables is
+    put through EXPLAIN QUERY PLAN. A page query that scans the whole table
+    or sorts its rows in a temporary B-tree means an index from the Meta
+    classes is no longer being used, and the page gets slower as the table
+    grows.
+    """
+
+    def test_home_feed(self):
+        self.assertIndexedPlans(reverse('home'))
+
+    def test_home_filtered_by_category(self):
+        self.assertIndexedPlans(f"{reverse('home')}?category={self.category.pk}")
+
+    def test_home_filtered_by_country(self):
+        self.assertIndexedPlans(f"{reverse('home')}?country=us")
+
+    def test_home_filtered_by_category_and_country(self):
+        self.assertIndexedPlans(f"{reverse('home')}?category={self.category.pk}&country=in")
+
+    def test_home_cursor_pages(self):
+        self.assertIndexedPlans(f"{reverse('home')}?after={self.cursor}")
+        self.assertIndexedPlans(f"{reverse('home')}?before={self.cursor}")
+        self.assertIndexedPlans(f"{reverse('home')}?category={self.category.pk}&country=us&after={self.cursor}")
+
+    def test_home_numbered_page(self):
+        self.assertIndexedPlans(f"{reverse('home')}?page=2")
+
+    def test_home_search(self):
+        # Ranked results are ordered by relevance, which no index can provide
+        self.assertIndexedPlans(f"{reverse('home')}?search=headline", allow_sort=True)
+
+    def test_search_support_is_checked_once(self):
+        self.client.get(f"{reverse('home')}?search=headline")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f"{reverse('home')}?search=number")
+        checks = [
+            query['sql'] for query in queries.captured_queries
+            if 'sqlite_compileoption_used' in query['sql'] or 'pragma_module_list' in query['sql']
+        ]
+        self.assertEqual(checks, [])
+
+    def test_home_saved_lookup_covers_the_page_only(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('home'))
+        page_ids = {news.id for news in response.context['page_obj']}
+        saved = [q['sql'] for q in queries.captured_queries if '"newsapp_savedarticle"' in q['sql']]
+        self.assertEqual(len(saved), 1)
+        self.assertIn('"news_id" IN', saved[0])
+        self.assertTrue(response.context['saved_article_ids'])
+        self.assertEqual(
+            response.context['saved_article_ids'],
+            set(self.user.saved_articles.filter(news_id__in=page_ids).values_list('news_id', flat=True)),
+        )
+
+    def test_dashboard(self):
+        self.assertIndexedPlans(reverse('dashboard'))
+        self.assertIndexedPlans(f"{reverse('dashboard')}?after={self.cursor}")
+
+    def test_news_api(self):
+        self.assertIndexedPlans(f"{reverse('news_api')}?country=us&after={self.cursor}")
+
+    def test_most_saved(self):
+        most_saved = News.objects.filter(is_duplicate=False).order_by('-save_count', '-published_date')[:10]
+        sql, params = most_saved.query.sql_with_params()
+        plan = self.explain(sql, params)
+        self.assertTrue(any('news_most_saved_idx' in step for step in plan), plan)
+        self.assertFalse(any('TEMP B-TREE' in step for step in plan), plan)
+
+
+class SavedCountTests(FeedTestCase):
+    """Saving and unsaving keep the denormalized counters in step"""
+
+    def test_save_and_unsave_keep_counts(self):
+        news = News.objects.filter(saved_by__isnull=True).first()
+        self.client.post(reverse('save_article', args=[news.id]))
+        self.client.post(reverse('save_article', args=[news.id]))
+        news.refresh_from_db()
+        self.assertEqual(news.save_count, 1)
+        self.assertEqual(get_saved_count(self.user), 21)
+
+        self.client.post(reverse('unsave_article', args=[news.id]))
+        self.client.post(reverse('unsave_article', args=[news.id]))
+        news.refresh_from_db()
+        self.assertEqual(news.save_count, 0)
+        self.assertEqual(SavedCount.objects.get(user=self.user).count, 20)
+
+
+class FacetCountTests(FeedTestCase):
+    """The sidebar counts follow articles that are added, edited and deleted"""
+
+    def assertCountsMatch(self):
+        counts = get_facet_counts()
+        rebuild_facet_counts()
+        self.assertEqual(counts, get_facet_counts())
+
+    def test_edits_move_the_counts(self):
+        rebuild_facet_counts()
+        news = News.objects.filter(is_duplicate=False, country='us').first()
+        countries = get_facet_counts()['countries']
+
+        news.country = 'gb'
+        news.save()
+        sidebar = self.client.get(reverse('home')).context['country_counts']
+        self.assertEqual((sidebar['us'], sidebar['gb']), (countries['us'] - 1, countries['gb'] + 1))
+        self.assertCountsMatch()
+
+        news.category = Category.objects.exclude(pk=news.category_id).first()
+        news.save(update_fields=['category'])
+        self.assertCountsMatch()
+
+        news.is_duplicate = True
+        news.save()
+        self.assertCountsMatch()
+        news.is_duplicate = False
+        news.title = 'Edited'
+        news.save()
+        self.assertCountsMatch()
+
+        # Fields the counts don't depend on cost no lookup
+        with self.assertNumQueries(1):
+            news.save(update_fields=['title'])
+        news.delete()
+        self.assertCountsMatch()
+
+
+class SavedBatchTests(FeedTestCase):
+    """The batch save/unsave endpoint"""
+
+    def test_batch_save_and_unsave(self):
+        rebuild_saved_counts()
+        saved_ids = list(self.user.saved_articles.values_list('news_id', flat=True)[:5])
+        unsaved_ids = list(News.objects.filter(saved_by__isnull=True).values_list('id', flat=True)[:5])
+
+        def post(operations):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(
+                    reverse('saved_articles_batch'), {'operations': operations}, content_type='application/json'
+                )
+            return response, len(queries)
+
+        # The number of queries doesn't depend on the size of the batch
+        _, small = post(
+            [{'news_id': news_id, 'action': 'save'} for news_id in unsaved_ids[:2]]
+            + [{'news_id': saved_ids[0], 'action': 'unsave'}]
+        )
+        response, large = post(
+            [{'news_id': news_id, 'action': 'save'} for news_id in unsaved_ids[2:] + saved_ids[:1]]
+            + [{'news_id': news_id, 'action': 'unsave'} for news_id in saved_ids[1:]]
+            + [{'news_id': saved_ids[1], 'action': 'save'}, {'news_id': 10 ** 6, 'action': 'save'}]
+        )
+        self.assertEqual(large, small)
+        self.assertEqual(response.json()['added'], 4)
+        self.assertEqual(response.json()['removed'], 3)
+        self.assertEqual(response.json()['missing'], [10 ** 6])
+        self.assertEqual(response.json()['saved_count'], 22)
+        self.assertEqual(SavedArticle.objects.filter(user=self.user).count(), 22)
+        self.assertEqual(News.objects.filter(pk__in=unsaved_ids, save_count=1).count(), 5)
+        self.assertFalse(SavedArticle.objects.filter(user=self.user, news_id__in=saved_ids[2:]).exists())
+
+        for operation in [
+            {'news_id': 1, 'action': 'star'},
+            {'news_id': 10 ** 26, 'action': 'save'},
+            {'news_id': 2 ** 63, 'action': 'unsave'},
+            {'news_id': 0, 'action': 'save'},
+            {'news_id': -1, 'action': 'save'},
+            {'news_id': 'one', 'action': 'save'},
+        ]:
+            with self.subTest(operation):
+                response = self.client.post(
+                    reverse('saved_articles_batch'), {'operations': [operation]}, content_type='application/json',
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_concurrent_save_is_counted_once(self):
+        rebuild_saved_counts()
+        first, second = News.objects.filter(saved_by__isnull=True).values_list('id', flat=True)[:2]
+        bulk_create = SavedArticle.objects.bulk_create
+
+        def save_first(objs, **kwargs):
+            # Another request saves the same article between the lookup and the insert
+            save_for_user(self.user, first)
+            return bulk_create(objs, **kwargs)
+
+        with mock.patch.object(SavedArticle.objects, 'bulk_create', side_effect=save_first):
+            response = self.client.post(
+                reverse('saved_articles_batch'),
+                {'operations': [{'news_id': first, 'action': 'save'}, {'news_id': second, 'action': 'save'}]},
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['added'], 1)
+        self.assertEqual(response.json()['saved_count'], 22)
+        self.assertEqual(get_saved_count(self.user), SavedArticle.objects.filter(user=self.user).count())
+        self.assertEqual(
+            list(News.objects.filter(pk__in=[first, second]).values_list('save_count', flat=True)), [1, 1]
+        )
+
+
+@skipUnless(connection.vendor == 'sqlite', 'query plans are checked on SQLite')
+class ArchiveTests(FeedTestCase):
+    """Old unsaved articles move to the archive table and stay readable there"""
+
+    def test_archive(self):
+        rebuild_facet_counts()
+        before = timezone.now() - timedelta(minutes=5)
+        expected = set(
+            News.objects.filter(published_date__lt=before, saved_by__isnull=True).values_list('id', flat=True)
+        )
+        while archive_batch(before, batch_size=7)[1]:
+            pass
+        self.assertEqual(set(ArchivedNews.objects.values_list('id', flat=True)), expected)
+        self.assertFalse(News.objects.filter(pk__in=expected).exists())
+        # Saved articles stay in the hot table however old they are
+        self.assertTrue(News.objects.filter(published_date__lt=before).exists())
+        self.assertEqual(get_facet_counts()['total'], News.objects.filter(is_duplicate=False).count())
+
+        self.assertIndexedPlans(f"{reverse('home')}?archive=1")
+        self.assertIndexedPlans(f"{reverse('home')}?archive=1&category={self.category.pk}")
+        self.assertIndexedPlans(f"{reverse('news_api')}?archive=1&country=us")
+        response = self.client.get(f"{reverse('news_api')}?archive=1&search=headline&limit=100")
+        results = json.loads(b''.join(response.streaming_content))['results']
+        self.assertEqual(
+            {row['id'] for row in results},
+            set(ArchivedNews.objects.filter(is_duplicate=False).values_list('id', flat=True)),
+        )
+
+    def test_refetched_article_replaces_its_archived_copy(self):
+        rebuild_facet_counts()
+        before = timezone.now() - timedelta(minutes=5)
+        while archive_batch(before)[1]:
+            pass
+        archived = ArchivedNews.objects.filter(is_duplicate=False).earliest('published_date')
+        # create_news() makes up its link hashes; save() computes the real one
+        archived.link_hash = link_hash(archived.link)
+        archived.save()
+        refetched = News.objects.create(
+            title='Refetched', link=archived.link, source='Example',
+            category=archived.category, country=archived.country, published_date=archived.published_date,
+        )
+        self.assertEqual(refetched.link_hash, archived.link_hash)
+        self.assertEqual(get_facet_counts()['total'], News.objects.filter(is_duplicate=False).count())
+
+        self.assertEqual(archive_batch(before), (1, 1))
+        self.assertFalse(News.objects.filter(pk=refetched.pk).exists())
+        self.assertEqual(ArchivedNews.objects.get(link_hash=archived.link_hash).title, 'Refetched')
+        self.assertEqual(get_facet_counts()['total'], News.objects.filter(is_duplicate=False).count())
+
+    def test_batch_skips_the_per_row_handlers(self):
+        rebuild_facet_counts()
+        with mock.patch('newsapp.pagecache.bump_news_version') as bump, CaptureQueriesContext(connection) as queries:
+            moved, examined = archive_batch(timezone.now(), batch_size=20)
+        self.assertEqual((moved, examined), (20, 20))
+        bump.assert_not_called()
+        self.assertLess(len(queries), 20)
+        self.assertEqual(get_facet_counts()['total'], News.objects.filter(is_duplicate=False).count())
+
+    def test_batch_saved_while_moving_does_not_stop_the_run(self):
+        bulk_create = ArchivedNews.objects.bulk_create
+        saved = []
+
+        def save_them_first(objs, **kwargs):
+            # The first batch is saved by a reader between the lookup and the delete
+            if not saved:
+                saved.extend(article.id for article in objs)
+                for news_id in saved:
+                    save_for_user(self.user, news_id)
+            return bulk_create(objs, **kwargs)
+
+        expected = set(News.objects.filter(saved_by__isnull=True).values_list('id', flat=True))
+        with mock.patch.object(ArchivedNews.objects, 'bulk_create', side_effect=save_them_first):
+            call_command('archive_news', days=0, batch_size=3, no_vacuum=True, stdout=io.StringIO())
+        self.assertEqual(len(saved), 3)
+        self.assertEqual(set(ArchivedNews.objects.values_list('id', flat=True)), expected - set(saved))
+        self.assertEqual(News.objects.filter(pk__in=saved).count(), 3)
+
+
+class NewsApiTests(FeedTestCase):
+    """The JSON API's validation and conditional responses"""
+
+    def get(self, headers=None, **params):
+        response = self.client.get(reverse('news_api'), params, **(headers or {}))
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def test_bad_filters_and_cursors(self):
+        self.assertEqual(self.get(category='tech').status_code, 400)
+        self.assertEqual(self.get(after='not-a-cursor').status_code, 400)
+        self.assertEqual(self.get(after=self.cursor).status_code, 200)
+
+    def test_revalidation(self):
+        response = self.get(country='us')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(self.get(country='us', headers={'HTTP_IF_NONE_MATCH': etag}).status_code, 304)
+        self.assertEqual(
+            self.get(country='us', headers={'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']}).status_code, 304
+        )
+        # Other filters are other documents
+        self.assertEqual(self.get(country='gb', headers={'HTTP_IF_NONE_MATCH': etag}).status_code, 200)
+
+        News.objects.filter(pk=News.objects.first().pk).update(updated_at=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(self.get(country='us', headers={'HTTP_IF_NONE_MATCH': etag}).status_code, 200)
+
+    def test_archive_revalidation(self):
+        archive_batch(timezone.now() - timedelta(minutes=20), batch_size=5)
+        etag = self.get(archive='1')['ETag']
+        self.assertNotEqual(etag, self.get()['ETag'])
+
+        # Changes to the hot table leave the archive's validators alone...
+        News.objects.filter(pk=News.objects.first().pk).update(updated_at=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(self.get(archive='1', headers={'HTTP_IF_NONE_MATCH': etag}).status_code, 304)
+        # ...but archiving more articles changes them
+        archive_batch(timezone.now() - timedelta(minutes=20), batch_size=5)
+        self.assertEqual(self.get(archive='1', headers={'HTTP_IF_NONE_MATCH': etag}).status_code, 200)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-default'},
+    'pages': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-pages'},
+    'metrics': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+})
+class PageCacheTests(FeedTestCase):
+    """Home pages come from the page cache until new articles are stored"""
+
+    def setUp(self):
+        super().setUp()
+        page_cache().clear()
+        self.client.logout()
+
+    def test_anonymous_pages_are_served_from_the_cache(self):
+        self.assertContains(self.client.get(reverse('home')), 'Headline number 1<')
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(reverse('home'), {'utm_source': 'mail'}), 'Headline number 1<')
+
+    def test_logged_in_pages_are_not_shared(self):
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse('home')), 'btn-warning')
+        self.client.logout()
+        self.assertNotContains(self.client.get(reverse('home')), 'btn-warning')
+
+    def test_values_are_not_normalized(self):
+        # Countries are stored lower case, so this page is empty...
+        self.assertNotContains(self.client.get(reverse('home'), {'country': 'US'}), 'Headline number')
+        # ...and must not be served for the lower case filter
+        self.assertContains(self.client.get(reverse('home'), {'country': 'us'}), 'Headline number')
+
+    def test_ingest_invalidates_the_cache(self):
+        self.assertNotContains(self.client.get(reverse('home')), 'Breaking story')
+        batch = IngestBatch()
+        batch.add(
+            title='Breaking story', link='https://example.com/breaking', source='Example',
+            published_date=timezone.now() + timedelta(minutes=1),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            batch.flush()
+        self.assertContains(self.client.get(reverse('home')), 'Breaking story')
+
+
+@override_settings(THUMBNAIL_SIZE=(140, 80))
+class ThumbnailTests(IsolatedTestCase, TestCase):
+    """Card thumbnails made from a local image server, then served and evicted"""
+
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root)
+        # The image server runs on localhost
+        settings = override_settings(THUMBNAIL_ROOT=self.root, THUMBNAIL_ALLOW_PRIVATE_HOSTS=True)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        server = FakeFeedServer(image_size=(800, 500)).start()
+        self.addCleanup(server.stop)
+
+        images = [
+            f'{server.image_base_url}0.jpg',
+            f'{server.image_base_url}0.jpg',  # Shared by two articles
+            f'{server.image_base_url}1.jpg',
+            f'{server.image_base_url}2.jpg',
+            f'{server.base_url}/missing.jpg',
+            '',
+        ]
+        create_news(len(images), image_url=lambda i: images[i])
+
+    def fetch(self):
+        return fetch_thumbnails(log=lambda message: None)
+
+    def test_fetch_serve_and_evict(self):
+        self.assertEqual(self.fetch(), (4, 1))
+        files = sorted(self.root.glob('*.jpg'))
+        self.assertEqual(len(files), 3)
+        with Image.open(files[0]) as image:
+            self.assertEqual(image.size, (140, 80))
+        self.assertEqual(News.objects.filter(thumbnail='').count(), 1)
+        self.assertEqual(News.objects.filter(thumbnail__isnull=True).count(), 1)
+        self.assertEqual(self.fetch(), (0, 0))
+
+        digest = News.objects.get(link_hash=0).thumbnail
+        response = self.client.get(reverse('thumbnail', args=[digest]))
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertContains(self.client.get(reverse('home')), reverse('thumbnail', args=[digest]))
+        self.assertEqual(self.client.get(reverse('thumbnail', args=['0' * 64])).status_code, 404)
+        self.assertEqual(self.client.get('/thumbs/..%2Fsettings.jpg').status_code, 404)
+
+        # The least recently used file goes first
+        oldest = self.root / f'{digest}.jpg'
+        os.utime(oldest, (0, 0))
+        total = sum(path.stat().st_size for path in files)
+        self.assertEqual(evict_thumbnails(budget=total - 1), 1)
+        self.assertFalse(oldest.exists())
+        self.assertEqual(News.objects.filter(thumbnail='').count(), 3)
+
+    def test_download_size_limit(self):
+        with override_settings(THUMBNAIL_MAX_BYTES=1000):
+            self.assertEqual(self.fetch(), (0, 5))
+        self.assertFalse(list(self.root.glob('*.jpg')))
+
+    def test_private_hosts_are_refused(self):
+        with override_settings(THUMBNAIL_ALLOW_PRIVATE_HOSTS=False):
+            self.assertEqual(self.fetch(), (0, 5))
+            for url in [
+                'file:///etc/passwd',
+                'ftp://example.com/a.jpg',
+                'http://127.0.0.1/a.jpg',
+                'http://[::1]/a.jpg',
+                'http://[::ffff:10.0.0.1]/a.jpg',
+                'http://169.254.169.254/latest/meta-data/',
+                'http://192.168.1.1:8080/a.jpg',
+            ]:
+                with self.subTest(url=url), self.assertRaises(ValueError):
+                    check_image_url(url)
+            with mock.patch('socket.getaddrinfo', return_value=[(None, None, None, '', ('93.184.215.14', 0))]):
+                check_image_url('https://example.com/a.jpg')
+        self.assertFalse(list(self.root.glob('*.jpg')))
+
+
+class AsyncViewTests(IsolatedTestCase, TransactionTestCase):
+    """The async views serve the same pages and saves as the sync ones
+
+    A TransactionTestCase, since their queries run on other threads' database
+    connections, which can't see the data of an open test transaction.
+    """
+
+    def setUp(self):
+        category = Category.objects.create(name='World', slug='world')
+        create_news(30, category=category, country=lambda i: 'us' if i % 2 else 'gb')
+        rebuild_facet_counts()
+        self.user = User.objects.create_user('reader', password='secret')
+        self.news = list(News.objects.order_by('-published_date'))
+        for news in self.news[1:20:3]:
+            save_for_user(self.user, news.pk)
+        self.category = category
+
+    def request(self, factory, path, user=None, method='get', data=None):
+        request = getattr(factory, method)(path, data)
+        request.user = user or AnonymousUser()
+        request.session = SessionStore()
+        return request
+
+    def test_pages_match_the_sync_views(self):
+        pages = [
+            ('home', {}, None),
+            ('home', {}, self.user),
+            ('home', {'category': self.category.pk, 'country': 'us'}, self.user),
+            ('home', {'page': 2}, self.user),
+            ('home', {'search': 'headline'}, None),
+            ('dashboard', {}, self.user),
+            ('dashboard', {'page': 1}, self.user),
+        ]
+        for name, params, user in pages:
+            with self.subTest(name=name, params=params, user=user):
+                path = reverse(name)
+                expected = getattr(views, name)(self.request(RequestFactory(), path, user, data=params))
+                response = async_to_sync(getattr(async_views, name))(
+                    self.request(AsyncRequestFactory(), path, user, data=params)
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, expected.content)
+
+        # Cursor pages from the async view's own links
+        response = async_to_sync(async_views.home)(self.request(AsyncRequestFactory(), reverse('home'), self.user))
+        self.assertContains(response, 'btn-warning', count=len(self.news[1:12:3]))
+        response = async_to_sync(async_views.dashboard)(self.request(AsyncRequestFactory(), reverse('dashboard')))
+        self.assertEqual(response.status_code, 302)
+
+    def test_save_and_unsave(self):
+        news = self.news[0]
+        factory = AsyncRequestFactory()
+
+        def post(view, news_id=news.pk, user=self.user, method='post'):
+            path = reverse(view.__name__, args=[news_id])
+            return async_to_sync(view)(self.request(factory, path, user, method), news_id)
+
+        self.assertEqual(json.loads(post(async_views.save_article).content)['status'], 'saved')
+        self.assertEqual(json.loads(post(async_views.save_article).content)['status'], 'already_saved')
+        news.refresh_from_db()
+        self.assertEqual(news.save_count, 1)
+        self.assertEqual(get_saved_count(self.user), 8)
+
+        self.assertEqual(json.loads(post(async_views.unsave_article).content)['status'], 'unsaved')
+        news.refresh_from_db()
+        self.assertEqual(news.save_count, 0)
+        self.assertEqual(get_saved_count(self.user), 7)
+
+        self.assertEqual(post(async_views.save_article, method='get').status_code, 405)
+        self.assertEqual(post(async_views.save_article, user=AnonymousUser()).status_code, 302)
+        with self.assertRaises(Http404):
+            post(async_views.unsave_article, news_id=0)
+
+
+@override_settings(REQUEST_TIMING_SAMPLE_RATE=1, METRICS_TOKEN='scrape-me')
+class RequestTimingTests(IsolatedTestCase, TestCase):
+    """Server-Timing headers, slow request logs and the metrics endpoint"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='World', slug='world')
+        create_news(1, category=category)
+        rebuild_facet_counts()
+
+    def test_server_timing_and_metrics(self):
+        response = self.client.get(reverse('home'))
+        timing = dict(
+            part.split(';', 1) for part in response['Server-Timing'].split(', ')
+        )
+        self.assertEqual(set(timing), {'db', 'tpl', 'view'})
+        self.assertRegex(timing['db'], r'dur=[\d.]+;desc="[1-9]\d* queries"')
+
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(
+            self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403
+        )
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-me')
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        text = response.content.decode()
+        self.assertIn('# TYPE newsapp_request_duration_seconds histogram', text)
+        self.assertRegex(text, r'newsapp_request_db_queries_count\{view="home"\} [1-9]')
+        self.assertRegex(text, r'newsapp_request_template_seconds_bucket\{view="home",le="\+Inf"\} [1-9]')
+
+    @override_settings(CACHES={
+        **TEST_SETTINGS['CACHES'],
+        'metrics': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-metrics'},
+    })
+    def test_workers_are_added_up(self):
+        self.addCleanup(metrics_cache().clear)
+        self.client.get(reverse('home'))
+        # This process's own flushed snapshot isn't counted twice
+        registry.flush()
+
+        # Another worker process, which has since exited
+        other = Registry()
+        timing = RequestTiming()
+        timing.queries = 1000
+        other.observe('home', 0.1, timing)
+        with mock.patch('newsapp.metrics._snapshot_key', return_value='request-metrics:elsewhere:1'):
+            other.flush()
+
+        text = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-me').content.decode()
+        own = registry.snapshot()['newsapp_request_db_queries']['home']
+        self.assertIn(f'newsapp_request_db_queries_count{{view="home"}} {own[-1] + 1}', text)
+        self.assertIn(f'newsapp_request_db_queries_sum{{view="home"}} {own[-2] + 1000}', text)
+        self.assertIn(f'newsapp_request_db_queries_bucket{{view="home",le="500"}} {own[-3]}', text)
+
+        # Once its snapshot expires the exited worker is forgotten
+        metrics_cache().delete('request-metrics:elsewhere:1')
+        text = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-me').content.decode()
+        own = registry.snapshot()['newsapp_request_db_queries']['home']
+        self.assertIn(f'newsapp_request_db_queries_sum{{view="home"}} {own[-2]}', text)
+        self.assertNotIn('request-metrics:elsewhere:1', metrics_cache().get(PROCESSES_KEY))
+
+    def test_slow_requests_are_logged(self):
+        with override_settings(REQUEST_TIMING_SLOW_MS=0), self.assertLogs('newsapp.metrics', 'WARNING') as logs:
+            self.client.get(reverse('home'), {'country': 'us'})
+        self.assertIn('Slow request GET /?country=us (home)', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    def test_off_without_sampling(self):
+        with override_settings(REQUEST_TIMING_SAMPLE_RATE=0):
+            self.assertNotIn('Server-Timing', self.client.get(reverse('home')))
+            with self.assertRaises(MiddlewareNotUsed):
+                RequestTimingMiddleware(lambda request: None)
+
+
+class IngestBatchTests(IsolatedTestCase, TestCase):
+    """Bulk ingestion skips links it has seen and counts only the rows it stored"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='World', slug='world')
+        News.objects.create(
+            title='Already stored', link='https://example.com/story/0', source='Example',
+            category=self.category, country='us', published_date=timezone.now(),
+        )
+        rebuild_facet_counts()
+
+    def add(self, batch, n, link=None, origin=None):
+        """Queue story ``n``, with a title of its own"""
+        batch.add(
+            origin=origin,
+            title=' '.join(random.Random(n).sample(WORDS, 8)),
+            link=link or f'https://example.com/story/{n}',
+            source='Example',
+            category=self.category,
+            country='us',
+            published_date=timezone.now(),
+        )
+
+    def test_duplicates_and_counts(self):
+        batch = IngestBatch()
+        self.add(batch, 1, origin=1)
+        self.add(batch, 1, 'https://example.com/story/1?utm_source=rss', origin=1)
+        self.add(batch, 2, 'http://www.example.com/story/2/', origin=2)
+        self.add(batch, 0, origin=2)
+
+        self.assertEqual(batch.flush(), 2)
+        self.assertEqual(batch.flush(), 0)
+        self.assertEqual((batch.inserted, batch.skipped), (2, 2))
+        self.assertEqual(batch.inserted_by_origin, {1: 1, 2: 1})
+        self.assertEqual(News.objects.get(link_hash=link_hash('https://example.com/story/1')).link, 'https://example.com/story/1')
+        self.assertEqual(get_facet_counts(country='us')['total'], 3)
+
+    def test_links_stored_concurrently_are_not_counted(self):
+        def concurrent_fetch(articles, **kwargs):
+            # Another fetch stores one of the links after the batch looked them up
+            News.objects.create(
+                title='Stored elsewhere', link='https://example.com/story/3', source='Other',
+                category=self.category, country='us', published_date=timezone.now(),
+            )
+            return assign_stories(articles, **kwargs)
+
+        batch = IngestBatch()
+        self.add(batch, 3, origin=1)
+        self.add(batch, 4, origin=1)
+        with mock.patch('newsapp.ingest.assign_stories', side_effect=concurrent_fetch):
+            self.assertEqual(batch.flush(), 1)
+
+        self.assertEqual((batch.inserted, batch.skipped), (1, 1))
+        self.assertEqual(batch.inserted_by_origin, {1: 1})
+        self.assertEqual(News.objects.get(link_hash=link_hash('https://example.com/story/3')).source, 'Other')
+        self.assertEqual(get_facet_counts(country='us')['total'], 3)
+        lost = simhash(' '.join(random.Random(3).sample(WORDS, 8)))
+        self.assertFalse(SimHashBand.objects.filter(story_id=lost).exists())
+        self.assertEqual(SimHashBand.objects.count(), 6)
+
+
+class FeedSchedulerTests(IsolatedTestCase, TestCase):
+    """The polling daemon's NewsData.io requests go through the shared fetch pipeline"""
+
+    def poll(self, scheduler):
+        """Submit the sources that are due and complete their downloads"""
+        running = {}
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            scheduler._submit_due(executor, running)
+        for future, source in running.items():
+            scheduler._complete(source, future)
+        return len(running)
+
+    def test_rate_limited_page_is_recorded_and_retried(self):
+        source = FeedSource.objects.create(kind=FeedSource.NEWSAPI, name='Fake', category='technology', country='b0')
+        server = FakeFeedServer(throttle_rate=1.0, retry_after=120).start()
+        self.addCleanup(server.stop)
+        with override_settings(NEWSAPI_URL=server.newsapi_url):
+            scheduler = FeedScheduler(lambda: [source], max_workers=1, timeout=5, log=lambda message: None)
+            scheduler.refresh_sources()
+            self.assertEqual(self.poll(scheduler), 1)
+
+        fetch = FeedFetch.objects.get(source=source)
+        self.assertEqual(fetch.errors, 1)
+        self.assertIn('Rate limited', fetch.error)
+        state = FeedState.objects.get()
+        self.assertIsNone(state.last_success_at)
+        self.assertAlmostEqual((state.next_fetch_at - timezone.now()).total_seconds(), 120, delta=5)
+        # The bucket stays paused, so the page waits even if it comes up early
+        self.assertGreater(scheduler.newsapi_bucket.try_acquire(), 100)
+        scheduler._queue[0] = (0, *scheduler._queue[0][1:])
+        self.assertEqual(self.poll(scheduler), 0)
+
+
+class ConditionalFetchTests(IsolatedTestCase, TestCase):
+    """RSS feeds are polled with conditional requests and read up to the first entry seen before"""
+
+    def setUp(self):
+        self.server = FakeFeedServer(feed_size=30).start()
+        self.addCleanup(self.server.stop)
+        self.source = FeedSource.objects.create(
+            kind=FeedSource.RSS, name='Fake', url=self.server.feed_urls(1)[0], category='World',
+        )
+
+    def last_fetch(self):
+        return FeedFetch.objects.filter(source=self.source).order_by('-pk').first()
+
+    def test_unchanged_feed_is_not_stored_again(self):
+        self.assertEqual(fetch_rss_feeds(sources=[self.source]), RSS_ENTRY_LIMIT)
+        state = FeedState.objects.get(url=self.source.url)
+        self.assertTrue(state.etag)
+        self.assertTrue(state.last_modified)
+        self.assertEqual(len(state.known_links()), RSS_ENTRY_LIMIT)
+
+        # The validators go back to the server, which answers 304
+        self.assertEqual(fetch_rss_feeds(sources=[self.source]), 0)
+        self.assertEqual(self.server.not_modified, 1)
+        fetch = self.last_fetch()
+        self.assertEqual((fetch.bytes, fetch.entries, fetch.errors), (0, 0, 0))
+        self.assertEqual(News.objects.count(), RSS_ENTRY_LIMIT)
+        self.assertEqual(FeedState.objects.get(url=self.source.url).etag, state.etag)
+
+        # Without the cache the feed is downloaded again, and every entry skipped
+        self.assertEqual(fetch_rss_feeds(sources=[self.source], use_cache=False), 0)
+        self.assertEqual(self.server.not_modified, 1)
+        self.assertEqual(self.last_fetch().entries, RSS_ENTRY_LIMIT)
+
+    def test_reading_stops_at_the_first_known_entry(self):
+        links = [entry['link'] for entry in download_feed(self.source, timeout=5)['entries']]
+        self.assertEqual(len(links), RSS_ENTRY_LIMIT)
+
+        state = FeedState(url=self.source.url, recent_links=f'{link_hash(links[3])} {link_hash(links[10])}')
+        result = download_feed(self.source, timeout=5, state=state)
+        self.assertEqual([entry['link'] for entry in result['entries']], links[:3])
+        self.assertEqual(self.server.not_modified, 0)
+
+
+class NormalizeTests(IsolatedTestCase):
+    def test_strip_html(self):
+        self.assertEqual(strip_html('<p>Hello <b>big <i>world</i></b></p>'), 'Hello big world')
+        self.assertEqual(strip_html('<p>Unclosed <b>tag'), 'Unclosed tag')
+        self.assertEqual(strip_html('5 < 6 and <br/>7 > 3'), '5 < 6 and 7 > 3')
+        self.assertEqual(
+            strip_html('Tom &amp; Jerry&nbsp;&#8212; it&#x2019;s &lt;b&gt;bold&lt;/b&gt;, AT&T'),
+            'Tom & Jerry\xa0\u2014 it\u2019s <b>bold</b>, AT&T',
+        )
+        self.assertEqual(strip_html('No markup'), 'No markup')
+
+    def assertParses(self, text, expected, source=None):
+        parsed = parse_date(text, source)
+        self.assertEqual(parsed, expected)
+        self.assertIsNotNone(parsed.tzinfo)
+
+    def test_parse_date(self):
+        utc = dt_timezone.utc
+        ten = datetime(2024, 5, 1, 10, 0, tzinfo=utc)
+        eight = datetime(2024, 5, 1, 8, 0, tzinfo=utc)
+        for text, expected in [
+            ('2024-05-01 10:00:00', ten),
+            ('2024-05-01T10:00:00Z', ten),
+            ('2024-05-01T10:00:00+02:00', eight),
+            ('Wed, 01 May 2024 10:00:00 GMT', ten),
+            ('Wed, 01 May 2024 10:00:00 +0200', eight),
+            ('01 May 2024 10:00 +02:00', eight),
+            # email.utils: no zone, or a named one
+            ('Wed, 01 May 2024 10:00:00', ten),
+            ('Wed, 01 May 2024 05:00:00 EST', ten),
+            # dateutil
+            ('May 1, 2024 10:00 AM', ten),
+            ('2024/05/01 12:00 +0200', ten),
+        ]:
+            with self.subTest(text):
+                self.assertParses(f'  {text} ', expected, source=object())
+        self.assertIsNone(parse_date('yesterday'))
+        self.assertIsNone(parse_date('  '))
+
+    def test_source_changing_its_date_format(self):
+        utc = dt_timezone.utc
+        source = object()
+        self.assertParses('Wed, 01 May 2024 10:00:00 +0200', datetime(2024, 5, 1, 8, 0, tzinfo=utc), source)
+        self.assertParses('2024-05-02T10:00:00+02:00', datetime(2024, 5, 2, 8, 0, tzinfo=utc), source)
+        self.assertParses('2024-05-03 10:00:00', datetime(2024, 5, 3, 10, 0, tzinfo=utc), source)
+        self.assertParses('Sat, 04 May 2024 05:00:00 EST', datetime(2024, 5, 4, 10, 0, tzinfo=utc), source)
+        self.assertParses('May 5, 2024 10:00 AM', datetime(2024, 5, 5, 10, 0, tzinfo=utc), source)
+        self.assertParses('Mon, 06 May 2024 10:00:00 GMT', datetime(2024, 5, 6, 10, 0, tzinfo=utc), source)
+
+    def test_entry_fields(self):
+        rows, errors = feed_entry_fields([
+            {'title': 'Kept', 'link': 'https://example.com/1', 'summary': '<p>Big &amp; <b>bold</b></p>',
+             'published': 'Wed, 01 May 2024 10:00:00 GMT', 'media_content': [{'url': 'https://example.com/1.jpg'}]},
+            {'title': 'Parsed', 'link': 'https://example.com/2', 'published_parsed': (2024, 5, 2, 8, 0, 0, 3, 123, 0),
+             'links': [{'type': 'image/png', 'href': 'https://example.com/2.png'}]},
+            {'title': 'No link'},
+            {'link': 'https://example.com/no-title'},
+        ], source='feed')
+        self.assertEqual(errors, 0)
+        self.assertEqual([row['title'] for row in rows], ['Kept', 'Parsed'])
+        self.assertEqual(rows[0]['description'], 'Big & bold')
+        self.assertEqual(rows[0]['published_date'], datetime(2024, 5, 1, 10, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(rows[0]['image_url'], 'https://example.com/1.jpg')
+        self.assertEqual(rows[1]['published_date'], datetime(2024, 5, 2, 8, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(rows[1]['image_url'], 'https://example.com/2.png')
+
+        before = timezone.now()
+        rows, errors = newsapi_article_fields([
+            {'link': ' https://example.com/3 ', 'title': '', 'description': '<p>Text</p>',
+             'pubDate': '2024-05-01 10:00:00', 'source_id': 'wire'},
+            {'link': 'https://example.com/4', 'title': ' Titled ', 'content': 'Body', 'source_name': 'The Wire'},
+            {'title': 'No link'},
+        ], source='page')
+        self.assertEqual(errors, 0)
+        self.assertEqual(
+            [(row['link'], row['title'], row['description'], row['source']) for row in rows],
+            [('https://example.com/3', 'Untitled', 'Text', 'wire'), ('https://example.com/4', 'Titled', 'Body', 'The Wire')],
+        )
+        self.assertEqual(rows[0]['published_date'], datetime(2024, 5, 1, 10, 0, tzinfo=dt_timezone.utc))
+        self.assertGreaterEqual(rows[1]['published_date'], before)
+
+
+class FeedStreamTests(IsolatedTestCase):
+    def malformed_feed(self):
+        """A 30-item RSS feed with an HTML entity XML doesn't know in its fourth item"""
+        items = FakeFeedServer(feed_size=30).rss_document(0).split(b'<item>')
+        items[4] = items[4].replace(b'</title>', b'&nbsp;</title>', 1)
+        document = b'<item>'.join(items)
+        links = [link.decode() for link in re.findall(rb'<link>([^<]+/rss-0/[^<]+)</link>', document)]
+        return [document[i:i + 512] for i in range(0, len(document), 512)], links
+
+    def test_malformed_feed_falls_back_to_feedparser(self):
+        chunks, links = self.malformed_feed()
+        entries = list(iter_feed_entries(chunks))
+        self.assertEqual(len(links), 30)
+        self.assertEqual([entry['link'] for entry in entries], links)
+
+        chunks, links = self.malformed_feed()
+        entries = list(iter_feed_entries(chunks, limit=RSS_ENTRY_LIMIT, known={link_hash(links[25])}))
+        self.assertEqual([entry['link'] for entry in entries], links[:RSS_ENTRY_LIMIT])
+
+        chunks, links = self.malformed_feed()
+        entries = list(iter_feed_entries(chunks, known={link_hash(links[6])}))
+        self.assertEqual([entry['link'] for entry in entries], links[:6])
+
+    def test_unreadable_feed(self):
+        with self.assertRaises(ValueError):
+            list(iter_feed_entries([b'<html><body>Not a feed']))
+
+
+class FetchPipelineTests(IsolatedTestCase, TestCase):
+    """fetch_rss_feeds and fetch_newsapi against the local stand-in"""
+
+    def serve(self, **options):
+        server = FakeFeedServer(feed_size=5, **options).start()
+        self.addCleanup(server.stop)
+        return server
+
+    def test_rss_feeds(self):
+        server = self.serve()
+        sources = [
+            FeedSource.objects.create(name=INGEST_BENCH_SOURCE, url=url, category='World')
+            for url in server.feed_urls(3, atom_every=3)
+        ]
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(fetch_rss_feeds(sources=sources, timeout=5), 15)
+        self.assertEqual(News.objects.filter(source=INGEST_BENCH_SOURCE, category__name='World').count(), 15)
+        self.assertEqual(
+            sorted(FeedFetch.objects.values_list('entries', 'inserted', 'errors')), [(5, 5, 0)] * 3
+        )
+
+    def test_rss_feed_errors(self):
+        server = self.serve(error_rate=1.0)
+        source = FeedSource.objects.create(name=INGEST_BENCH_SOURCE, url=server.feed_urls(1)[0], category='World')
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(fetch_rss_feeds(sources=[source], timeout=5), 0)
+        fetch = FeedFetch.objects.get()
+        self.assertEqual(fetch.errors, 1)
+        self.assertIn('500', fetch.error)
+        self.assertIsNone(FeedState.objects.get().last_success_at)
+
+    def newsapi_sources(self, count):
+        return [
+            FeedSource.objects.create(kind=FeedSource.NEWSAPI, name='Fake', category='technology', country=f'b{n}')
+            for n in range(count)
+        ]
+
+    def fetch_newsapi(self, server, sources):
+        with override_settings(NEWSAPI_URL=server.newsapi_url), redirect_stdout(io.StringIO()):
+            return fetch_newsapi(rate=1000, burst=10, sources=sources)
+
+    def test_newsapi_pages(self):
+        server = self.serve()
+        self.assertEqual(self.fetch_newsapi(server, self.newsapi_sources(2)), 10)
+        self.assertEqual(
+            set(News.objects.values_list('source', 'category__slug', 'country')),
+            {(INGEST_BENCH_SOURCE, 'technology', 'b0'), (INGEST_BENCH_SOURCE, 'technology', 'b1')},
+        )
+        self.assertEqual(sorted(FeedFetch.objects.values_list('entries', 'inserted', 'errors')), [(5, 5, 0)] * 2)
+
+    def test_newsapi_errors(self):
+        server = self.serve(error_rate=1.0)
+        self.assertEqual(self.fetch_newsapi(server, self.newsapi_sources(1)), 0)
+        fetch = FeedFetch.objects.get()
+        self.assertEqual(fetch.errors, 1)
+        self.assertIn('NewsData.io error: 500', fetch.error)
+        self.assertEqual(server.requests, 1)
+
+    def test_newsapi_rate_limited(self):
+        server = self.serve(throttle_rate=1.0, retry_after=0)
+        self.assertEqual(self.fetch_newsapi(server, self.newsapi_sources(2)), 0)
+        self.assertEqual(server.requests, 2 * (NEWSAPI_MAX_RETRIES + 1))
+        self.assertEqual(
+            [(fetch.errors, 'Rate limited' in fetch.error) for fetch in FeedFetch.objects.all()], [(1, True)] * 2
+        )
+        self.assertFalse(News.objects.exists())
+
+    def test_web_benchmark_leaves_the_dataset_unchanged(self):
+        create_news(5, link_hash=lambda i: 100 + i)
+        run = mock.patch.multiple(
+            'newsapp.management.commands.benchmark_web',
+            # The test runner has set the test environment up already
+            setup_test_environment=mock.DEFAULT, teardown_test_environment=mock.DEFAULT,
+        )
+        with run:
+            call_command(
+                'benchmark_web', seed=True, articles=60, users=2, saved_per_user=10, iterations=1,
+                stdout=io.StringIO(),
+            )
+            saves = set(SavedArticle.objects.values_list('user_id', 'news_id'))
+            report = io.StringIO()
+            call_command('benchmark_web', iterations=1, stdout=report)
+        # Progress lines come before the JSON report
+        report = report.getvalue()
+        self.assertEqual(json.loads(report[report.index('{'):])['dataset']['saved_articles'], 20)
+        self.assertEqual(set(SavedArticle.objects.values_list('user_id', 'news_id')), saves)
+        self.assertFalse(News.objects.exclude(source=BENCH_SOURCE).filter(save_count__gt=0).exists())
+
+    def test_ingest_benchmark_removes_only_its_own_articles(self):
+        create_news(3, source=BENCH_SOURCE, link=lambda i: f'{BENCH_LINK_PREFIX}{i}')
+        create_news(2, link_hash=lambda i: 100 + i)
+        call_command(
+            'benchmark_ingest', feeds=2, feed_size=3, newsapi_pages=2, latency=0, repeat=1,
+            scenario=['rss', 'newsapi'], stdout=io.StringIO(),
+        )
+        self.assertEqual(News.objects.filter(source=BENCH_SOURCE).count(), 3)
+        self.assertEqual(News.objects.count(), 5)
+        self.assertFalse(FeedSource.objects.filter(name=INGEST_BENCH_SOURCE).exists())
+
+
+class StoryClusteringTests(IsolatedTestCase, TestCase):
+    """Syndicated copies of a story are grouped under the first one"""
+
+    def add(self, batch, n, title, description, source):
+        batch.add(
+            title=title, description=description, link=f'https://example.com/{source.lower()}/{n}',
+            source=source, published_date=timezone.now() - timedelta(minutes=n),
+        )
+
+    def test_near_duplicates_share_a_story(self):
+        batch = IngestBatch()
+        self.add(
+            batch, 1, 'Storm forces airline to cancel hundreds of flights across the region',
+            'Hundreds of flights were cancelled on Monday as the storm moved inland.', 'Wire',
+        )
+        self.add(
+            batch, 2, 'Storm forces airline to cancel hundreds of flights across region',
+            'The storm moved inland on Monday, and the airline cancelled its flights.', 'Herald',
+        )
+        self.add(
+            batch, 3, 'Museum reopens after a decade of renovation work',
+            'Visitors queued from early morning to see the restored galleries.', 'Herald',
+        )
+        batch.flush()
+
+        wire, herald, museum = (
+            News.objects.get(link=f'https://example.com/{path}') for path in ('wire/1', 'herald/2', 'herald/3')
+        )
+        self.assertEqual(herald.story_id, wire.story_id)
+        self.assertFalse(wire.is_duplicate)
+        self.assertTrue(herald.is_duplicate)
+        self.assertNotEqual(museum.story_id, wire.story_id)
+        self.assertFalse(museum.is_duplicate)
+
+        # A later copy is matched through the index rather than the batch
+        batch = IngestBatch()
+        self.add(batch, 4, 'Storm forces airline to cancel hundreds of flights across the region', '', 'Courier')
+        batch.flush()
+        courier = News.objects.get(link='https://example.com/courier/4')
+        self.assertEqual((courier.story_id, courier.is_duplicate), (wire.story_id, True))
+
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'cancel hundreds of flights', count=1)
+        self.assertContains(response, '3 sources')
+        self.assertContains(response, 'Museum reopens')
+
+
+class CanonicalLinkTests(IsolatedTestCase):
+    def test_same_article(self):
+        link = 'https://example.com/world/story-1'
+        for variant in (
+            'https://example.com/world/story-1?utm_source=rss&utm_medium=feed',
+            'https://example.com/world/story-1?fbclid=abc&ref=home',
+            'http://WWW.Example.COM/world/story-1',
+            'https://m.example.com/world/story-1/',
+            'https://example.com/world/story-1#comments',
+            'https://example.com/world/story-1/amp?outputType=amp',
+            '  https://example.com:443/world/story-1  ',
+        ):
+            with self.subTest(variant):
+                self.assertEqual(canonical_key(variant), canonical_key(link))
+                self.assertEqual(link_hash(variant), link_hash(link))
+
+    def test_different_articles(self):
+        link = 'https://example.com/world/story-1?id=1&page=2'
+        self.assertEqual(link_hash('https://example.com/world/story-1?page=2&id=1'), link_hash(link))
+        for other in (
+            'https://example.com/world/story-1?id=2&page=2',
+            'https://example.com/world/story-2?id=1&page=2',
+            'https://example.com/World/story-1?id=1&page=2',
+            'https://example.org/world/story-1?id=1&page=2',
+            'https://example.com:8080/world/story-1?id=1&page=2',
+        ):
+            with self.subTest(other):
+                self.assertNotEqual(link_hash(other), link_hash(link))
+
+    def test_clean_url_keeps_the_link_readers_follow(self):
+        self.assertEqual(
+            clean_url('http://WWW.Example.com/a/?b=1&utm_campaign=x#top'), 'http://WWW.Example.com/a/?b=1'
+        )
+        self.assertEqual(clean_url('https://example.com/a?b=1&c=2'), 'https://example.com/a?b=1&c=2')
+
+
+class LinkHashMigrationTests(IsolatedTestCase, TransactionTestCase):
+    """0008 merges articles whose links turn out to be the same one"""
+    migrate_from = [('newsapp', '0007_news_dedup')]
+    migrate_to = [('newsapp', '0008_news_link_hash')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_duplicate_links_are_merged(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        apps = executor.loader.project_state(self.migrate_from).apps
+        OldNews = apps.get_model('newsapp', 'News')
+        OldSaved = apps.get_model('newsapp', 'SavedArticle')
+        OldUser = apps.get_model('auth', 'User')
+
+        reader = OldUser.objects.create(username='reader')
+        other = OldUser.objects.create(username='other')
+        now = timezone.now()
+        first, copy, unrelated = (
+            OldNews.objects.create(title=f'Story {i}', link=link, source='Example', published_date=now)
+            for i, link in enumerate([
+                'https://www.example.com/story/1',
+                'http://example.com/story/1/?utm_source=rss',
+                'https://example.com/story/2',
+            ])
+        )
+        OldSaved.objects.create(user=reader, news=first)
+        OldSaved.objects.create(user=reader, news=copy)
+        OldSaved.objects.create(user=other, news=copy)
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.migrate_to)
+        apps = executor.loader.project_state(self.migrate_to).apps
+        NewNews = apps.get_model('newsapp', 'News')
+        NewSaved = apps.get_model('newsapp', 'SavedArticle')
+
+        self.assertEqual(
+            sorted(NewNews.objects.values_list('id', 'link_hash')),
+            [(first.id, link_hash(first.link)), (unrelated.id, link_hash(unrelated.link))],
+        )
+        self.assertEqual(
+            sorted(NewSaved.objects.values_list('user__username', 'news_id')),
+            [('other', first.id), ('reader', first.id)],
+        )
@@ -0,0 +1,234 @@
+import hashlib
+import ipaddress
+import os
+import re
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from django.conf import settings
+from PIL import Image, ImageOps
+
+from .models import News
+from .pagecache import bump_news_version
+
+USER_AGENT = 'Mozilla/5.0 (compatible; NewsAggregator thumbnailer)'
+DIGEST_RE = re.compile(r'[0-9a-f]{64}')
+
+# Source images are rejected above this many pixels before being decoded,
+# whatever their file size (a small PNG can decode to gigabytes)
+MAX_PIXELS = 50_000_000
+
+# A thumbnail's modification time is its last use; serving one refreshes it
+# at most this often (seconds), so popular images don't cost a write per view
+TOUCH_INTERVAL = 3600
+
+# Eviction goes down to this share of the budget, so it doesn't run again
+# for every new thumbnail once the cache is full
+EVICT_TO = 0.9
+
+# Redirects are followed by hand, so every hop's host is checked
+MAX_REDIRECTS = 5
+
+
+def thumbnail_root():
+    return Path(getattr(settings, 'THUMBNAIL_ROOT', Path(settings.MEDIA_ROOT) / 'thumbs'))
+
+
+def thumbnail_path(digest):
+    """Where the thumbnail for ``digest`` lives; ``ValueError`` for anything but a SHA-256 hex digest"""
+    if not DIGEST_RE.fullmatch(digest):
+        raise ValueError(f'Not a thumbnail digest: {digest!r}')
+    return thumbnail_root() / f'{digest}.jpg'
+
+
+def touch_thumbnail(path):
+    """Mark a thumbnail as used for least-recently-used eviction"""
+    now = time.time()
+    try:
+        if now - path.stat().st_mtime > TOUCH_INTERVAL:
+            os.utime(path, (now, now))
+    except FileNotFoundError:
+        pass
+
+
+def check_image_url(url):
+    """``ValueError`` unless ``url`` is http(s) on a host with only public addresses
+
+    Image URLs come from feeds, so they mustn't reach the server's own
+    network. The host is resolved again when connecting, so this doesn't
+    stop a DNS server that answers differently the second time.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError(f'Not an http(s) URL: {url}')
+    if getattr(settings, 'THUMBNAIL_ALLOW_PRIVATE_HOSTS', False):
+        return
+    try:
+        addresses = socket.getaddrinfo(parts.hostname, None, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError) as e:
+        raise ValueError(f'Unknown host {parts.hostname}: {e}') from e
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0].split('%')[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f'Not a public address: {parts.hostname} ({address})')
+
+
+def download_image(url, timeout, max_bytes):
+    """Download an image, giving up past ``max_bytes`` or ``timeout`` seconds in total"""
+    deadline = time.monotonic() + timeout
+    for _ in range(MAX_REDIRECTS + 1):
+        check_image_url(url)
+        response = requests.get(
+            url, stream=True, timeout=timeout, allow_redirects=False,
+            headers={'User-Agent': USER_AGENT, 'Accept': 'image/*'},
+        )
+        if not response.is_redirect:
+            break
+        response.close()
+        url = urljoin(url, response.headers['Location'])
+    else:
+        raise ValueError(f'Over {MAX_REDIRECTS} redirects')
+    with response:
+        response.raise_for_status()
+        content_type = response.headers.get('Content-Type', '')
+        if not content_type.startswith('image/'):
+            raise ValueError(f'Not an image: {content_type or "no Content-Type"}')
+        if int(response.headers.get('Content-Length') or 0) > max_bytes:
+            raise ValueError(f"Image too large: {response.headers['Content-Length']} bytes")
+        body = bytearray()
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            body += chunk
+            if len(body) > max_bytes:
+                raise ValueError(f'Image too large: over {max_bytes} bytes')
+            if time.monotonic() > deadline:
+                raise TimeoutError(f'Image download took over {timeout}s')
+    return bytes(body)
+
+
+def make_thumbnail(data, size):
+    """JPEG bytes of ``data`` scaled and cropped to fill ``size`` (width, height)"""
+    image = Image.open(BytesIO(data))
+    if image.width * image.height > MAX_PIXELS:
+        raise ValueError(f'Image too large: {image.width}x{image.height}')
+    # JPEGs are decoded straight at a reduced scale still covering ``size``
+    image.draft('RGB', size)
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        # Transparent areas become white rather than black
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    image = ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+    output = BytesIO()
+    image.save(output, 'JPEG', quality=80, optimize=True, progressive=True)
+    return output.getvalue()
+
+
+def _fetch_thumbnail(url, size, timeout, max_bytes):
+    """Download ``url`` and store its thumbnail unless one exists; returns the digest"""
+    data = download_image(url, timeout, max_bytes)
+    digest = hashlib.sha256(data).hexdigest()
+    path = thumbnail_path(digest)
+    if not path.exists():
+        thumbnail = make_thumbnail(data, size)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Written aside and renamed, so a half-written file is never served
+        temporary = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}')
+        temporary.write_bytes(thumbnail)
+        os.replace(temporary, path)
+    return digest
+
+
+def fetch_thumbnails(limit=200, max_workers=None, log=print):
+    """Make thumbnails for up to ``limit`` of the newest articles that don't have one yet
+
+    Returns ``(stored, failed)`` counts of articles; failed ones keep using
+    the original image URL.
+    """
+    size = tuple(getattr(settings, 'THUMBNAIL_SIZE', (700, 400)))
+    timeout = getattr(settings, 'THUMBNAIL_TIMEOUT', 15)
+    max_bytes = getattr(settings, 'THUMBNAIL_MAX_BYTES', 10 * 1024 * 1024)
+    max_workers = max_workers or getattr(settings, 'THUMBNAIL_CONCURRENCY', 4)
+
+    pending = (
+        News.objects.filter(thumbnail__isnull=True, image_url__gt='')
+        .order_by('-published_date').values_list('pk', 'image_url')[:limit]
+    )
+    articles_by_url = {}
+    for pk, url in pending:
+        articles_by_url.setdefault(url, []).append(pk)
+    if not articles_by_url:
+        return 0, 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            url: executor.submit(_fetch_thumbnail, url, size, timeout, max_bytes)
+            for url in articles_by_url
+        }
+
+    stored = failed = 0
+    for url, future in futures.items():
+        pks = articles_by_url[url]
+        try:
+            digest = future.result()
+        except Exception as e:
+            log(f'{url}: {e}')
+            digest = ''
+            failed += len(pks)
+        else:
+            stored += len(pks)
+        News.objects.filter(pk__in=pks).update(thumbnail=digest)
+
+    if stored:
+        # Cached pages still point at the original images
+        bump_news_version()
+    return stored, failed
+
+
+def evict_thumbnails(budget=None):
+    """Delete the least recently used thumbnails while they take up more than ``budget`` bytes
+
+    ``budget`` defaults to ``THUMBNAIL_DISK_BUDGET``. Articles whose
+    thumbnail is deleted go back to the original image rather than being
+    queued again. Returns the number of files deleted.
+    """
+    budget = budget if budget is not None else getattr(settings, 'THUMBNAIL_DISK_BUDGET', 512 * 1024 * 1024)
+    files = []
+    total = 0
+    try:
+        with os.scandir(thumbnail_root()) as entries:
+            for entry in entries:
+                if entry.is_file() and DIGEST_RE.fullmatch(entry.name[:-4]) and entry.name.endswith('.jpg'):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path, entry.name[:-4]))
+                    total += stat.st_size
+    except FileNotFoundError:
+        return 0
+    if total <= budget:
+        return 0
+
+    files.sort()
+    evicted = []
+    for _, file_size, path, digest in files:
+        if total <= budget * EVICT_TO:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= file_size
+        evicted.append(digest)
+
+    for start in range(0, len(evicted), 500):
+        News.objects.filter(thumbnail__in=evicted[start:start + 500]).update(thumbnail='')
+    bump_news_version()
+    return len(evicted)
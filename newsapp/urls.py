@@ -1,14 +1,22 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from django.conf import settings
+from . import async_views, views
+
+# Under ASGI the busiest pages are served by their async versions
+site_views = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
-    path('', views.home, name='home'),
+    path('', site_views.home, name='home'),
     path('register/', views.register, name='register'),
     path('login/', views.login_view, name='login'),
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
-    path('dashboard/', views.dashboard, name='dashboard'),
-    path('save-article/<int:news_id>/', views.save_article, name='save_article'),
-    path('unsave-article/<int:news_id>/', views.unsave_article, name='unsave_article'),
+    path('dashboard/', site_views.dashboard, name='dashboard'),
+    path('save-article/<int:news_id>/', site_views.save_article, name='save_article'),
+    path('unsave-article/<int:news_id>/', site_views.unsave_article, name='unsave_article'),
+    path('saved-articles/batch/', views.saved_articles_batch, name='saved_articles_batch'),
+    path('api/news/', views.news_api, name='news_api'),
+    path('thumbs/<str:digest>.jpg', views.thumbnail, name='thumbnail'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
 
@@ -3,21 +3,23 @@ from django.contrib.auth import login, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q, Count
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
-from django.utils import timezone
-from .models import News, Category, SavedArticle
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max, Sum
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_POST, require_safe
+from django.utils.http import urlencode
+from .models import News, ArchivedNews, Category, SavedArticle, FacetCount
 from .forms import UserRegistrationForm
-import feedparser
-import requests
-from django.conf import settings
-from datetime import datetime
-from dateutil import parser as date_parser
-import re
-import pytz
-import time
-
+from .facets import get_facet_counts
+from .metrics import metrics_allowed, render_metrics
+from .pagecache import page_cache, home_cache_key, freeze_page
+from .pagination import KeysetPaginator
+from .saved import apply_saved_changes, get_saved_count, save_for_user, unsave_for_user
+from .search import search_news
+from .thumbnails import thumbnail_path, touch_thumbnail
+import hashlib
+import json
 
 # Country list for filtering
 COUNTRIES = {
@@ -67,13 +69,12 @@ COUNTRIES = {
 }
 
 
-def home(request):
-    """Home page with all news articles"""
-    category_id = request.GET.get('category')
-    search_query = request.GET.get('search', '')
-    country_code = request.GET.get('country', 'all')
-    
-    news_list = News.objects.all()
+def _filter_news(news_list, category_id, country_code, search_query):
+    """Apply the home page's category, country and search filters
+
+    Near-duplicates are always left out, so each story appears once.
+    """
+    news_list = news_list.filter(is_duplicate=False)
     
     # Filter by category
     if category_id:
@@ -83,37 +84,23 @@ def home(request):
     if country_code and country_code != 'all':
         news_list = news_list.filter(country=country_code)
     
-    # Search functionality
+    # Search functionality (full-text index, ranked by relevance)
     if search_query:
-        news_list = news_list.filter(
-            Q(title__icontains=search_query) | 
-            Q(description__icontains=search_query)
-        )
-    
-    # Pagination
-    paginator = Paginator(news_list, 12)  # 12 articles per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    # Get all categories with counts
-    categories = Category.objects.annotate(
-        article_count=Count('news')
-    ).order_by('name')
-    
-    # Get country counts
-    country_counts = {}
-    for code in COUNTRIES.keys():
-        if code == 'all':
-            country_counts[code] = News.objects.count()
-        else:
-            country_counts[code] = News.objects.filter(country=code).count()
+        news_list = search_news(news_list, search_query)
     
-    # Check which articles are saved by the user
-    saved_article_ids = []
-    if request.user.is_authenticated:
-        saved_article_ids = SavedArticle.objects.filter(
-            user=request.user
-        ).values_list('news_id', flat=True)
+    return news_list
+
+
+def _news_model(params):
+    """``ArchivedNews`` when the request asks for the archive (``archive=1``), else ``News``"""
+    return ArchivedNews if params.get('archive') == '1' else News
+
+
+def _home_filters(params):
+    """The home page's category, selected category id, search and country parameters"""
+    category_id = params.get('category')
+    search_query = params.get('search', '')
+    country_code = params.get('country', 'all')
     
     # Safely convert category_id to int
     selected_category = None
@@ -123,18 +110,269 @@ def home(request):
         except (ValueError, TypeError):
             selected_category = None
     
-    context = {
+    return category_id, selected_category, search_query, country_code
+
+
+def _home_page(params):
+    """The page of articles shown on the home page, with what its links need"""
+    category_id, selected_category, search_query, country_code = _home_filters(params)
+    model = _news_model(params)
+    
+    news_list = _filter_news(
+        model.objects.select_related('category'), category_id, country_code, search_query
+    )
+    
+    # Pagination: cursors on (published_date, id) when browsing. Search
+    # results are ordered by relevance, so they (and old ?page= links) keep
+    # numbered pages.
+    cursor_mode = not search_query and 'page' not in params
+    if cursor_mode:
+        paginator = KeysetPaginator(news_list, 12, 'published_date')  # 12 articles per page
+        page_obj = paginator.get_page(
+            after=params.get('after'),
+            before=params.get('before'),
+        )
+    else:
+        paginator = Paginator(news_list, 12)  # 12 articles per page
+        page_number = params.get('page')
+        page_obj = freeze_page(paginator.get_page(page_number))
+    
+    # How many sources carried each story on this page
+    story_ids = [news.story_id for news in page_obj if news.story_id is not None]
+    source_counts = dict(
+        model.objects.filter(story_id__in=story_ids)
+        .values('story_id').annotate(n=Count('id')).values_list('story_id', 'n')
+    ) if story_ids else {}
+    for news in page_obj:
+        news.source_count = source_counts.get(news.story_id, 1)
+    
+    # Filters to carry over into pagination links
+    filter_params = {}
+    if selected_category:
+        filter_params['category'] = selected_category
+    if country_code and country_code != 'all':
+        filter_params['country'] = country_code
+    if search_query:
+        filter_params['search'] = search_query
+    if model is ArchivedNews:
+        filter_params['archive'] = '1'
+    
+    return {
         'page_obj': page_obj,
-        'categories': categories,
+        'cursor_mode': cursor_mode,
+        'filter_query': urlencode(filter_params),
         'selected_category': selected_category,
         'search_query': search_query,
-        'saved_article_ids': list(saved_article_ids),
+        'selected_country': country_code,
+        'archive': model is ArchivedNews,
+    }
+
+
+def _home_sidebar(params):
+    """The home page's category and country counts
+
+    Read from the materialized facet table: category counts within the
+    selected country, country counts within the selected category.
+    """
+    _, selected_category, _, country_code = _home_filters(params)
+    facets = get_facet_counts(
+        country=country_code if country_code != 'all' else None,
+        category_id=selected_category,
+    )
+    categories = list(Category.objects.order_by('name'))
+    for category in categories:
+        category.article_count = facets['categories'].get(category.id, 0)
+    
+    category_total = sum(facets['categories'].values())
+    
+    country_counts = {'all': facets['total']}
+    country_filters = []
+    for code, name in COUNTRIES.items():
+        if code != 'all':
+            country_counts[code] = facets['countries'].get(code, 0)
+            country_filters.append((code, name, country_counts[code]))
+    
+    return {
+        'total_count': facets['total'],
+        'category_total': category_total,
+        'categories': categories,
         'countries': COUNTRIES,
         'country_counts': country_counts,
-        'selected_country': country_code,
+        'country_filters': country_filters,
     }
+
+
+def _home_context(params):
+    """Build the user-independent part of the home page context"""
+    return {**_home_page(params), **_home_sidebar(params)}
+
+
+def _saved_article_ids(user, context):
+    """Which articles on the home page ``user`` has saved"""
+    if not user.is_authenticated or context.get('archive'):
+        return set()
+    page_ids = [news.id for news in context['page_obj']]
+    if not page_ids:
+        return set()
+    return set(SavedArticle.objects.filter(
+        user=user, news_id__in=page_ids
+    ).values_list('news_id', flat=True))
+
+
+def home(request):
+    """Home page with all news articles"""
+    cache = page_cache()
+    # Pages carrying a flash message are one-offs, so don't cache those
+    cache_html = not request.user.is_authenticated and not messages.get_messages(request)
+    
+    if cache_html:
+        html_key = home_cache_key(request.GET, 'html')
+        html = cache.get(html_key)
+        if html is not None:
+            return HttpResponse(html)
+    
+    context_key = home_cache_key(request.GET)
+    context = cache.get(context_key)
+    if context is None:
+        context = _home_context(request.GET)
+        cache.set(context_key, context)
+    
+    response = render(request, 'newsapp/home.html', {
+        **context,
+        'saved_article_ids': _saved_article_ids(request.user, context),
+    })
+    
+    if cache_html:
+        cache.set(html_key, response.content)
     
-    return render(request, 'newsapp/home.html', context)
+    return response
+
+
+# Columns returned by the JSON API
+NEWS_API_FIELDS = [
+    'id', 'title', 'description', 'link', 'published_date',
+    'image_url', 'source', 'category__name', 'country',
+]
+NEWS_API_DEFAULT_LIMIT = 20
+NEWS_API_MAX_LIMIT = 100
+
+
+def _news_api_version(request):
+    """Newest change to the table the request reads and its article total, computed once per request"""
+    if not hasattr(request, '_news_api_version'):
+        if _news_model(request.GET) is ArchivedNews:
+            # Archived rows are only ever added, each with a new archived_at
+            latest = ArchivedNews.objects.aggregate(latest=Max('archived_at'))['latest']
+            total = 0
+        else:
+            latest = News.objects.aggregate(latest=Max('updated_at'))['latest']
+            total = FacetCount.objects.aggregate(total=Sum('count'))['total'] or 0
+        request._news_api_version = (latest, total)
+    return request._news_api_version
+
+
+def _news_api_etag(request, *args, **kwargs):
+    latest, total = _news_api_version(request)
+    # The total changes on deletes, which leave the newest updated_at alone
+    raw = f"{latest.isoformat() if latest else ''}|{total}|{request.GET.urlencode()}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _news_api_last_modified(request, *args, **kwargs):
+    return _news_api_version(request)[0]
+
+
+def _stream_news_json(rows, limit, next_link):
+    """Yield a JSON document for ``rows`` one article at a time
+
+    ``rows`` holds up to ``limit + 1`` value dicts; the extra one only tells
+    us there is a next page. ``next_link(last_row)`` builds its query params.
+    """
+    yield '{"results": ['
+    last_row = None
+    has_more = False
+    for i, row in enumerate(rows):
+        if i == limit:
+            has_more = True
+            break
+        row['category'] = row.pop('category__name')
+        yield (',' if i else '') + json.dumps(row, cls=DjangoJSONEncoder)
+        last_row = row
+    next_params = next_link(last_row) if has_more else None
+    yield '], "next": %s}' % json.dumps(f'?{urlencode(next_params)}' if next_params else None)
+
+
+@require_safe
+@condition(etag_func=_news_api_etag, last_modified_func=_news_api_last_modified)
+def news_api(request):
+    """Read-only JSON feed of articles, with the same filters as the home page"""
+    category_id = request.GET.get('category')
+    search_query = request.GET.get('search', '')
+    country_code = request.GET.get('country', 'all')
+    
+    try:
+        limit = int(request.GET.get('limit', NEWS_API_DEFAULT_LIMIT))
+    except ValueError:
+        limit = NEWS_API_DEFAULT_LIMIT
+    limit = min(max(limit, 1), NEWS_API_MAX_LIMIT)
+    
+    try:
+        news_list = _filter_news(_news_model(request.GET).objects.all(), category_id, country_code, search_query)
+        base_params = {key: value for key, value in request.GET.items() if key not in ('after', 'page')}
+        
+        if search_query:
+            try:
+                page = max(int(request.GET.get('page', 1)), 1)
+            except ValueError:
+                page = 1
+            offset = (page - 1) * limit
+            rows = news_list.values(*NEWS_API_FIELDS)[offset:offset + limit + 1]
+            next_link = lambda row: {**base_params, 'page': page + 1}
+        else:
+            paginator = KeysetPaginator(news_list, limit, 'published_date')
+            after = request.GET.get('after')
+            if after and paginator.decode_cursor(after) is None:
+                return JsonResponse({'error': 'Invalid cursor'}, status=400)
+            rows = paginator.rows_after(after).values(*NEWS_API_FIELDS)[:limit + 1]
+            next_link = lambda row: {
+                **base_params,
+                'after': paginator.make_cursor(row['published_date'], row['id']),
+            }
+        
+        # Evaluate lazily in chunks rather than caching the whole page
+        response = StreamingHttpResponse(
+            _stream_news_json(rows.iterator(chunk_size=100), limit, next_link),
+            content_type='application/json',
+        )
+    except ValueError:
+        return JsonResponse({'error': 'Invalid filter value'}, status=400)
+    
+    patch_cache_control(response, public=True, max_age=60)
+    return response
+
+
+@require_safe
+def thumbnail(request, digest):
+    """A card thumbnail made by ``fetch_thumbnails``"""
+    try:
+        path = thumbnail_path(digest)
+        response = FileResponse(open(path, 'rb'), content_type='image/jpeg')
+    except (ValueError, FileNotFoundError):
+        raise Http404('No such thumbnail')
+    touch_thumbnail(path)
+    # Named by the hash of the source image, so a thumbnail never changes
+    patch_cache_control(response, public=True, max_age=365 * 24 * 3600, immutable=True)
+    return response
+
+
+@require_safe
+def metrics(request):
+    """Request timing histograms in the Prometheus text format, for staff or the metrics token"""
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    response = HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    patch_cache_control(response, no_store=True)
+    return response
 
 
 def register(request):
@@ -180,32 +418,60 @@ def login_view(request):
     return render(request, 'newsapp/login.html')
 
 
+# Columns the dashboard cards render
+DASHBOARD_FIELDS = [
+    'saved_at', 'news', 'news__title', 'news__description', 'news__link',
+    'news__image_url', 'news__thumbnail', 'news__source', 'news__category', 'news__category__name',
+]
+
+
 @login_required
 def dashboard(request):
     """User dashboard with saved articles"""
-    saved_articles = SavedArticle.objects.filter(user=request.user).select_related('news')
+    saved_count = get_saved_count(request.user)
+    context = _dashboard_page(request.user, request.GET, saved_count)
+    context['saved_count'] = saved_count
     
-    # Pagination
-    paginator = Paginator(saved_articles, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    return render(request, 'newsapp/dashboard.html', context)
+
+
+def _dashboard_page(user, params, saved_count=None):
+    """The page of ``user``'s saved articles shown on the dashboard
+    
+    ``saved_count`` is only needed for numbered pages (old ``?page=`` links).
+    """
+    saved_articles = (
+        SavedArticle.objects.filter(user=user)
+        .select_related('news', 'news__category')
+        .only(*DASHBOARD_FIELDS)
+    )
+    
+    # Pagination: cursors on (saved_at, id); old ?page= links still work
+    cursor_mode = 'page' not in params
+    if cursor_mode:
+        paginator = KeysetPaginator(saved_articles, 12, 'saved_at')
+        page_obj = paginator.get_page(
+            after=params.get('after'),
+            before=params.get('before'),
+        )
+    else:
+        paginator = Paginator(saved_articles, 12)
+        paginator.count = saved_count
+        page_number = params.get('page')
+        page_obj = paginator.get_page(page_number)
     
-    context = {
+    return {
         'page_obj': page_obj,
+        'cursor_mode': cursor_mode,
     }
-    
-    return render(request, 'newsapp/dashboard.html', context)
 
 
 @login_required
 @require_POST
 def save_article(request, news_id):
     """Save an article for later"""
-    news = get_object_or_404(News, id=news_id)
-    saved_article, created = SavedArticle.objects.get_or_create(
-        user=request.user,
-        news=news
-    )
+    news = get_object_or_404(News.objects.only('id'), id=news_id)
+    created = save_for_user(request.user, news.id)
     
     if created:
         return JsonResponse({'status': 'saved', 'message': 'Article saved successfully!'})
@@ -217,276 +483,42 @@ def save_article(request, news_id):
 @require_POST
 def unsave_article(request, news_id):
     """Remove an article from saved list"""
-    news = get_object_or_404(News, id=news_id)
-    SavedArticle.objects.filter(user=request.user, news=news).delete()
+    news = get_object_or_404(News.objects.only('id'), id=news_id)
+    unsave_for_user(request.user, news.id)
     
     return JsonResponse({'status': 'unsaved', 'message': 'Article removed from saved list!'})
 
 
-def fetch_rss_feeds():
-    """Fetch news from RSS feeds"""
-    rss_feeds = [
-        {
-            'url': 'http://feeds.bbci.co.uk/news/rss.xml',
-            'source': 'BBC',
-            'category': 'World'
-        },
-        {
-            'url': 'https://techcrunch.com/feed/',
-            'source': 'TechCrunch',
-            'category': 'Technology'
-        },
-        {
-            'url': 'http://rss.cnn.com/rss/edition.rss',
-            'source': 'CNN',
-            'category': 'World'
-        },
-        {
-            'url': 'https://www.espn.com/espn/rss/news',
-            'source': 'ESPN',
-            'category': 'Sports'
-        },
-        {
-            'url': 'https://www.theguardian.com/world/rss',
-            'source': 'Guardian',
-            'category': 'World'
-        },
-    ]
-    
-    articles_added = 0
-    
-    for feed_config in rss_feeds:
-        try:
-            feed = feedparser.parse(feed_config['url'])
-            
-            if feed.bozo:
-                print(f"Error parsing feed {feed_config['url']}: {feed.bozo_exception}")
-                continue
-            
-            category, _ = Category.objects.get_or_create(
-                name=feed_config['category'],
-                defaults={'slug': feed_config['category'].lower().replace(' ', '-')}
-            )
-            
-            for entry in feed.entries[:20]:  # Limit to 20 articles per feed
-                try:
-                    # Parse published date
-                    published_date = timezone.now()
-                    if hasattr(entry, 'published_parsed') and entry.published_parsed:
-                        try:
-                            # Ensure we have at least 6 elements
-                            parsed = entry.published_parsed
-                            if len(parsed) >= 6:
-                                # Create timezone-aware datetime
-                                published_date = datetime(*parsed[:6], tzinfo=pytz.UTC)
-                                # Convert to Django's timezone-aware format
-                                published_date = timezone.make_aware(
-                                    published_date.replace(tzinfo=None), 
-                                    pytz.UTC
-                                )
-                            else:
-                                # Fill missing elements with defaults
-                                parsed_list = list(parsed) + [0] * (6 - len(parsed))
-                                published_date = datetime(*parsed_list[:6], tzinfo=pytz.UTC)
-                                published_date = timezone.make_aware(
-                                    published_date.replace(tzinfo=None), 
-                                    pytz.UTC
-                                )
-                        except (ValueError, TypeError, IndexError):
-                            published_date = timezone.now()
-                    
-                    # Extract image URL
-                    image_url = ''
-                    if hasattr(entry, 'media_content') and entry.media_content:
-                        image_url = entry.media_content[0].get('url', '')
-                    elif hasattr(entry, 'image'):
-                        image_url = entry.image.get('href', '')
-                    elif hasattr(entry, 'links'):
-                        for link in entry.links:
-                            if link.get('type', '').startswith('image'):
-                                image_url = link.get('href', '')
-                                break
-                    
-                    # Get description
-                    description = ''
-                    if hasattr(entry, 'description'):
-                        description = entry.description or ''
-                    elif hasattr(entry, 'summary'):
-                        description = entry.summary or ''
-                    
-                    # Clean HTML from description
-                    if description:
-                        description = re.sub('<[^<]+?>', '', description)
-                        description = description[:500]  # Limit length
-                    
-                    # Validate title and link
-                    if not hasattr(entry, 'title') or not entry.title:
-                        continue
-                    if not hasattr(entry, 'link') or not entry.link:
-                        continue
-                    
-                    # Create or update news article
-                    news, created = News.objects.get_or_create(
-                        link=entry.link,
-                        defaults={
-                            'title': (entry.title or 'Untitled')[:500],
-                            'description': description,
-                            'published_date': published_date,
-                            'image_url': image_url,
-                            'source': feed_config['source'],
-                            'category': category,
-                        }
-                    )
-                    
-                    if created:
-                        articles_added += 1
-                        
-                except Exception as e:
-                    print(f"Error processing entry: {e}")
-                    continue
-                    
-        except Exception as e:
-            print(f"Error fetching feed {feed_config['url']}: {e}")
-            continue
-    
-    return articles_added
-
-
-def fetch_newsapi():
-    """Fetch news from NewsData.io API with country support"""
-    api_key = settings.NEWSAPI_KEY
-    categories = ['technology', 'sports', 'business', 'entertainment', 'health', 'science']
-    # Popular countries to fetch news from
-    countries = ['us', 'gb', 'in', 'ca', 'au', 'de', 'fr', 'jp', 'cn', 'br']
-    articles_added = 0
-    
-    for cat in categories:
-        # Fetch from multiple countries
-        for country_code in countries:
-            try:
-                # Add delay to avoid rate limiting (1 second between requests)
-                time.sleep(1)
-                
-                # NewsData.io API endpoint
-                url = 'https://newsdata.io/api/1/news'
-                params = {
-                    'apikey': api_key,
-                    'category': cat,
-                    'country': country_code,
-                    'language': 'en'
-                }
-                
-                # Add headers for better compatibility
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                }
-                
-                response = requests.get(url, params=params, headers=headers, timeout=30)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    if data.get('status') == 'success':
-                        # Get or create category
-                        category_name = cat.capitalize()
-                        category, _ = Category.objects.get_or_create(
-                            name=category_name,
-                            defaults={'slug': cat}
-                        )
-                        
-                        for article in data.get('results', []):
-                            try:
-                                if not article.get('link'):
-                                    continue
-                                
-                                # Parse published date
-                                published_date = timezone.now()
-                                if article.get('pubDate'):
-                                    try:
-                                        # NewsData.io uses ISO format or other formats
-                                        pub_date_str = article['pubDate']
-                                        # Try parsing different date formats
-                                        try:
-                                            published_date = datetime.fromisoformat(
-                                                pub_date_str.replace('Z', '+00:00')
-                                            )
-                                        except:
-                                            # Try parsing other common formats
-                                            published_date = date_parser.parse(pub_date_str)
-                                            # Ensure timezone-aware datetime
-                                            if published_date.tzinfo is None:
-                                                published_date = pytz.UTC.localize(published_date)
-                                            # Convert to Django's timezone-aware datetime if needed
-                                            # Note: pytz.UTC.localize already makes it timezone-aware
-                                            # So this check should rarely be needed, but kept for safety
-                                            if not timezone.is_aware(published_date):
-                                                published_date = timezone.make_aware(
-                                                    published_date.replace(tzinfo=None), 
-                                                    pytz.UTC
-                                                )
-                                    except Exception as e:
-                                        print(f"Date parsing error: {e}")
-                                        published_date = timezone.now()
-                                
-                                # Get source name
-                                source_name = article.get('source_id', 'NewsData.io')
-                                if article.get('source_name'):
-                                    source_name = article['source_name']
-                                
-                                # Get image URL
-                                image_url = article.get('image_url', '') or article.get('image', '')
-                                
-                                # Get description
-                                description = article.get('description', '') or article.get('content', '')
-                                if description:
-                                    # Clean HTML if present
-                                    description = re.sub('<[^<]+?>', '', description)
-                                    description = description[:500]  # Limit length
-                                
-                                # Validate required fields
-                                title = article.get('title', '').strip()
-                                if not title:
-                                    title = 'Untitled'
-                                
-                                link = article.get('link', '').strip()
-                                if not link:
-                                    continue
-                                
-                                # Create or update news article
-                                news, created = News.objects.get_or_create(
-                                    link=link,
-                                    defaults={
-                                        'title': title[:500],
-                                        'description': description,
-                                        'published_date': published_date,
-                                        'image_url': image_url,
-                                        'source': source_name,
-                                        'category': category,
-                                        'country': country_code,
-                                    }
-                                )
-                                
-                                if created:
-                                    articles_added += 1
-                                    
-                            except Exception as e:
-                                print(f"Error processing NewsData.io article: {e}")
-                                continue
-                    else:
-                        print(f"NewsData.io API returned error: {data.get('message', 'Unknown error')}")
-                else:
-                    error_text = response.text[:200] if response.text else 'No error message'
-                    # Handle rate limiting with longer delay
-                    if response.status_code == 429:
-                        print(f"Rate limit hit for {cat}/{country_code}. Waiting 5 seconds...")
-                        time.sleep(5)
-                    else:
-                        print(f"NewsData.io error: {response.status_code} - {error_text}")
-                        
-            except Exception as e:
-                print(f"Error fetching NewsData.io category {cat} for country {country_code}: {e}")
-                # Add delay even on error to avoid rapid retries
-                time.sleep(1)
-                continue
-    
-    return articles_added
+SAVED_BATCH_MAX_OPERATIONS = 100
+MAX_NEWS_ID = 2 ** 63 - 1
+
+
+@login_required
+@require_POST
+def saved_articles_batch(request):
+    """Save and unsave several articles in one request
+
+    Takes ``{"operations": [{"news_id": 1, "action": "save"}, ...]}``.
+    """
+    try:
+        operations = json.loads(request.body)['operations']
+        changes = {}
+        for operation in operations:
+            if operation['action'] not in ('save', 'unsave'):
+                raise ValueError(operation['action'])
+            news_id = int(operation['news_id'])
+            # Ids the database couldn't store would fail when bound to the query
+            if not 0 < news_id <= MAX_NEWS_ID:
+                raise ValueError(news_id)
+            changes[news_id] = operation['action']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'status': 'error', 'message': 'Invalid operations.'}, status=400)
+    if len(changes) > SAVED_BATCH_MAX_OPERATIONS:
+        return JsonResponse(
+            {'status': 'error', 'message': f'At most {SAVED_BATCH_MAX_OPERATIONS} articles per request.'},
+            status=400,
+        )
+
+    result = apply_saved_changes(request.user, changes)
+
+    return JsonResponse({'status': 'ok', 'saved_count': get_saved_count(request.user), **result})
@@ -6,49 +6,13 @@ $(document).ready(function() {
         const btn = $(this);
         const newsId = btn.data('news-id');
         const isSaved = btn.data('saved') === true;
-        const csrftoken = getCookie('csrftoken');
         
-        if (isSaved) {
-            // Unsave article
-            $.ajax({
-                url: `/unsave-article/${newsId}/`,
-                type: 'POST',
-                headers: {
-                    'X-CSRFToken': csrftoken
-                },
-                success: function(response) {
-                    if (response.status === 'unsaved') {
-                        btn.removeClass('btn-warning').addClass('btn-outline-secondary');
-                        btn.find('i').removeClass('bi-bookmark-fill').addClass('bi-bookmark');
-                        btn.data('saved', false);
-                        showToast('Article removed from saved list!', 'info');
-                    }
-                },
-                error: function() {
-                    showToast('Error removing article. Please try again.', 'danger');
-                }
-            });
-        } else {
-            // Save article
-            $.ajax({
-                url: `/save-article/${newsId}/`,
-                type: 'POST',
-                headers: {
-                    'X-CSRFToken': csrftoken
-                },
-                success: function(response) {
-                    if (response.status === 'saved' || response.status === 'already_saved') {
-                        btn.removeClass('btn-outline-secondary').addClass('btn-warning');
-                        btn.find('i').removeClass('bi-bookmark').addClass('bi-bookmark-fill');
-                        btn.data('saved', true);
-                        showToast(response.message, 'success');
-                    }
-                },
-                error: function() {
-                    showToast('Error saving article. Please try again.', 'danger');
-                }
-            });
-        }
+        // Show the new state straight away; the request goes out with the
+        // next batch and the button is put back if it fails
+        setSaveButton(btn, !isSaved);
+        queueSavedChange(newsId, isSaved ? 'unsave' : 'save', function() {
+            setSaveButton(btn, isSaved);
+        });
     });
     
     // Unsave Article from Dashboard
@@ -56,40 +20,116 @@ $(document).ready(function() {
         const btn = $(this);
         const newsId = btn.data('news-id');
         const card = btn.closest('.col-md-6, .col-lg-4');
-        const csrftoken = getCookie('csrftoken');
         
         if (confirm('Are you sure you want to remove this article from your saved list?')) {
-            $.ajax({
-                url: `/unsave-article/${newsId}/`,
-                type: 'POST',
-                headers: {
-                    'X-CSRFToken': csrftoken
-                },
-                success: function(response) {
-                    if (response.status === 'unsaved') {
-                        card.fadeOut(300, function() {
-                            $(this).remove();
-                            // Check if no more articles
-                            if ($('.col-md-6, .col-lg-4').length === 0) {
-                                location.reload();
-                            }
-                        });
-                        showToast('Article removed from saved list!', 'success');
-                    }
-                },
-                error: function() {
-                    showToast('Error removing article. Please try again.', 'danger');
+            const count = $('#saved-count');
+            count.text(Math.max(0, parseInt(count.text(), 10) - 1));
+            queueSavedChange(newsId, 'unsave', function() {
+                location.reload();
+            });
+            card.fadeOut(300, function() {
+                $(this).remove();
+                // Check if no more articles
+                if ($('.col-md-6, .col-lg-4').length === 0) {
+                    flushSavedChanges().always(function() {
+                        location.reload();
+                    });
                 }
             });
         }
     });
     
+    // Send anything still queued when the user leaves the page
+    $(window).on('pagehide', function() {
+        flushSavedChanges(true);
+    });
+    
     // Auto-dismiss alerts after 5 seconds
     setTimeout(function() {
         $('.alert').fadeOut('slow');
     }, 5000);
 });
 
+// Saving and unsaving: clicks are queued for SAVE_BATCH_DELAY ms and sent
+// together as one request to the batch endpoint. Only the last click on each
+// article counts, so toggling one back and forth sends a single operation.
+const SAVE_BATCH_URL = '/saved-articles/batch/';
+const SAVE_BATCH_DELAY = 400;
+const pendingSavedChanges = new Map();
+let saveBatchTimer = null;
+
+function setSaveButton(btn, saved) {
+    if (saved) {
+        btn.removeClass('btn-outline-secondary').addClass('btn-warning');
+        btn.find('i').removeClass('bi-bookmark').addClass('bi-bookmark-fill');
+    } else {
+        btn.removeClass('btn-warning').addClass('btn-outline-secondary');
+        btn.find('i').removeClass('bi-bookmark-fill').addClass('bi-bookmark');
+    }
+    btn.data('saved', saved);
+}
+
+function queueSavedChange(newsId, action, revert) {
+    // Keep the first revert: it restores the state from before the batch
+    const pending = pendingSavedChanges.get(newsId);
+    pendingSavedChanges.set(newsId, {action: action, revert: pending ? pending.revert : revert});
+    clearTimeout(saveBatchTimer);
+    saveBatchTimer = setTimeout(flushSavedChanges, SAVE_BATCH_DELAY);
+}
+
+function flushSavedChanges(leavingPage) {
+    clearTimeout(saveBatchTimer);
+    saveBatchTimer = null;
+    if (pendingSavedChanges.size === 0) {
+        return $.Deferred().resolve().promise();
+    }
+    
+    const batch = new Map(pendingSavedChanges);
+    pendingSavedChanges.clear();
+    const body = JSON.stringify({
+        operations: Array.from(batch, ([newsId, change]) => ({news_id: newsId, action: change.action}))
+    });
+    
+    if (leavingPage === true) {
+        // jQuery's requests are cancelled with the page; keepalive ones aren't
+        fetch(SAVE_BATCH_URL, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json', 'X-CSRFToken': getCookie('csrftoken')},
+            body: body,
+            keepalive: true
+        });
+        return $.Deferred().resolve().promise();
+    }
+    
+    return $.ajax({
+        url: SAVE_BATCH_URL,
+        type: 'POST',
+        contentType: 'application/json',
+        data: body,
+        headers: {
+            'X-CSRFToken': getCookie('csrftoken')
+        },
+        success: function(response) {
+            response.missing.forEach(function(newsId) {
+                batch.get(newsId).revert();
+            });
+            if (response.added && response.removed) {
+                showToast('Saved list updated!', 'success');
+            } else if (response.added) {
+                showToast(response.added === 1 ? 'Article saved successfully!' : `${response.added} articles saved!`, 'success');
+            } else if (response.removed) {
+                showToast(response.removed === 1 ? 'Article removed from saved list!' : `${response.removed} articles removed from saved list!`, 'info');
+            }
+        },
+        error: function() {
+            batch.forEach(function(change) {
+                change.revert();
+            });
+            showToast('Error updating saved articles. Please try again.', 'danger');
+        }
+    });
+}
+
 // Get CSRF Token
 function getCookie(name) {
     let cookieValue = null;